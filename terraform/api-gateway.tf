@@ -182,6 +182,59 @@ resource "aws_lambda_permission" "chat" {
   source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
 }
 
+################################################################################
+# Chat Batch Route - POST /api/chat/batch
+################################################################################
+
+resource "aws_apigatewayv2_integration" "chat_batch" {
+  api_id                 = aws_apigatewayv2_api.main.id
+  integration_type       = "AWS_PROXY"
+  integration_method     = "POST"
+  integration_uri        = module.chat_batch_lambda.invoke_arn
+  payload_format_version = "2.0"
+  timeout_milliseconds   = 30000  # Maximum for HTTP API (30 seconds)
+}
+
+resource "aws_apigatewayv2_route" "chat_batch" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "POST /api/chat/batch"
+  target    = "integrations/${aws_apigatewayv2_integration.chat_batch.id}"
+}
+
+resource "aws_lambda_permission" "chat_batch" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = module.chat_batch_lambda.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
+}
+
+################################################################################
+# Chat Cancel Route - POST /api/chat/{sessionId}/cancel
+################################################################################
+
+resource "aws_apigatewayv2_integration" "chat_cancel" {
+  api_id                 = aws_apigatewayv2_api.main.id
+  integration_type       = "AWS_PROXY"
+  integration_method     = "POST"
+  integration_uri        = module.chat_cancel_lambda.invoke_arn
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "chat_cancel" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "POST /api/chat/{sessionId}/cancel"
+  target    = "integrations/${aws_apigatewayv2_integration.chat_cancel.id}"
+}
+
+resource "aws_lambda_permission" "chat_cancel" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = module.chat_cancel_lambda.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
+}
+
 ################################################################################
 # Chat Status Route - GET /api/chat/status/{sessionId}
 ################################################################################
@@ -208,6 +261,58 @@ resource "aws_lambda_permission" "chat_status" {
   source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
 }
 
+################################################################################
+# Usage Route - GET /api/usage
+################################################################################
+
+resource "aws_apigatewayv2_integration" "usage" {
+  api_id                 = aws_apigatewayv2_api.main.id
+  integration_type       = "AWS_PROXY"
+  integration_method     = "POST"
+  integration_uri        = module.usage_lambda.invoke_arn
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "usage" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "GET /api/usage"
+  target    = "integrations/${aws_apigatewayv2_integration.usage.id}"
+}
+
+resource "aws_lambda_permission" "usage" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = module.usage_lambda.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
+}
+
+################################################################################
+# Search Route - GET /api/search
+################################################################################
+
+resource "aws_apigatewayv2_integration" "search" {
+  api_id                 = aws_apigatewayv2_api.main.id
+  integration_type       = "AWS_PROXY"
+  integration_method     = "POST"
+  integration_uri        = module.search_lambda.invoke_arn
+  payload_format_version = "2.0"
+}
+
+resource "aws_apigatewayv2_route" "search" {
+  api_id    = aws_apigatewayv2_api.main.id
+  route_key = "GET /api/search"
+  target    = "integrations/${aws_apigatewayv2_integration.search.id}"
+}
+
+resource "aws_lambda_permission" "search" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = module.search_lambda.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.main.execution_arn}/*/*"
+}
+
 ################################################################################
 # Outputs
 ################################################################################
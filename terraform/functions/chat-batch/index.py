@@ -0,0 +1,314 @@
+import json
+import boto3
+import os
+import time
+import jwt
+import uuid
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from usage_meter import UsageMeter
+
+# Maximum prompts accepted per request and concurrent Bedrock invocations
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 50))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 4))
+
+# Throttling retries with exponential backoff (seconds)
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0
+
+# Stop starting new prompts when less than this much Lambda time remains
+DEADLINE_MARGIN_MS = 5000
+
+# Stop waiting for in-flight prompts when less than this much remains, leaving
+# time to write usage and return the results already collected
+RESPONSE_MARGIN_MS = 2000
+
+# Initialize Bedrock Agent Runtime client (sized for the worker pool)
+bedrock_agent_runtime = boto3.client(
+    'bedrock-agent-runtime',
+    region_name=os.environ.get('BEDROCK_REGION', os.environ.get('AWS_REGION', 'us-east-1')),
+    config=Config(max_pool_connections=max(BATCH_CONCURRENCY, 10))
+)
+
+# Per-user daily usage buckets (accounting is skipped if not configured)
+usage_table = boto3.resource('dynamodb').Table(os.environ['USAGE_TABLE_NAME']) if os.environ.get('USAGE_TABLE_NAME') else None
+
+# JWT configuration
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+
+# Agent type -> (agentId, aliasId), matching list-agents ids
+AGENTS = {
+    'generic': (os.environ.get('GENERIC_AGENT_ID'), os.environ.get('GENERIC_AGENT_ALIAS_ID')),
+    'coding': (os.environ.get('CODING_AGENT_ID'), os.environ.get('CODING_AGENT_ALIAS_ID')),
+    'financial': (os.environ.get('FINANCIAL_AGENT_ID'), os.environ.get('FINANCIAL_AGENT_ALIAS_ID')),
+    'supervisor': (os.environ.get('SUPERVISOR_AGENT_ID'), os.environ.get('SUPERVISOR_AGENT_ALIAS_ID'))
+}
+
+
+def handler(event, context):
+    """
+    Lambda handler for batch chat with Bedrock Agents.
+    Runs up to MAX_BATCH_SIZE prompts through invoke_agent with at most
+    BATCH_CONCURRENCY in flight, and returns one NDJSON line per prompt
+    in completion order. No session records are written and no polling is needed.
+    Usage for the whole batch is written to the usage table in one update.
+
+    NOTE: Validation and auth errors return 200 with a JSON error body for API Gateway compatibility.
+    """
+    try:
+        try:
+            user_id = verify_token(event)
+            if not user_id:
+                return create_response(200, {
+                    'success': False,
+                    'error': 'Authentication required',
+                    'errorType': 'auth'
+                })
+        except Exception as auth_error:
+            print(f'Auth error: {str(auth_error)}')
+            return create_response(200, {
+                'success': False,
+                'error': str(auth_error),
+                'errorType': 'auth'
+            })
+
+        body = json.loads(event.get('body') or '{}')
+        default_agent_type = body.get('agentType', 'supervisor')
+        try:
+            items = normalize_items(body.get('prompts', []), default_agent_type)
+        except ValueError as validation_error:
+            return create_response(200, {
+                'success': False,
+                'error': str(validation_error),
+                'errorType': 'validation'
+            })
+
+        if not items:
+            return create_response(200, {
+                'success': False,
+                'error': 'At least one prompt is required',
+                'errorType': 'validation'
+            })
+
+        if len(items) > MAX_BATCH_SIZE:
+            return create_response(200, {
+                'success': False,
+                'error': f'At most {MAX_BATCH_SIZE} prompts are allowed per batch',
+                'errorType': 'validation'
+            })
+
+        for item in items:
+            agent_id, agent_alias_id = AGENTS.get(item['agentType'], (None, None))
+            if not agent_id or not agent_alias_id:
+                return create_response(200, {
+                    'success': False,
+                    'error': f'Unknown or unconfigured agent type: {item["agentType"]}',
+                    'errorType': 'validation'
+                })
+
+        print(f'Batch request from {user_id}: {len(items)} prompts, concurrency {BATCH_CONCURRENCY}')
+
+        meter = UsageMeter(usage_table, user_id)
+        meter.add(batchRequests=1, batchPrompts=len(items))
+        try:
+            lines = []
+            for result in run_batch(items, context, meter):
+                meter.add(errorPrompts=1 if result['status'] == 'error' else 0,
+                          skippedPrompts=1 if result['status'] == 'skipped' else 0,
+                          timeoutPrompts=1 if result['status'] == 'timeout' else 0)
+                lines.append(json.dumps(result, default=str))
+        finally:
+            flush_usage(meter)
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/x-ndjson',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+                'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+            },
+            'body': '\n'.join(lines) + '\n'
+        }
+
+    except Exception as e:
+        print(f'Error: {str(e)}')
+        import traceback
+        traceback.print_exc()
+        return create_response(200, {
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'errorType': 'internal',
+            'details': str(e)
+        })
+
+
+def normalize_items(prompts, default_agent_type):
+    """
+    Accept plain strings or {id, message, agentType} objects.
+    Raises ValueError if prompts is not a list or any entry has no message.
+    """
+    if not isinstance(prompts, list):
+        raise ValueError('"prompts" must be an array of strings or {id, message, agentType} objects')
+
+    items = []
+    for index, prompt in enumerate(prompts):
+        if isinstance(prompt, str):
+            prompt = {'message': prompt}
+        if not isinstance(prompt, dict) or not isinstance(prompt.get('message'), str) or not prompt['message'].strip():
+            raise ValueError(f'Prompt {index} has no message')
+        items.append({
+            'index': index,
+            'id': prompt.get('id', str(index)),
+            'message': prompt['message'],
+            'agentType': prompt.get('agentType', default_agent_type)
+        })
+    return items
+
+
+def flush_usage(meter):
+    """Write the batch's usage counters; accounting failures never fail the batch"""
+    try:
+        meter.flush()
+    except Exception as usage_error:
+        print(f'Usage flush error: {usage_error}')
+
+
+def run_batch(items, context, meter=None):
+    """
+    Invoke the agents with bounded concurrency and yield per-item results as they complete.
+    Items not started before the Lambda deadline are reported as skipped. Waiting
+    is bounded too: prompts still running RESPONSE_MARGIN_MS before the deadline
+    are reported as timeout and abandoned, so results already collected are returned.
+    """
+    # Absolute times (time.time()) after which nothing new starts / nothing more is awaited
+    start_deadline, wait_deadline = None, None
+    if context is not None:
+        remaining = context.get_remaining_time_in_millis()
+        start_deadline = time.time() + (remaining - DEADLINE_MARGIN_MS) / 1000
+        wait_deadline = time.time() + (remaining - RESPONSE_MARGIN_MS) / 1000
+
+    def skipped(item):
+        return {'index': item['index'], 'id': item['id'], 'status': 'skipped',
+                'error': 'Batch deadline reached before this prompt started'}
+
+    def run_item(item):
+        if start_deadline is not None and time.time() >= start_deadline:
+            return skipped(item)
+        started = time.time()
+        try:
+            response = invoke_agent_with_retry(item, meter, wait_deadline)
+            return {'index': item['index'], 'id': item['id'], 'status': 'completed',
+                    'agentType': item['agentType'], 'response': response,
+                    'durationMs': int((time.time() - started) * 1000)}
+        except Exception as agent_error:
+            error_str = str(agent_error)
+            print(f'Batch item {item["index"]} failed: {error_str}')
+            return {'index': item['index'], 'id': item['id'], 'status': 'error',
+                    'errorType': 'throttling' if is_throttling_error(error_str) else 'agent_error',
+                    'error': error_str, 'durationMs': int((time.time() - started) * 1000)}
+
+    # Not a context manager: its exit would block on prompts still streaming past the deadline
+    executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY)
+    futures = {executor.submit(run_item, item): item for item in items}
+    pending = set(futures)
+    try:
+        timeout = None if wait_deadline is None else max(wait_deadline - time.time(), 0)
+        for future in as_completed(futures, timeout=timeout):
+            pending.discard(future)
+            yield future.result()
+    except TimeoutError:
+        for future in sorted(pending, key=lambda pending_future: futures[pending_future]['index']):
+            item = futures[future]
+            if future.cancel():
+                yield skipped(item)
+            elif future.done():
+                yield future.result()
+            else:
+                print(f'Batch item {item["index"]} abandoned at the deadline')
+                yield {'index': item['index'], 'id': item['id'], 'status': 'timeout',
+                       'error': 'Batch deadline reached before this prompt finished'}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def invoke_agent_with_retry(item, meter=None, deadline=None):
+    """
+    Invoke the agent, backing off exponentially while Bedrock is throttling.
+    A retry whose backoff would end past the deadline is not attempted.
+    """
+    agent_id, agent_alias_id = AGENTS[item['agentType']]
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return invoke_agent(agent_id, agent_alias_id, str(uuid.uuid4()), item['message'], meter)
+        except Exception as agent_error:
+            if attempt == MAX_RETRIES or not is_throttling_error(str(agent_error)):
+                raise
+            delay = RETRY_BASE_DELAY * (2 ** attempt)
+            if deadline is not None and time.time() + delay >= deadline:
+                raise
+            time.sleep(delay)
+
+
+def invoke_agent(agent_id, agent_alias_id, session_id, message, meter=None):
+    """Invoke a Bedrock Agent and return the fully assembled completion text"""
+    started = time.time()
+    response = bedrock_agent_runtime.invoke_agent(
+        agentId=agent_id,
+        agentAliasId=agent_alias_id,
+        sessionId=session_id,
+        inputText=message,
+        enableTrace=False
+    )
+
+    parts = []
+    first_chunk_ms = None
+    try:
+        for event in response.get('completion', []):
+            if 'chunk' in event and 'bytes' in event['chunk']:
+                parts.append(event['chunk']['bytes'])
+                if first_chunk_ms is None:
+                    first_chunk_ms = int((time.time() - started) * 1000)
+    finally:
+        if meter is not None:
+            meter.record_invocation(len(parts), sum(len(part) for part in parts),
+                                    int((time.time() - started) * 1000), first_chunk_ms)
+    return b''.join(parts).decode('utf-8')
+
+
+def is_throttling_error(error_str):
+    """Same throttling detection as the chat Lambda"""
+    return 'throttlingException' in error_str or 'ThrottlingException' in error_str or 'rate' in error_str.lower()
+
+
+def verify_token(event):
+    """Verify JWT token"""
+    try:
+        auth_header = event.get('headers', {}).get('authorization') or event.get('headers', {}).get('Authorization')
+        if not auth_header:
+            raise Exception('No authorization header')
+
+        token = auth_header.replace('Bearer ', '').replace('bearer ', '')
+        decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        return decoded.get('userId')
+
+    except jwt.ExpiredSignatureError:
+        raise Exception('Token expired')
+    except jwt.InvalidTokenError:
+        raise Exception('Invalid token')
+    except Exception as e:
+        raise Exception(f'Auth failed: {str(e)}')
+
+
+def create_response(status_code, body):
+    """Create HTTP response with CORS headers (always 200 for API Gateway compatibility)"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+        },
+        'body': json.dumps(body, default=str)
+    }
@@ -0,0 +1,68 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+# Upper bounds (ms) of the agent latency histogram; slower invocations count as latencyOver30s
+LATENCY_BUCKETS = ((1000, 'latencyLe1s'), (5000, 'latencyLe5s'), (15000, 'latencyLe15s'), (30000, 'latencyLe30s'))
+LATENCY_OVERFLOW = 'latencyOver30s'
+
+
+class UsageMeter:
+    """
+    Per-invocation usage counters for one user.
+
+    Counters are accumulated in memory (thread-safe, so compare lanes and batch
+    workers can share one meter) and written by flush() as a single atomic ADD
+    update on the user's bucket for the current UTC day (userId + day).
+    One write per invocation, however many chunks or prompts it streamed.
+
+    Every counter is additive, including the latency histogram, so concurrent
+    invocations never overwrite each other and a day's bucket is always the
+    exact sum of its invocations.
+    """
+
+    def __init__(self, table, user_id):
+        self.table = table
+        self.user_id = user_id
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                if value:
+                    self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_invocation(self, chunks, response_bytes, duration_ms, first_chunk_ms=None):
+        """Account one invoke_agent call: streamed volume, Bedrock time and its latency bucket"""
+        bucket = next((name for limit, name in LATENCY_BUCKETS if duration_ms <= limit), LATENCY_OVERFLOW)
+        self.add(
+            agentInvocations=1,
+            chunks=chunks,
+            responseBytes=response_bytes,
+            bedrockMs=duration_ms,
+            firstChunkMs=first_chunk_ms or 0,
+            **{bucket: 1}
+        )
+
+    def flush(self):
+        """Write accumulated counters as one ADD update and reset them; returns False if nothing to write"""
+        with self._lock:
+            counters, self.counters = self.counters, {}
+        if not counters or self.table is None or not self.user_id:
+            return False
+
+        names, values, adds = {}, {}, []
+        for index, (name, value) in enumerate(sorted(counters.items())):
+            names[f'#c{index}'] = name
+            values[f':c{index}'] = int(value)
+            adds.append(f'#c{index} :c{index}')
+        values[':now'] = datetime.now(timezone.utc).isoformat()
+
+        self.table.update_item(
+            Key={'userId': self.user_id, 'day': time.strftime('%Y-%m-%d', time.gmtime())},
+            UpdateExpression='ADD ' + ', '.join(adds) + ' SET lastActivityAt = :now',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+        return True
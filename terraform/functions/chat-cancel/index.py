@@ -0,0 +1,124 @@
+import json
+import boto3
+import os
+import jwt
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+# Initialize DynamoDB
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(os.environ['CHAT_SESSIONS_TABLE_NAME'])
+
+# JWT configuration
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+
+
+def handler(event, context):
+    """
+    Lambda handler for cancelling an in-flight generation.
+    Sets cancelRequested on the session item; the chat Lambda's streaming loop
+    notices it within a few chunks and stops consuming the agent stream.
+
+    NOTE: Always returns 200 status with error details in body for API Gateway compatibility.
+    """
+    try:
+        try:
+            user_id = verify_token(event)
+            if not user_id:
+                return create_response(200, {
+                    'success': False,
+                    'error': 'Authentication required',
+                    'errorType': 'auth'
+                })
+        except Exception as auth_error:
+            print(f'Auth error: {str(auth_error)}')
+            return create_response(200, {
+                'success': False,
+                'error': str(auth_error),
+                'errorType': 'auth'
+            })
+
+        session_id = event['pathParameters']['sessionId']
+        body = json.loads(event.get('body') or '{}')
+        turn_id = body.get('turnId')
+
+        # Only the owner can cancel, only while processing, and only the turn they meant
+        condition = 'userId = :userId AND #status = :processing'
+        values = {
+            ':userId': user_id,
+            ':processing': 'processing',
+            ':true': True,
+            ':now': datetime.now(timezone.utc).isoformat()
+        }
+        if turn_id:
+            condition += ' AND turnId = :turnId'
+            values[':turnId'] = turn_id
+
+        try:
+            table.update_item(
+                Key={'sessionId': session_id},
+                UpdateExpression='SET cancelRequested = :true, cancelRequestedAt = :now',
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=values
+            )
+        except ClientError as db_error:
+            if db_error.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            return create_response(200, {
+                'success': False,
+                'error': 'No in-flight generation to cancel',
+                'errorType': 'not_cancellable',
+                'sessionId': session_id
+            })
+
+        print(f'Cancel requested for session {session_id} (turn {turn_id or "current"}) by {user_id}')
+
+        return create_response(200, {
+            'success': True,
+            'sessionId': session_id,
+            'turnId': turn_id,
+            'status': 'cancelling'
+        })
+
+    except Exception as e:
+        print(f'Error: {str(e)}')
+        return create_response(200, {
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'errorType': 'internal',
+            'details': str(e)
+        })
+
+
+def verify_token(event):
+    """Verify JWT token"""
+    try:
+        auth_header = event.get('headers', {}).get('authorization') or event.get('headers', {}).get('Authorization')
+        if not auth_header:
+            raise Exception('No authorization header')
+
+        token = auth_header.replace('Bearer ', '').replace('bearer ', '')
+        decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        return decoded.get('userId')
+
+    except jwt.ExpiredSignatureError:
+        raise Exception('Token expired')
+    except jwt.InvalidTokenError:
+        raise Exception('Invalid token')
+    except Exception as e:
+        raise Exception(f'Auth failed: {str(e)}')
+
+
+def create_response(status_code, body):
+    """Create HTTP response with CORS headers (always 200 for API Gateway compatibility)"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+        },
+        'body': json.dumps(body, default=str)
+    }
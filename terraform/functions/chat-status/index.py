@@ -1,11 +1,27 @@
 import json
 import boto3
 import os
+import hashlib
+import time
+from collections import OrderedDict
 from decimal import Decimal
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['CHAT_SESSIONS_TABLE_NAME'])
 
+# Warm-container cache of serialized completed turns, bounded by total body bytes.
+# A completed turn (sessionId + turnId) never changes, so hits skip DynamoDB entirely.
+COMPLETED_CACHE_MAX_BYTES = int(os.environ.get('COMPLETED_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+completed_cache = OrderedDict()
+completed_cache_bytes = 0
+
+# Completed turns live for the session TTL (24 hours); in-flight polls must always revalidate
+COMPLETED_CACHE_CONTROL = 'public, max-age=86400, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Reported for a processing turn whose worker stopped renewing its lease (timeout or crash)
+STALE_ERROR_MESSAGE = 'The response was interrupted before it finished.'
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
@@ -15,48 +31,143 @@ class DecimalEncoder(json.JSONEncoder):
 def handler(event, context):
     try:
         session_id = event['pathParameters']['sessionId']
-        last_chunk_index = int(event.get('queryStringParameters', {}).get('lastChunkIndex', -1))
-        
+        query = event.get('queryStringParameters') or {}
+        last_chunk_index = int(query.get('lastChunkIndex', -1))
+        turn_id = query.get('turnId')
+        if_none_match = get_header(event, 'if-none-match')
+
+        cache_key = (session_id, turn_id, max(last_chunk_index, -1))
+        if turn_id:
+            cached = cache_get(cache_key)
+            if cached:
+                body, etag = cached
+                return create_cached_response(body, etag, COMPLETED_CACHE_CONTROL, if_none_match)
+
         response = table.get_item(Key={'sessionId': session_id})
-        
+
         if 'Item' not in response:
             return {
                 'statusCode': 404,
                 'headers': {
                     'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
+                    'Access-Control-Allow-Origin': '*',
+                    'Cache-Control': 'no-store'
                 },
                 'body': json.dumps({'errorMessage': 'Session not found'})
             }
-        
+
         item = response['Item']
         all_chunks = item.get('chunks', [])
+        status = item.get('status')
+        error_message = item.get('errorMessage')
         
+        # A dead worker leaves the item processing forever; report it as terminal with partial output
+        if status == 'processing' and is_lease_expired(item):
+            status = 'stale'
+            error_message = STALE_ERROR_MESSAGE
+
         # Return only new chunks since last poll
         new_chunks = all_chunks[last_chunk_index + 1:] if last_chunk_index >= 0 else all_chunks
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'status': item.get('status'),
-                'routedAgentType': item.get('routedAgentType'),
-                'chunks': new_chunks,
-                'totalChunks': len(all_chunks),
-                'response': item.get('response', ''),
-                'errorMessage': item.get('errorMessage')
-            }, cls=DecimalEncoder)
-        }
-        
+
+        body = json.dumps({
+            'status': status,
+            'turnId': item.get('turnId'),
+            'routedAgentType': item.get('routedAgentType'),
+            'chunks': new_chunks,
+            'totalChunks': len(all_chunks),
+            'response': item.get('response', ''),
+            'errorMessage': error_message,
+            'mode': item.get('mode', 'single'),
+            'lanes': format_lanes(item.get('lanes'), stale=status == 'stale')
+        }, cls=DecimalEncoder)
+        etag = make_etag(body)
+
+        # Only a completed turn the client explicitly asked for is immutable;
+        # a newer turn on the same session overwrites the item.
+        if item.get('status') == 'completed' and turn_id and item.get('turnId') == turn_id:
+            cache_put(cache_key, body, etag)
+            return create_cached_response(body, etag, COMPLETED_CACHE_CONTROL, if_none_match)
+
+        return create_cached_response(body, etag, REVALIDATE_CACHE_CONTROL, if_none_match)
+
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                'Cache-Control': 'no-store'
             },
             'body': json.dumps({'errorMessage': str(e)})
-        }
\ No newline at end of file
+        }
+
+
+def is_lease_expired(item):
+    """True once the worker's heartbeat lease has lapsed (items without a lease never expire)"""
+    lease_expires_at = item.get('leaseExpiresAt')
+    return lease_expires_at is not None and int(lease_expires_at) < time.time()
+
+
+def format_lanes(lanes, stale=False):
+    """Per-agent lanes of a compare-mode turn (None for single-agent turns)"""
+    if not lanes:
+        return None
+    return {
+        agent_type: {
+            'status': 'stale' if stale and lane.get('status') == 'processing' else lane.get('status'),
+            'response': lane.get('response', ''),
+            'totalChunks': len(lane.get('chunks', [])),
+            'errorMessage': lane.get('errorMessage')
+        }
+        for agent_type, lane in lanes.items()
+    }
+
+
+def get_header(event, name):
+    """Case-insensitive header lookup (HTTP API lowercases, REST API does not)"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def make_etag(body):
+    """Strong ETag derived from the serialized body"""
+    return '"' + hashlib.sha1(body.encode('utf-8')).hexdigest() + '"'
+
+
+def cache_get(key):
+    """Return (body, etag) for a cached completed turn and mark it most recently used"""
+    entry = completed_cache.get(key)
+    if entry is not None:
+        completed_cache.move_to_end(key)
+    return entry
+
+
+def cache_put(key, body, etag):
+    """Store a serialized completed turn, evicting least recently used entries over the byte budget"""
+    global completed_cache_bytes
+    size = len(body)
+    if size > COMPLETED_CACHE_MAX_BYTES:
+        return
+    if key in completed_cache:
+        completed_cache_bytes -= len(completed_cache.pop(key)[0])
+    completed_cache[key] = (body, etag)
+    completed_cache_bytes += size
+    while completed_cache_bytes > COMPLETED_CACHE_MAX_BYTES:
+        _, (evicted_body, _) = completed_cache.popitem(last=False)
+        completed_cache_bytes -= len(evicted_body)
+
+
+def create_cached_response(body, etag, cache_control, if_none_match):
+    """Create HTTP response with validators, answering 304 when the client already has this body"""
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag',
+        'Cache-Control': cache_control,
+        'ETag': etag
+    }
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+    return {'statusCode': 200, 'headers': headers, 'body': body}
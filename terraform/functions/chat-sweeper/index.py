@@ -0,0 +1,98 @@
+import json
+import boto3
+import os
+import time
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+
+# Initialize DynamoDB
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(os.environ['CHAT_SESSIONS_TABLE_NAME'])
+
+# Sparse index holding only items whose worker has not written a terminal status
+IN_FLIGHT_INDEX_NAME = os.environ.get('IN_FLIGHT_INDEX_NAME', 'in-flight-index')
+
+# Extra seconds past lease expiry before a turn is finalized (absorbs clock skew)
+SWEEP_GRACE_SECONDS = int(os.environ.get('SWEEP_GRACE_SECONDS', 5))
+
+# Same wording chat-status reports for a lapsed lease
+STALE_ERROR_MESSAGE = 'The response was interrupted before it finished.'
+
+
+def handler(event, context):
+    """
+    Scheduled Lambda that finalizes abandoned chat turns.
+    A turn whose worker timed out or crashed stays 'processing' with a lapsed
+    leaseExpiresAt. Those items are found with one query on the sparse
+    in-flight index (no table scan) and marked 'stale', keeping the partial
+    chunks and response. Items that finished without leaving the index are
+    removed from it.
+    """
+    cutoff = int(time.time()) - SWEEP_GRACE_SECONDS
+    finalized, released, skipped = 0, 0, 0
+
+    for item in find_expired_leases(cutoff):
+        try:
+            if item.get('status') == 'processing':
+                finalize_stale_turn(item, cutoff)
+                finalized += 1
+            else:
+                release_finished_turn(item)
+                released += 1
+        except ClientError as db_error:
+            if db_error.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            # Lease renewed or turn replaced since the query; leave it alone
+            skipped += 1
+
+    summary = {'finalized': finalized, 'released': released, 'skipped': skipped, 'cutoff': cutoff}
+    print(f'Sweep complete: {json.dumps(summary)}')
+    return summary
+
+
+def find_expired_leases(cutoff):
+    """Yield in-flight items whose lease expired before cutoff, following pagination"""
+    query = {
+        'IndexName': IN_FLIGHT_INDEX_NAME,
+        'KeyConditionExpression': 'inFlight = :inFlight AND leaseExpiresAt < :cutoff',
+        'ExpressionAttributeValues': {':inFlight': 'true', ':cutoff': cutoff}
+    }
+    while True:
+        response = table.query(**query)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def finalize_stale_turn(item, cutoff):
+    """Mark a dead turn stale, unless its worker renewed the lease or a new turn took over"""
+    table.update_item(
+        Key={'sessionId': item['sessionId']},
+        UpdateExpression='SET #status = :stale, errorMessage = :error, staleAt = :now REMOVE inFlight',
+        ConditionExpression='turnId = :turnId AND #status = :processing AND leaseExpiresAt < :cutoff',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':stale': 'stale',
+            ':error': STALE_ERROR_MESSAGE,
+            ':now': datetime.now(timezone.utc).isoformat(),
+            ':turnId': item['turnId'],
+            ':processing': 'processing',
+            ':cutoff': cutoff
+        }
+    )
+    print(f'Finalized stale turn {item["turnId"]} on session {item["sessionId"]}')
+
+
+def release_finished_turn(item):
+    """Drop a turn that already reached a terminal status from the in-flight index"""
+    table.update_item(
+        Key={'sessionId': item['sessionId']},
+        UpdateExpression='REMOVE inFlight',
+        ConditionExpression='turnId = :turnId AND #status <> :processing',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={
+            ':turnId': item['turnId'],
+            ':processing': 'processing'
+        }
+    )
@@ -6,6 +6,12 @@ import jwt
 import uuid
 from datetime import datetime, timezone
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from stream_assembler import StreamAssembler
+from lease_heartbeat import LeaseHeartbeat
+from usage_meter import UsageMeter
+from search_index import META_KEY, analyze, doc_key, encode_segment, segment_key
 
 # Initialize Bedrock Agent Runtime client
 bedrock_agent_runtime = boto3.client(
@@ -15,17 +21,56 @@ bedrock_agent_runtime = boto3.client(
 
 # Initialize DynamoDB
 dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['CHAT_SESSIONS_TABLE_NAME'])
+CHAT_SESSIONS_TABLE_NAME = os.environ['CHAT_SESSIONS_TABLE_NAME']
+table = dynamodb.Table(CHAT_SESSIONS_TABLE_NAME)
+
+# boto3 resources are not thread-safe, clients are. Code running on worker
+# threads (compare lanes, lease heartbeat) uses the resource's own low-level
+# client, which still accepts and returns plain Python values, with TableName
+# passed explicitly.
+dynamodb_client = dynamodb.meta.client
+
+# Per-user daily usage buckets (accounting is skipped if not configured)
+usage_table = dynamodb.Table(os.environ['USAGE_TABLE_NAME']) if os.environ.get('USAGE_TABLE_NAME') else None
+
+# Per-user full-text search index (completed turns are not indexed if not configured)
+search_table = dynamodb.Table(os.environ['SEARCH_INDEX_TABLE_NAME']) if os.environ.get('SEARCH_INDEX_TABLE_NAME') else None
+
+# Longest message/response text kept on a search document for snippets
+SEARCH_DOC_TEXT_MAX = 16000
 
 # JWT configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 
+# Chunks between cancellation checks (piggybacked on progress writes when possible)
+CANCEL_CHECK_INTERVAL = 3
+
+# Progress writes only land while this turn owns the item and nobody asked to cancel it
+TURN_ACTIVE_CONDITION = 'turnId = :turnId AND attribute_not_exists(cancelRequested)'
+
+# Segment boundary for stored chunks: word, line or markdown (never splits a code fence)
+STREAM_FLUSH_BOUNDARY = os.environ.get('STREAM_FLUSH_BOUNDARY', 'markdown')
+
+# Worker liveness lease: renewed every HEARTBEAT_INTERVAL_SECONDS while streaming.
+# Once it lapses, chat-status reports the turn as stale and the sweeper finalizes it.
+LEASE_SECONDS = int(os.environ.get('LEASE_SECONDS', 15))
+HEARTBEAT_INTERVAL_SECONDS = int(os.environ.get('HEARTBEAT_INTERVAL_SECONDS', 5))
+
+# Specialist agents available to compare mode (ids match list-agents AGENTS)
+SPECIALIST_AGENTS = {
+    'generic': (os.environ.get('GENERIC_AGENT_ID'), os.environ.get('GENERIC_AGENT_ALIAS_ID')),
+    'coding': (os.environ.get('CODING_AGENT_ID'), os.environ.get('CODING_AGENT_ALIAS_ID')),
+    'financial': (os.environ.get('FINANCIAL_AGENT_ID'), os.environ.get('FINANCIAL_AGENT_ALIAS_ID'))
+}
+
 
 def handler(event, context):
     """
     Lambda handler for chat with Bedrock Agents.
     Returns immediately with sessionId for polling approach.
     Processes agent streaming in background and updates DynamoDB.
+    A background heartbeat keeps leaseExpiresAt fresh while this worker is alive.
+    Usage is metered in memory and written once per invocation to the usage table.
     
     NOTE: Always returns 200 status with error details in body for API Gateway compatibility.
     """
@@ -53,7 +98,11 @@ def handler(event, context):
         body = json.loads(event.get('body', '{}'))
         message = body.get('message', '')
         session_id = body.get('sessionId') or str(uuid.uuid4())
+        # Each message is a new turn on the session; completed turns are immutable per turnId.
+        # Clients may mint it themselves (a UUID) so they can cancel before this request returns.
+        turn_id = body.get('turnId') or str(uuid.uuid4())
         requested_agent_type = body.get('agentType', 'supervisor')
+        mode = body.get('mode', 'single')
         
         if not message:
             return create_response(200, {
@@ -62,45 +111,126 @@ def handler(event, context):
                 'errorType': 'validation'
             })
         
-        # Always use Supervisor Agent (it has collaborators for delegation)
-        agent_id = os.environ.get('SUPERVISOR_AGENT_ID')
-        agent_alias_id = os.environ.get('SUPERVISOR_AGENT_ALIAS_ID')
+        if not is_uuid(turn_id):
+            return create_response(200, {
+                'success': False,
+                'error': 'turnId must be a UUID',
+                'errorType': 'validation'
+            })
         
-        if not agent_id or not agent_alias_id:
+        if mode == 'compare':
+            # Compare mode: ask several specialists directly, in parallel
+            lane_agent_types = body.get('agentTypes') or list(SPECIALIST_AGENTS.keys())
+            lane_agents = {}
+            for agent_type in lane_agent_types:
+                lane_agent_id, lane_alias_id = SPECIALIST_AGENTS.get(agent_type, (None, None))
+                if not lane_agent_id or not lane_alias_id:
+                    return create_response(200, {
+                        'success': False,
+                        'error': f'Agent "{agent_type}" is not available for compare mode',
+                        'errorType': 'validation'
+                    })
+                lane_agents[agent_type] = (lane_agent_id, lane_alias_id)
+        elif mode == 'single':
+            # Always use Supervisor Agent (it has collaborators for delegation)
+            agent_id = os.environ.get('SUPERVISOR_AGENT_ID')
+            agent_alias_id = os.environ.get('SUPERVISOR_AGENT_ALIAS_ID')
+            
+            if not agent_id or not agent_alias_id:
+                return create_response(200, {
+                    'success': False,
+                    'error': 'Agent service is not configured properly',
+                    'errorType': 'config'
+                })
+        else:
             return create_response(200, {
                 'success': False,
-                'error': 'Agent service is not configured properly',
-                'errorType': 'config'
+                'error': f'Unknown chat mode: {mode}',
+                'errorType': 'validation'
             })
         
-        # Initialize session in DynamoDB with status 'processing'
-        table.put_item(Item={
+        heartbeat = LeaseHeartbeat(
+            dynamodb_client, CHAT_SESSIONS_TABLE_NAME, session_id, turn_id,
+            lease_seconds=LEASE_SECONDS,
+            interval_seconds=HEARTBEAT_INTERVAL_SECONDS,
+            deadline=time.time() + context.get_remaining_time_in_millis() / 1000 if context else None
+        )
+        
+        # Initialize session in DynamoDB with status 'processing'.
+        # inFlight keys the sparse in-flight index the sweeper queries; terminal writes remove it.
+        session_item = {
             'sessionId': session_id,
+            'turnId': turn_id,
             'userId': user_id,
             'status': 'processing',
+            'mode': mode,
             'requestedAgentType': requested_agent_type,
             'message': message,
             'response': '',
             'chunks': [],
             'createdAt': datetime.now(timezone.utc).isoformat(),
+            'leaseExpiresAt': heartbeat.lease_expiry(),
+            'inFlight': 'true',
             'ttl': int(time.time()) + 86400
-        })
-        
-        # Process the agent response
+        }
+        if mode == 'compare':
+            session_item['lanes'] = {
+                agent_type: {'status': 'processing', 'response': '', 'chunks': []}
+                for agent_type in lane_agents
+            }
         try:
-            process_agent_streaming(
-                agent_id=agent_id,
-                agent_alias_id=agent_alias_id,
-                session_id=session_id,
-                message=message
+            # A turnId runs once: chat-status caches a completed turn as immutable, so
+            # a retried POST must not reopen it (a new turn on the session is fine)
+            table.put_item(
+                Item=session_item,
+                ConditionExpression='attribute_not_exists(sessionId) OR turnId <> :turnId',
+                ExpressionAttributeValues={':turnId': turn_id}
             )
+        except ClientError as db_error:
+            if not is_conditional_check_failure(db_error):
+                raise
+            return create_response(200, {
+                'success': False,
+                'error': 'This turn was already submitted. Send the message again with a new turnId.',
+                'errorType': 'validation',
+                'sessionId': session_id,
+                'turnId': turn_id
+            })
+        
+        meter = UsageMeter(usage_table, user_id)
+        meter.add(turns=1, compareTurns=1 if mode == 'compare' else 0, messageBytes=len(message.encode('utf-8')))
+        
+        # Process the agent response, holding the lease for as long as this worker is alive
+        try:
+            with heartbeat:
+                if mode == 'compare':
+                    final_status = process_agent_compare(
+                        lane_agents=lane_agents,
+                        session_id=session_id,
+                        turn_id=turn_id,
+                        message=message,
+                        meter=meter,
+                        user_id=user_id
+                    )
+                else:
+                    final_status = process_agent_streaming(
+                        agent_id=agent_id,
+                        agent_alias_id=agent_alias_id,
+                        session_id=session_id,
+                        turn_id=turn_id,
+                        message=message,
+                        meter=meter,
+                        user_id=user_id
+                    )
+            meter.add(cancelledTurns=1 if final_status == 'cancelled' else 0)
             
             # Return success with sessionId for polling
             return create_response(200, {
                 'success': True,
                 'sessionId': session_id,
-                'status': 'processing',
-                'message': 'Response is being processed. Poll /api/chat/status/{sessionId} for updates.'
+                'turnId': turn_id,
+                'status': 'cancelled' if final_status == 'cancelled' else 'processing',
+                'message': 'Response is being processed. Poll /api/chat/status/{sessionId}?turnId={turnId} for updates.'
             })
             
         except Exception as agent_error:
@@ -109,17 +239,25 @@ def handler(event, context):
             
             # Check if it's a throttling error
             is_throttling = 'throttlingException' in error_str or 'ThrottlingException' in error_str or 'rate' in error_str.lower()
+            meter.add(errorTurns=1, throttledTurns=1 if is_throttling else 0)
             
-            # Update DynamoDB with error
-            table.update_item(
-                Key={'sessionId': session_id},
-                UpdateExpression='SET #status = :status, errorMessage = :error',
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues={
-                    ':status': 'error',
-                    ':error': error_str
-                }
-            )
+            # Update DynamoDB with error (skipped if a newer turn has taken over the item)
+            try:
+                table.update_item(
+                    Key={'sessionId': session_id},
+                    UpdateExpression='SET #status = :status, errorMessage = :error REMOVE inFlight',
+                    ConditionExpression='turnId = :turnId',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={
+                        ':status': 'error',
+                        ':error': error_str,
+                        ':turnId': turn_id
+                    }
+                )
+            except ClientError as db_error:
+                if not is_conditional_check_failure(db_error):
+                    raise
+                print(f'Turn {turn_id} was superseded, error update skipped')
             
             # Return user-friendly error message (still 200 status for API Gateway)
             if is_throttling:
@@ -138,6 +276,9 @@ def handler(event, context):
                     'sessionId': session_id,
                     'details': error_str
                 })
+        
+        finally:
+            flush_usage(meter)
             
     except Exception as e:
         print(f'Error: {str(e)}')
@@ -170,19 +311,60 @@ def verify_token(event):
         raise Exception(f'Auth failed: {str(e)}')
 
 
-def process_agent_streaming(agent_id, agent_alias_id, session_id, message):
+class GenerationCancelled(Exception):
+    """Raised by progress callbacks when the turn was cancelled or superseded by a newer turn"""
+
+
+def flush_usage(meter):
+    """Write the invocation's usage counters; accounting failures never fail the chat"""
+    try:
+        if meter.flush():
+            print(f'Usage flushed for {meter.user_id}')
+    except Exception as usage_error:
+        print(f'Usage flush error: {usage_error}')
+
+
+def is_uuid(value):
+    """True for a hyphenated UUID string, such as the ones crypto.randomUUID() mints"""
+    try:
+        return isinstance(value, str) and str(uuid.UUID(value)) == value.lower()
+    except ValueError:
+        return False
+
+
+def is_conditional_check_failure(error):
+    return isinstance(error, ClientError) and \
+        error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+
+def is_turn_cancelled(session_id, turn_id):
+    """Cheap cancellation probe: projected, eventually consistent read of two attributes (thread-safe)"""
+    item = dynamodb_client.get_item(
+        TableName=CHAT_SESSIONS_TABLE_NAME,
+        Key={'sessionId': session_id},
+        ProjectionExpression='turnId, cancelRequested'
+    ).get('Item', {})
+    return bool(item.get('cancelRequested')) or item.get('turnId') != turn_id
+
+
+def stream_agent_response(agent_id, agent_alias_id, session_id, message, on_progress, is_cancelled, log_prefix='Chunk', meter=None):
     """
-    Process Bedrock Agent streaming response.
-    Updates DynamoDB progressively with chunks.
+    Invoke a Bedrock Agent and assemble its streamed chunks.
+    Raw chunk bytes go through a StreamAssembler, so stored chunks are
+    flush-ready segments (see STREAM_FLUSH_BOUNDARY) and multibyte characters
+    split across Bedrock chunks decode correctly.
     
-    The Supervisor Agent will automatically delegate to specialist agents:
-    - Coding questions → Coding Agent
-    - Financial questions → Financial Agent  
-    - General questions → Generic Agent
-    """
-    print(f'Invoking Supervisor Agent: {agent_id[:8]}... (will delegate to specialists)')
+    Every CANCEL_CHECK_INTERVAL chunks, new segments are handed to
+    on_progress(chunks, full_response), which raises GenerationCancelled if
+    the turn was cancelled. With nothing new to write, is_cancelled() is asked
+    instead. On cancellation the stream is closed early instead of drained.
+    
+    Chunks, bytes and Bedrock time of the invocation are added to meter,
+    even if the stream fails part way.
     
-    # Invoke the Supervisor Agent with streaming
+    Returns (chunks, full_response, cancelled).
+    """
+    started = time.time()
     response = bedrock_agent_runtime.invoke_agent(
         agentId=agent_id,
         agentAliasId=agent_alias_id,
@@ -191,57 +373,289 @@ def process_agent_streaming(agent_id, agent_alias_id, session_id, message):
         enableTrace=False
     )
     
-    full_response = ''
-    chunks = []
+    assembler = StreamAssembler(STREAM_FLUSH_BOUNDARY)
     chunk_index = 0
+    saved_segments = 0
+    cancelled = False
+    response_bytes = 0
+    first_chunk_ms = None
     
     event_stream = response.get('completion', [])
     
-    for event in event_stream:
-        if 'chunk' in event:
-            chunk = event['chunk']
-            if 'bytes' in chunk:
-                chunk_text = chunk['bytes'].decode('utf-8')
-                full_response += chunk_text
-                chunks.append(chunk_text)
-                chunk_index += 1
-                
-                print(f'Chunk {chunk_index}: {chunk_text[:50]}...')
-                
-                # Update DynamoDB every 3 chunks
-                if chunk_index % 3 == 0:
+    try:
+        for event in event_stream:
+            if 'chunk' in event:
+                chunk = event['chunk']
+                if 'bytes' in chunk:
+                    assembler.feed(chunk['bytes'])
+                    chunk_index += 1
+                    response_bytes += len(chunk['bytes'])
+                    if first_chunk_ms is None:
+                        first_chunk_ms = int((time.time() - started) * 1000)
+                    
+                    print(f'{log_prefix} {chunk_index}: {len(chunk["bytes"])} bytes, {len(assembler.segments)} segments ready')
+                    
+                    if chunk_index % CANCEL_CHECK_INTERVAL != 0:
+                        continue
+                    
                     try:
-                        table.update_item(
-                            Key={'sessionId': session_id},
-                            UpdateExpression='SET chunks = :chunks, #resp = :resp, lastUpdated = :lastUpdated',
-                            ExpressionAttributeNames={'#resp': 'response'},
-                            ExpressionAttributeValues={
-                                ':chunks': chunks,
-                                ':resp': full_response,
-                                ':lastUpdated': datetime.now(timezone.utc).isoformat()
-                            }
-                        )
-                        print(f'Updated DynamoDB with {len(chunks)} chunks')
+                        # Update DynamoDB every few chunks (only if there is something new to show)
+                        if len(assembler.segments) > saved_segments:
+                            on_progress(assembler.segments, assembler.text())
+                            saved_segments = len(assembler.segments)
+                        elif is_cancelled():
+                            raise GenerationCancelled()
+                    except GenerationCancelled:
+                        print(f'{log_prefix}: generation cancelled after {chunk_index} chunks, closing stream')
+                        cancelled = True
+                        break
                     except Exception as db_error:
                         print(f'DynamoDB update error: {db_error}')
     
-    # Final update
-    table.update_item(
-        Key={'sessionId': session_id},
-        UpdateExpression='SET #status = :status, chunks = :chunks, #resp = :resp, completedAt = :completedAt',
-        ExpressionAttributeNames={
-            '#status': 'status',
-            '#resp': 'response'
-        },
-        ExpressionAttributeValues={
-            ':status': 'completed',
-            ':chunks': chunks,
-            ':resp': full_response,
-            ':completedAt': datetime.now(timezone.utc).isoformat()
-        }
+    finally:
+        if meter is not None:
+            meter.record_invocation(chunk_index, response_bytes, int((time.time() - started) * 1000), first_chunk_ms)
+    
+    if cancelled and hasattr(event_stream, 'close'):
+        event_stream.close()
+    
+    assembler.finish()
+    return assembler.segments, assembler.text(), cancelled
+
+
+def process_agent_streaming(agent_id, agent_alias_id, session_id, turn_id, message, meter=None, user_id=None):
+    """
+    Process Bedrock Agent streaming response.
+    Updates DynamoDB progressively with chunks.
+    
+    The Supervisor Agent will automatically delegate to specialist agents:
+    - Coding questions → Coding Agent
+    - Financial questions → Financial Agent  
+    - General questions → Generic Agent
+    
+    A completed turn is added to the user's search index.
+    
+    Returns the final status ('completed' or 'cancelled').
+    """
+    print(f'Invoking Supervisor Agent: {agent_id[:8]}... (will delegate to specialists)')
+    
+    def save_progress(chunks, full_response):
+        try:
+            table.update_item(
+                Key={'sessionId': session_id},
+                UpdateExpression='SET chunks = :chunks, #resp = :resp, lastUpdated = :lastUpdated',
+                ConditionExpression=TURN_ACTIVE_CONDITION,
+                ExpressionAttributeNames={'#resp': 'response'},
+                ExpressionAttributeValues={
+                    ':chunks': chunks,
+                    ':resp': full_response,
+                    ':lastUpdated': datetime.now(timezone.utc).isoformat(),
+                    ':turnId': turn_id
+                }
+            )
+        except ClientError as db_error:
+            if is_conditional_check_failure(db_error):
+                raise GenerationCancelled()
+            raise
+        print(f'Updated DynamoDB with {len(chunks)} chunks')
+    
+    chunks, full_response, cancelled = stream_agent_response(
+        agent_id, agent_alias_id, session_id, message, save_progress,
+        lambda: is_turn_cancelled(session_id, turn_id),
+        meter=meter
     )
+    status = 'cancelled' if cancelled else 'completed'
+    
+    # Final update (skipped if a newer turn has taken over the item)
+    try:
+        table.update_item(
+            Key={'sessionId': session_id},
+            UpdateExpression='SET #status = :status, chunks = :chunks, #resp = :resp, completedAt = :completedAt REMOVE inFlight',
+            ConditionExpression='turnId = :turnId',
+            ExpressionAttributeNames={
+                '#status': 'status',
+                '#resp': 'response'
+            },
+            ExpressionAttributeValues={
+                ':status': status,
+                ':chunks': chunks,
+                ':resp': full_response,
+                ':completedAt': datetime.now(timezone.utc).isoformat(),
+                ':turnId': turn_id
+            }
+        )
+        if status == 'completed' and user_id:
+            index_turn(user_id, session_id, turn_id, message, full_response)
+    except ClientError as db_error:
+        if not is_conditional_check_failure(db_error):
+            raise
+        print(f'Turn {turn_id} was superseded, final update skipped')
+    
+    print(f'Agent response {status}. Total chunks: {len(chunks)}, Total length: {len(full_response)}')
+    return status
+
+
+def index_turn(user_id, session_id, turn_id, message, full_response):
+    """
+    Add a completed turn to the user's search index.
+    Allocates the next document number with an atomic counter, then writes the
+    document (text for snippets) and a single-document postings segment.
+    The search Lambda merges small segments; indexing errors never fail the chat.
+    """
+    if search_table is None:
+        return
+    try:
+        docnum = int(search_table.update_item(
+            Key={'userId': user_id, 'sk': META_KEY},
+            UpdateExpression='ADD docCount :one',
+            ExpressionAttributeValues={':one': 1},
+            ReturnValues='UPDATED_NEW'
+        )['Attributes']['docCount'])
+        
+        term_freqs, length = analyze(message, full_response)
+        search_table.put_item(Item={
+            'userId': user_id,
+            'sk': doc_key(docnum),
+            'sessionId': session_id,
+            'turnId': turn_id,
+            'message': message[:SEARCH_DOC_TEXT_MAX],
+            'response': full_response[:SEARCH_DOC_TEXT_MAX],
+            'createdAt': datetime.now(timezone.utc).isoformat()
+        })
+        search_table.put_item(Item={
+            'userId': user_id,
+            'sk': segment_key(docnum, docnum),
+            'postings': encode_segment({docnum: (term_freqs, length)}),
+            'docCount': 1
+        })
+        print(f'Indexed turn {turn_id} as document {docnum} ({len(term_freqs)} terms)')
+    except Exception as index_error:
+        print(f'Search indexing error: {index_error}')
+
+
+def process_agent_compare(lane_agents, session_id, turn_id, message, meter=None, user_id=None):
+    """
+    Invoke several specialist agents concurrently for one message.
+    Each agent streams into its own lane (lanes.<agentType>) of the session item,
+    so wall-clock time is the slowest agent rather than the sum of all of them.
+    
+    The turn completes if at least one lane completes; failed lanes keep their
+    own errorMessage. If every lane fails, the first error is raised. A cancel
+    request stops every lane and marks the turn cancelled.
+    
+    A completed turn is added to the user's search index as one document
+    holding the responses of its completed lanes.
+    
+    Returns the final status ('completed' or 'cancelled').
+    """
+    print(f'Compare mode: invoking {", ".join(lane_agents)} in parallel')
+    lane_responses = {}
+    
+    # Runs on lane threads, so it goes through the thread-safe client
+    def update_lane(agent_type, update_expression, names, values, condition):
+        try:
+            dynamodb_client.update_item(
+                TableName=CHAT_SESSIONS_TABLE_NAME,
+                Key={'sessionId': session_id},
+                UpdateExpression=update_expression,
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#lane': agent_type, **names},
+                ExpressionAttributeValues={':turnId': turn_id, **values}
+            )
+        except ClientError as db_error:
+            if is_conditional_check_failure(db_error):
+                raise GenerationCancelled()
+            raise
+    
+    def run_lane(agent_type, agent_id, agent_alias_id):
+        def save_progress(chunks, full_response):
+            update_lane(
+                agent_type,
+                'SET lanes.#lane.chunks = :chunks, lanes.#lane.#resp = :resp, lastUpdated = :lastUpdated',
+                {'#resp': 'response'},
+                {
+                    ':chunks': chunks,
+                    ':resp': full_response,
+                    ':lastUpdated': datetime.now(timezone.utc).isoformat()
+                },
+                TURN_ACTIVE_CONDITION
+            )
+        
+        try:
+            chunks, full_response, cancelled = stream_agent_response(
+                agent_id, agent_alias_id, session_id, message, save_progress,
+                lambda: is_turn_cancelled(session_id, turn_id),
+                log_prefix=f'[{agent_type}] Chunk',
+                meter=meter
+            )
+        except Exception as lane_error:
+            print(f'[{agent_type}] Lane error: {lane_error}')
+            try:
+                update_lane(
+                    agent_type,
+                    'SET lanes.#lane.#status = :status, lanes.#lane.errorMessage = :error',
+                    {'#status': 'status'},
+                    {':status': 'error', ':error': str(lane_error)},
+                    'turnId = :turnId'
+                )
+            except GenerationCancelled:
+                pass
+            return lane_error
+        
+        lane_status = 'cancelled' if cancelled else 'completed'
+        if lane_status == 'completed':
+            lane_responses[agent_type] = full_response
+        try:
+            update_lane(
+                agent_type,
+                'SET lanes.#lane.#status = :status, lanes.#lane.chunks = :chunks, lanes.#lane.#resp = :resp',
+                {'#status': 'status', '#resp': 'response'},
+                {
+                    ':status': lane_status,
+                    ':chunks': chunks,
+                    ':resp': full_response
+                },
+                'turnId = :turnId'
+            )
+        except GenerationCancelled:
+            print(f'[{agent_type}] Turn {turn_id} was superseded, lane update skipped')
+        print(f'[{agent_type}] Lane {lane_status}. Total chunks: {len(chunks)}, Total length: {len(full_response)}')
+        return lane_status
+    
+    with ThreadPoolExecutor(max_workers=len(lane_agents)) as executor:
+        futures = [
+            executor.submit(run_lane, agent_type, agent_id, agent_alias_id)
+            for agent_type, (agent_id, agent_alias_id) in lane_agents.items()
+        ]
+        lane_results = [future.result() for future in futures]
+    
+    lane_errors = [result for result in lane_results if isinstance(result, Exception)]
+    if len(lane_errors) == len(lane_results):
+        raise lane_errors[0]
+    
+    status = 'cancelled' if 'cancelled' in lane_results else 'completed'
+    try:
+        table.update_item(
+            Key={'sessionId': session_id},
+            UpdateExpression='SET #status = :status, completedAt = :completedAt REMOVE inFlight',
+            ConditionExpression='turnId = :turnId',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':status': status,
+                ':completedAt': datetime.now(timezone.utc).isoformat(),
+                ':turnId': turn_id
+            }
+        )
+        if status == 'completed' and user_id:
+            index_turn(user_id, session_id, turn_id, message,
+                       '\n\n'.join(lane_responses[agent_type] for agent_type in lane_agents if agent_type in lane_responses))
+    except ClientError as db_error:
+        if not is_conditional_check_failure(db_error):
+            raise
+        print(f'Turn {turn_id} was superseded, final update skipped')
     
-    print(f'Agent response completed. Total chunks: {len(chunks)}, Total length: {len(full_response)}')
+    print(f'Compare {status}: {lane_results.count("completed")}/{len(lane_results)} lanes completed')
+    return status
 
 
 def create_response(status_code, body):
@@ -0,0 +1,91 @@
+import math
+import threading
+import time
+from botocore.exceptions import ClientError
+
+# Renewals only land while this turn still owns the item and is unfinished
+LEASE_HELD_CONDITION = 'turnId = :turnId AND #status = :processing'
+
+
+class LeaseHeartbeat:
+    """
+    Background lease renewal for an in-flight turn.
+
+    While the worker is alive, leaseExpiresAt (epoch seconds) on the session
+    item is pushed forward every interval_seconds by a single-attribute update.
+    Renewal runs on its own thread, so a long silence from the agent (e.g. the
+    supervisor delegating to a collaborator) does not look like a dead worker.
+
+    If the Lambda times out or crashes, the thread dies with it and the lease
+    lapses; chat-status and the sweeper use that to tell a dead worker from a
+    slow one. The lease is never extended past the invocation deadline plus
+    grace_seconds, so a timeout is visible almost as soon as it happens.
+
+    Renewals are made from the heartbeat thread, so they go through a
+    low-level DynamoDB client (thread-safe, unlike resources) rather than a
+    Table; pass the resource's meta.client to keep plain Python values.
+    """
+
+    def __init__(self, client, table_name, session_id, turn_id, lease_seconds=15, interval_seconds=5,
+                 deadline=None, grace_seconds=2):
+        self.client = client
+        self.table_name = table_name
+        self.session_id = session_id
+        self.turn_id = turn_id
+        self.lease_seconds = lease_seconds
+        self.interval_seconds = interval_seconds
+        self.deadline = deadline
+        self.grace_seconds = grace_seconds
+        self.renewals = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def lease_expiry(self):
+        """Lease end for a renewal made now, capped at the invocation deadline"""
+        expiry = time.time() + self.lease_seconds
+        if self.deadline is not None:
+            expiry = min(expiry, self.deadline + self.grace_seconds)
+        return int(math.ceil(expiry))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'lease-{self.turn_id}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def renew(self):
+        self.client.update_item(
+            TableName=self.table_name,
+            Key={'sessionId': self.session_id},
+            UpdateExpression='SET leaseExpiresAt = :lease',
+            ConditionExpression=LEASE_HELD_CONDITION,
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':lease': self.lease_expiry(),
+                ':turnId': self.turn_id,
+                ':processing': 'processing'
+            }
+        )
+        self.renewals += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                self.renew()
+            except ClientError as db_error:
+                if db_error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                    # Turn finished or was superseded; nothing left to keep alive
+                    return
+                print(f'Lease renewal error: {db_error}')
+            except Exception as renew_error:
+                print(f'Lease renewal error: {renew_error}')
@@ -0,0 +1,124 @@
+import codecs
+import re
+
+# Fence markers that open/close a markdown code block
+FENCE_MARKERS = ('```', '~~~')
+
+# Enough of a line's start to recognise an indented fence marker
+LINE_HEAD_LENGTH = 16
+
+# A line that opens or closes a fence: a marker within its first LINE_HEAD_LENGTH characters
+FENCE_LINE = re.compile(r'^[^\S\n]{0,%d}(?:```|~~~)' % (LINE_HEAD_LENGTH - 3), re.MULTILINE)
+
+# Everything up to and including the last whitespace character
+UP_TO_LAST_SPACE = re.compile(r'.*\s', re.DOTALL)
+
+
+class StreamAssembler:
+    """
+    Incremental assembler for Bedrock Agent chunk streams.
+
+    Raw chunk bytes are decoded incrementally as UTF-8 (undecodable bytes are
+    replaced), so multibyte characters split across chunks are reassembled
+    instead of raising. Decoded text is released as flush-ready segments that
+    end on a boundary:
+
+    - 'word':     after the last whitespace character
+    - 'line':     after the last newline
+    - 'markdown': after the last newline outside a code fence, so a fenced
+                  block is only ever released whole
+
+    Emitted segments are the only copy of the text. The full response is
+    joined on demand rather than accumulated alongside them.
+
+    feed() runs once per Bedrock chunk, so boundary scans only look at the
+    newly decoded text and use str/re searches rather than per-character loops.
+    """
+
+    def __init__(self, boundary='markdown'):
+        scanners = {'word': self._scan_word, 'line': self._scan_line, 'markdown': self._scan_markdown}
+        if boundary not in scanners:
+            raise ValueError(f'Unknown flush boundary: {boundary}')
+        self.boundary = boundary
+        self.segments = []
+        self._scan = scanners[boundary]
+        self._undecoded = b''    # trailing bytes of an incomplete character
+        self._pending = []       # decoded pieces not yet emitted
+        self._pending_length = 0
+        self._flush_at = 0       # offset within pending of the last safe boundary
+        self._line_head = ''     # start of the current line (markdown mode)
+        self._in_fence = False
+
+    def feed(self, data):
+        """Add raw chunk bytes and return any newly flush-ready segments"""
+        if self._undecoded:
+            data = self._undecoded + data
+        text, consumed = codecs.utf_8_decode(data, 'replace', False)
+        self._undecoded = data[consumed:]
+        if not text:
+            return []
+        self._scan(text, self._pending_length)
+        self._pending.append(text)
+        self._pending_length += len(text)
+        if self._flush_at:
+            return self._emit(self._flush_at)
+        return []
+
+    def finish(self):
+        """Flush the decoder and release everything still pending"""
+        if self._undecoded:
+            self._pending.append(codecs.utf_8_decode(self._undecoded, 'replace', True)[0])
+            self._pending_length += len(self._pending[-1])
+            self._undecoded = b''
+        return self._emit(self._pending_length)
+
+    def text(self):
+        """Full text emitted so far"""
+        return ''.join(self.segments)
+
+    # Each scanner advances the last safe boundary using only the newly decoded text
+
+    def _scan_word(self, text, offset):
+        match = UP_TO_LAST_SPACE.match(text)
+        if match:
+            self._flush_at = offset + match.end()
+
+    def _scan_line(self, text, offset):
+        index = text.rfind('\n')
+        if index >= 0:
+            self._flush_at = offset + index + 1
+
+    def _scan_markdown(self, text, offset):
+        last_newline = text.rfind('\n')
+        if last_newline < 0:
+            if len(self._line_head) < LINE_HEAD_LENGTH:
+                self._line_head += text[:LINE_HEAD_LENGTH]
+            return
+        # Complete lines only; the first one continues the line carried over in _line_head
+        lines = self._line_head + text[:last_newline + 1]
+        in_fence, opened_at = self._in_fence, -1
+        for match in FENCE_LINE.finditer(lines):
+            in_fence = not in_fence
+            if in_fence:
+                opened_at = match.start()
+        if not in_fence:
+            self._flush_at = offset + last_newline + 1
+        elif opened_at > 0:
+            # Up to the start of the line opening the unfinished fence
+            self._flush_at = offset + opened_at - len(self._line_head)
+        self._in_fence = in_fence
+        self._line_head = text[last_newline + 1:last_newline + 1 + LINE_HEAD_LENGTH]
+
+    def _emit(self, end):
+        """Release pending text up to end as one segment"""
+        if end <= 0:
+            return []
+        pending = self._pending[0] if len(self._pending) == 1 else ''.join(self._pending)
+        if end == len(pending):
+            segment, self._pending, self._pending_length = pending, [], 0
+        else:
+            segment, rest = pending[:end], pending[end:]
+            self._pending, self._pending_length = [rest], len(rest)
+        self._flush_at = 0
+        self.segments.append(segment)
+        return [segment]
@@ -56,7 +56,10 @@ def handler(event, context):
                 'body': {
                     'agentType': 'string (generic|coding|financial|supervisor)',
                     'message': 'string (required)',
-                    'sessionId': 'string (optional, for conversation context)'
+                    'sessionId': 'string (optional, for conversation context)',
+                    'turnId': 'string (optional, client-minted id for this message; generated if omitted)',
+                    'mode': 'string (single|compare, default single)',
+                    'agentTypes': 'array of strings (optional, compare mode lanes; default generic, coding, financial)'
                 },
                 'response': {
                     'success': 'boolean',
@@ -64,6 +67,65 @@ def handler(event, context):
                     'sessionId': 'string',
                     'agentType': 'string'
                 }
+            },
+            'POST /api/chat/{sessionId}/cancel': {
+                'description': 'Stop an in-flight generation (the agent stream is closed within a few chunks)',
+                'authentication': True,
+                'headers': {
+                    'Authorization': 'Bearer <jwt_token>'
+                },
+                'body': {
+                    'turnId': 'string (optional, only cancel if this turn is still the current one)'
+                },
+                'response': {
+                    'success': 'boolean',
+                    'sessionId': 'string',
+                    'status': 'cancelling'
+                }
+            },
+            'POST /api/chat/batch': {
+                'description': 'Run many prompts through the agents with bounded concurrency (internal tooling)',
+                'authentication': True,
+                'headers': {
+                    'Authorization': 'Bearer <jwt_token>'
+                },
+                'body': {
+                    'agentType': 'string (generic|coding|financial|supervisor, default for all prompts)',
+                    'prompts': 'array of strings or {id, message, agentType} objects (max 50)'
+                },
+                'response': 'application/x-ndjson, one {index, id, status (completed|error|skipped|timeout), response|error, durationMs} line per prompt'
+            },
+            'GET /api/usage': {
+                'description': 'Your usage (turns, chunks, response bytes, Bedrock time, latency histogram) per day',
+                'authentication': True,
+                'headers': {
+                    'Authorization': 'Bearer <jwt_token>'
+                },
+                'query': {
+                    'from': 'string (optional, YYYY-MM-DD; default 29 days before "to")',
+                    'to': 'string (optional, YYYY-MM-DD; default today, UTC; at most 366 days in range)'
+                },
+                'response': {
+                    'success': 'boolean',
+                    'days': 'array of {day, <counter>: number} buckets, oldest first',
+                    'totals': 'object of summed counters plus avgBedrockMs, avgFirstChunkMs, avgResponseBytes'
+                }
+            },
+            'GET /api/search': {
+                'description': 'Full-text search over your past chat turns, ranked by BM25',
+                'authentication': True,
+                'headers': {
+                    'Authorization': 'Bearer <jwt_token>'
+                },
+                'query': {
+                    'q': 'string (required)',
+                    'limit': 'number (optional, default 10, max 50)'
+                },
+                'response': {
+                    'success': 'boolean',
+                    'totalDocuments': 'number of indexed turns',
+                    'results': 'array of {score, sessionId, turnId, createdAt, message, snippet}, best first'
+                }
             }
         },
         'agents': [
@@ -0,0 +1,295 @@
+import json
+import boto3
+import os
+import re
+import time
+import jwt
+from collections import OrderedDict
+from search_index import DOC_KEY_PREFIX, SEGMENT_KEY_PREFIX, SearchIndex, Segment, doc_key, segment_key, tokenize
+
+# Initialize DynamoDB
+dynamodb = boto3.resource('dynamodb')
+SEARCH_INDEX_TABLE_NAME = os.environ['SEARCH_INDEX_TABLE_NAME']
+search_table = dynamodb.Table(SEARCH_INDEX_TABLE_NAME)
+
+# JWT configuration
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+
+# Result count per query (default and maximum)
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Warm-container cache of loaded user indexes, bounded by decoded segment bytes.
+# Each search only fetches segments the cached index has not loaded yet.
+INDEX_CACHE_MAX_BYTES = int(os.environ.get('INDEX_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+index_cache = OrderedDict()
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_MAX_KEYS = 100
+
+# Segments below SMALL_SEGMENT_BYTES are merged once COMPACT_MIN_SEGMENTS of them
+# accumulate, into segments of about TARGET_SEGMENT_BYTES (DynamoDB items max out at 400 KB)
+SMALL_SEGMENT_BYTES = 64 * 1024
+COMPACT_MIN_SEGMENTS = 32
+TARGET_SEGMENT_BYTES = 256 * 1024
+MAX_SEGMENT_BYTES = 380 * 1024
+
+# Characters of context shown around the first matching term
+SNIPPET_BEFORE = 80
+SNIPPET_LENGTH = 240
+
+
+def handler(event, context):
+    """
+    Lambda handler for full-text search over the caller's past turns.
+    Loads the user's inverted index (cached per warm container, refreshed
+    incrementally), compacts small segments, ranks with BM25 and returns
+    the matching turns with a snippet.
+
+    NOTE: Always returns 200 status with error details in body for API Gateway compatibility.
+    """
+    try:
+        try:
+            user_id = verify_token(event)
+            if not user_id:
+                return create_response(200, {
+                    'success': False,
+                    'error': 'Authentication required',
+                    'errorType': 'auth'
+                })
+        except Exception as auth_error:
+            print(f'Auth error: {str(auth_error)}')
+            return create_response(200, {
+                'success': False,
+                'error': str(auth_error),
+                'errorType': 'auth'
+            })
+
+        query = event.get('queryStringParameters') or {}
+        text = (query.get('q') or '').strip()
+        try:
+            limit = min(max(int(query.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            limit = DEFAULT_LIMIT
+
+        if not tokenize(text):
+            return create_response(200, {
+                'success': False,
+                'error': 'Query must contain at least one searchable word',
+                'errorType': 'validation'
+            })
+
+        started = time.time()
+        index = load_index(user_id)
+        compact(user_id, index)
+        hits = index.search(text, limit)
+        results = fetch_results(user_id, hits, text)
+
+        return create_response(200, {
+            'success': True,
+            'query': text,
+            'totalDocuments': index.doc_count,
+            'results': results,
+            'tookMs': int((time.time() - started) * 1000)
+        })
+
+    except Exception as e:
+        print(f'Error: {str(e)}')
+        import traceback
+        traceback.print_exc()
+        return create_response(200, {
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'errorType': 'internal',
+            'details': str(e)
+        })
+
+
+def load_index(user_id):
+    """
+    Return the user's index, fetching only segments this container has not loaded.
+
+    A cached index is refreshed from a strongly consistent, keys-only listing of
+    the user's segments rather than from the newest cached document onwards:
+    another container's compaction writes a merged segment keyed by its oldest
+    document (possibly below everything cached) and deletes its inputs, and
+    both only show up in the full key listing.
+    """
+    index = index_cache.get(user_id)
+    if index is None:
+        index = SearchIndex()
+        for item in query_segments(user_id):
+            index.add_segment(item['sk'], Segment(item['postings'].value))
+    else:
+        index_cache.move_to_end(user_id)
+        listed = {item['sk'] for item in query_segments(user_id, keys_only=True)}
+        deleted = index.loaded - listed
+        if deleted:
+            index.remove_segments(deleted)
+        for key, data in fetch_segments(user_id, sorted(listed - index.loaded)):
+            index.add_segment(key, Segment(data))
+
+    index_cache[user_id] = index
+    evict_cached_indexes()
+    return index
+
+
+def query_segments(user_id, keys_only=False):
+    """Yield the user's segment items (only their keys if keys_only), following pagination"""
+    params = {
+        'KeyConditionExpression': 'userId = :userId AND begins_with(sk, :prefix)',
+        'ExpressionAttributeValues': {':userId': user_id, ':prefix': SEGMENT_KEY_PREFIX}
+    }
+    if keys_only:
+        # Consistent, so a merged segment is always listed once its inputs are gone
+        params['ProjectionExpression'] = 'sk'
+        params['ConsistentRead'] = True
+    while True:
+        response = search_table.query(**params)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def fetch_segments(user_id, keys):
+    """Yield (key, data) for the given segment keys; keys deleted since they were listed are skipped"""
+    for start in range(0, len(keys), BATCH_GET_MAX_KEYS):
+        request = {SEARCH_INDEX_TABLE_NAME: {
+            'Keys': [{'userId': user_id, 'sk': key} for key in keys[start:start + BATCH_GET_MAX_KEYS]],
+            'ConsistentRead': True
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(SEARCH_INDEX_TABLE_NAME, []):
+                yield item['sk'], item['postings'].value
+            request = response.get('UnprocessedKeys')
+
+
+def evict_cached_indexes():
+    """Drop least recently used indexes while over the cache byte budget"""
+    total = sum(segment.raw_size for index in index_cache.values() for segment in index.segments.values())
+    while total > INDEX_CACHE_MAX_BYTES and len(index_cache) > 1:
+        _, evicted = index_cache.popitem(last=False)
+        total -= sum(segment.raw_size for segment in evicted.segments.values())
+
+
+def compact(user_id, index):
+    """
+    Merge small segments once enough have accumulated.
+    The merged segment is written before its inputs are deleted, so a reader
+    listing the segment keys never misses a document; overlapping segments
+    are resolved by SearchIndex.
+    """
+    small = sorted(key for key, segment in index.segments.items() if segment.size < SMALL_SEGMENT_BYTES)
+    if len(small) < COMPACT_MIN_SEGMENTS:
+        return
+
+    groups, group, group_bytes = [], [], 0
+    for key in small:
+        if group and group_bytes + index.segments[key].size > TARGET_SEGMENT_BYTES:
+            groups.append(group)
+            group, group_bytes = [], 0
+        group.append(key)
+        group_bytes += index.segments[key].size
+    if len(group) > 1:
+        groups.append(group)
+
+    for group in groups:
+        data, first_docnum, last_docnum = index.merge(group)
+        if len(data) > MAX_SEGMENT_BYTES:
+            print(f'Skipping merge of {len(group)} segments: {len(data)} bytes exceeds the item limit')
+            continue
+        merged_key = segment_key(first_docnum, last_docnum)
+        if merged_key in index.segments and merged_key not in group:
+            continue
+        merged = Segment(data)
+        search_table.put_item(Item={
+            'userId': user_id,
+            'sk': merged_key,
+            'postings': data,
+            'docCount': len(merged.doc_lengths)
+        })
+        index.replace_segments(group, merged_key, merged)
+
+        with search_table.batch_writer() as batch:
+            for key in group:
+                if key != merged_key:
+                    batch.delete_item(Key={'userId': user_id, 'sk': key})
+        print(f'Merged {len(group)} segments into {merged_key} ({len(data)} bytes)')
+
+
+def fetch_results(user_id, hits, text):
+    """Load the documents of the top hits and attach a snippet to each"""
+    if not hits:
+        return []
+
+    keys = [{'userId': user_id, 'sk': doc_key(docnum)} for docnum, _ in hits]
+    documents = {}
+    request = {SEARCH_INDEX_TABLE_NAME: {'Keys': keys}}
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(SEARCH_INDEX_TABLE_NAME, []):
+            documents[int(item['sk'][len(DOC_KEY_PREFIX):])] = item
+        request = response.get('UnprocessedKeys')
+
+    terms = tokenize(text)
+    results = []
+    for docnum, score in hits:
+        item = documents.get(docnum)
+        if item is None:
+            continue
+        results.append({
+            'score': round(score, 4),
+            'sessionId': item.get('sessionId'),
+            'turnId': item.get('turnId'),
+            'createdAt': item.get('createdAt'),
+            'message': item.get('message', ''),
+            'snippet': make_snippet(item.get('response', ''), terms)
+        })
+    return results
+
+
+def make_snippet(response, terms):
+    """A window of the response around the earliest occurrence of any query term"""
+    match = re.search(r'\b(' + '|'.join(re.escape(term) for term in terms) + r')\b', response, re.IGNORECASE)
+    start = max((match.start() if match else 0) - SNIPPET_BEFORE, 0)
+    snippet = response[start:start + SNIPPET_LENGTH].strip()
+    if start > 0:
+        snippet = '…' + snippet
+    if start + SNIPPET_LENGTH < len(response):
+        snippet += '…'
+    return snippet
+
+
+def verify_token(event):
+    """Verify JWT token"""
+    try:
+        auth_header = event.get('headers', {}).get('authorization') or event.get('headers', {}).get('Authorization')
+        if not auth_header:
+            raise Exception('No authorization header')
+
+        token = auth_header.replace('Bearer ', '').replace('bearer ', '')
+        decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        return decoded.get('userId')
+
+    except jwt.ExpiredSignatureError:
+        raise Exception('Token expired')
+    except jwt.InvalidTokenError:
+        raise Exception('Invalid token')
+    except Exception as e:
+        raise Exception(f'Auth failed: {str(e)}')
+
+
+def create_response(status_code, body):
+    """Create HTTP response with CORS headers (always 200 for API Gateway compatibility)"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+        },
+        'body': json.dumps(body, default=str)
+    }
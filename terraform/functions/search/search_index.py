@@ -0,0 +1,338 @@
+import heapq
+import math
+import re
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+
+# Bumped whenever the segment byte layout changes
+FORMAT_VERSION = 1
+
+# Sort keys inside a user's partition of the search index table
+META_KEY = 'meta'
+DOC_KEY_PREFIX = 'doc#'
+SEGMENT_KEY_PREFIX = 'seg#'
+
+TOKEN_PATTERN = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 32
+STOPWORDS = frozenset('''
+    a an and are as at be but by can do does for from has have how i if in into is it its
+    me my no not of on or our so than that the their them then there these they this to
+    was we what when where which who why will with you your
+'''.split())
+
+SEGMENT_HEADER = struct.Struct('<BIIII')
+
+# Term frequencies are stored as uint16
+MAX_TERM_FREQUENCY = 0xFFFF
+
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def doc_key(docnum):
+    return f'{DOC_KEY_PREFIX}{docnum:010d}'
+
+
+def segment_key(first_docnum, last_docnum):
+    return f'{SEGMENT_KEY_PREFIX}{first_docnum:010d}#{last_docnum:010d}'
+
+
+def tokenize(text):
+    """Lowercased word tokens, without stopwords and very short/long tokens"""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if MIN_TOKEN_LENGTH <= len(token) <= MAX_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+def analyze(*texts):
+    """Term frequencies and length (in tokens) of a document made of the given texts"""
+    tokens = [token for text in texts if text for token in tokenize(text)]
+    return Counter(tokens), len(tokens)
+
+
+def _to_bytes(values):
+    """Little-endian bytes of an array (the layout is fixed regardless of host byte order)"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def encode_segment(documents):
+    """Encode {docnum: (term_freqs, length)} as a compressed segment"""
+    postings = {}
+    previous = {}
+    for docnum in sorted(documents):
+        for term, tf in documents[docnum][0].items():
+            deltas, tfs = postings.setdefault(term, (array('I'), array('H')))
+            deltas.append(docnum - previous.get(term, 0))
+            tfs.append(min(tf, MAX_TERM_FREQUENCY))
+            previous[term] = docnum
+    return _encode({docnum: length for docnum, (_, length) in documents.items()}, postings)
+
+
+def _encode(doc_lengths, postings):
+    """
+    Layout (zlib-compressed as a whole, integers little-endian):
+        header: version, doc count, term count, term block bytes, posting count
+        docnums (uint32) and lengths (uint32) per document, in docnum order
+        term block: sorted terms joined by newlines (tokens never contain one)
+        document frequency (uint32) per term
+        docnum deltas (uint32) then term frequencies (uint16) of every posting,
+        term by term, each run in docnum order with deltas restarting at 0
+
+    Fixed-width arrays decode with array.frombytes, so loading a segment and
+    reading a posting list never loop over individual postings in Python.
+    """
+    docnums = array('I', sorted(doc_lengths))
+    lengths = array('I', (doc_lengths[docnum] for docnum in docnums))
+    terms = sorted(postings)
+    term_block = '\n'.join(terms).encode('utf-8')
+    dfs = array('I', (len(postings[term][0]) for term in terms))
+    deltas, tfs = array('I'), array('H')
+    for term in terms:
+        deltas.extend(postings[term][0])
+        tfs.extend(postings[term][1])
+
+    header = SEGMENT_HEADER.pack(FORMAT_VERSION, len(docnums), len(terms), len(term_block), len(deltas))
+    return zlib.compress(b''.join([
+        header, _to_bytes(docnums), _to_bytes(lengths), term_block, _to_bytes(dfs), _to_bytes(deltas), _to_bytes(tfs)
+    ]), 6)
+
+
+class Segment:
+    """
+    Read-only view of an encoded segment.
+    Terms are kept as a sorted list (looked up with bisect) and postings as
+    flat arrays sliced per term, which keeps per-term memory overhead low.
+    """
+
+    def __init__(self, data):
+        self.size = len(data)
+        raw = memoryview(zlib.decompress(data))
+        self.raw_size = len(raw)
+        version, doc_count, term_count, term_block_length, posting_count = SEGMENT_HEADER.unpack_from(raw)
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Unsupported segment format version: {version}')
+
+        pos = SEGMENT_HEADER.size
+        docnums = _from_bytes('I', raw[pos:pos + 4 * doc_count])
+        pos += 4 * doc_count
+        lengths = _from_bytes('I', raw[pos:pos + 4 * doc_count])
+        pos += 4 * doc_count
+        self.doc_lengths = dict(zip(docnums, lengths))
+
+        self.terms = bytes(raw[pos:pos + term_block_length]).decode('utf-8').split('\n') if term_count else []
+        pos += term_block_length
+        self.offsets = array('I', accumulate(_from_bytes('I', raw[pos:pos + 4 * term_count]), initial=0))
+        pos += 4 * term_count
+        self.deltas = _from_bytes('I', raw[pos:pos + 4 * posting_count])
+        pos += 4 * posting_count
+        self.tfs = _from_bytes('H', raw[pos:pos + 2 * posting_count])
+
+    def find(self, term):
+        """Position of a term in the dictionary, or -1"""
+        index = bisect_left(self.terms, term)
+        return index if index < len(self.terms) and self.terms[index] == term else -1
+
+    def run(self, index):
+        """(docnum deltas, term frequencies) arrays of the term at a dictionary position"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.deltas[start:end], self.tfs[start:end]
+
+
+class SearchIndex:
+    """
+    A user's inverted index as a set of segments, ranked with BM25.
+
+    Segments may overlap while a compaction is in progress (the merged segment
+    is written before its inputs are deleted), so every document is owned by
+    exactly one segment, the one holding the most documents, and postings
+    from other segments are ignored for it. Segments left owning nothing
+    are dropped from memory, but their keys stay in loaded so a refresh
+    does not fetch them again.
+    """
+
+    def __init__(self):
+        self.loaded = set()
+        self.segments = {}
+        self.owner = {}
+        self.owned = Counter()
+        self.doc_lengths = {}
+        self.total_length = 0
+
+    @property
+    def doc_count(self):
+        return len(self.doc_lengths)
+
+    @property
+    def max_docnum(self):
+        return max(self.doc_lengths, default=0)
+
+    def add_segment(self, key, segment):
+        """Add a loaded segment; it takes over documents only from smaller segments"""
+        self.loaded.add(key)
+        self.segments[key] = segment
+        for docnum, length in segment.doc_lengths.items():
+            current = self.owner.get(docnum)
+            if current is None:
+                self.doc_lengths[docnum] = length
+                self.total_length += length
+            elif len(self.segments[current].doc_lengths) >= len(segment.doc_lengths):
+                continue
+            self._assign(docnum, key)
+        if not self.owned[key]:
+            self._drop(key)
+
+    def replace_segments(self, old_keys, key, segment):
+        """Swap merged segments for their merged result, which takes over their documents"""
+        self.loaded.difference_update(old_keys)
+        self.loaded.add(key)
+        self.segments[key] = segment
+        for docnum, length in segment.doc_lengths.items():
+            if docnum not in self.owner:
+                self.doc_lengths[docnum] = length
+                self.total_length += length
+            self._assign(docnum, key)
+        for old_key in old_keys:
+            if old_key != key and old_key in self.segments:
+                self._drop(old_key)
+
+    def remove_segments(self, keys):
+        """
+        Forget segments that no longer exist (merged away by another reader).
+        Document ownership is re-derived from the remaining segments; documents
+        only the removed segments held are gone until their merged segment is added.
+        """
+        self.loaded.difference_update(keys)
+        remaining = {key: segment for key, segment in self.segments.items() if key not in keys}
+        if len(remaining) == len(self.segments):
+            return
+        self.segments, self.owner, self.owned = {}, {}, Counter()
+        self.doc_lengths, self.total_length = {}, 0
+        for key in sorted(remaining):
+            self.add_segment(key, remaining[key])
+
+    def _assign(self, docnum, key):
+        previous = self.owner.get(docnum)
+        self.owner[docnum] = key
+        self.owned[key] += 1
+        if previous is not None and previous != key:
+            self.owned[previous] -= 1
+            if not self.owned[previous]:
+                self._drop(previous)
+
+    def _drop(self, key):
+        """Forget a segment that no longer owns any document"""
+        self.segments.pop(key, None)
+        self.owned.pop(key, None)
+
+    def merge(self, keys):
+        """
+        Encode the documents owned by the given segments as one new segment.
+        Returns (data, first docnum, last docnum).
+
+        Fully owned segments with disjoint docnum ranges (the usual case) are
+        merged by concatenating their posting arrays, rebasing only the first
+        delta of each run; anything else is re-sorted posting by posting.
+        """
+        pairs = sorted(((key, self.segments[key]) for key in keys),
+                       key=lambda pair: min(pair[1].doc_lengths, default=0))
+        doc_lengths = {
+            docnum: length
+            for key, segment in pairs
+            for docnum, length in segment.doc_lengths.items() if self.owner.get(docnum) == key
+        }
+        disjoint = all(max(a.doc_lengths) < min(b.doc_lengths) for (_, a), (_, b) in zip(pairs, pairs[1:]))
+        fully_owned = all(self.owned[key] == len(segment.doc_lengths) for key, segment in pairs)
+
+        postings = {}
+        if disjoint and fully_owned:
+            last = {}
+            for _, segment in pairs:
+                offsets, segment_deltas, segment_tfs = segment.offsets, segment.deltas, segment.tfs
+                for index, term in enumerate(segment.terms):
+                    start, end = offsets[index], offsets[index + 1]
+                    entry = postings.get(term)
+                    if entry is None:
+                        entry = postings[term] = (array('I'), array('H'))
+                        previous = 0
+                    else:
+                        previous = last[term]
+                    deltas = entry[0]
+                    if end - start == 1:
+                        # Most runs in small segments hold a single posting
+                        first = segment_deltas[start]
+                        deltas.append(first - previous)
+                        entry[1].append(segment_tfs[start])
+                        last[term] = first
+                        continue
+                    first = segment_deltas[start]
+                    deltas.append(first - previous)
+                    deltas.extend(segment_deltas[start + 1:end])
+                    entry[1].extend(segment_tfs[start:end])
+                    last[term] = first + sum(segment_deltas[start + 1:end])
+        else:
+            entries = {}
+            for key, segment in pairs:
+                for index, term in enumerate(segment.terms):
+                    deltas, tfs = segment.run(index)
+                    for docnum, tf in zip(accumulate(deltas), tfs):
+                        if self.owner.get(docnum) == key:
+                            entries.setdefault(term, []).append((docnum, tf))
+            for term, term_entries in entries.items():
+                term_entries.sort()
+                docnums = [docnum for docnum, _ in term_entries]
+                postings[term] = (
+                    array('I', (docnum - previous for docnum, previous in zip(docnums, [0] + docnums))),
+                    array('H', (tf for _, tf in term_entries))
+                )
+
+        return _encode(doc_lengths, postings), min(doc_lengths, default=0), max(doc_lengths, default=0)
+
+    def search(self, query, limit=10):
+        """Top (docnum, score) pairs for a free-text query, best first"""
+        terms = set(tokenize(query))
+        if not terms or not self.doc_lengths:
+            return []
+
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count or 1
+        scores = {}
+        for term in terms:
+            matches = []
+            for key, segment in self.segments.items():
+                index = segment.find(term)
+                if index < 0:
+                    continue
+                deltas, tfs = segment.run(index)
+                if self.owned[key] == len(segment.doc_lengths):
+                    matches.extend(zip(accumulate(deltas), tfs))
+                else:
+                    matches.extend(
+                        (docnum, tf) for docnum, tf in zip(accumulate(deltas), tfs) if self.owner.get(docnum) == key
+                    )
+            if not matches:
+                continue
+            idf = math.log(1 + (doc_count - len(matches) + 0.5) / (len(matches) + 0.5))
+            for docnum, tf in matches:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docnum] / average_length)
+                scores[docnum] = scores.get(docnum, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
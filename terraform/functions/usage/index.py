@@ -0,0 +1,168 @@
+import json
+import boto3
+import os
+import jwt
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+# Initialize DynamoDB
+dynamodb = boto3.resource('dynamodb')
+usage_table = dynamodb.Table(os.environ['USAGE_TABLE_NAME'])
+
+# JWT configuration
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+
+# Default and maximum span of a usage query, in days
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 366
+
+# Bucket attributes that are not counters
+NON_COUNTER_ATTRIBUTES = {'userId', 'day', 'lastActivityAt'}
+
+
+def handler(event, context):
+    """
+    Lambda handler for per-user usage over a date range.
+    Reads the caller's daily buckets with a single key-range Query
+    (userId = :userId AND day BETWEEN :from AND :to); nothing is scanned.
+
+    NOTE: Always returns 200 status with error details in body for API Gateway compatibility.
+    """
+    try:
+        try:
+            user_id = verify_token(event)
+            if not user_id:
+                return create_response(200, {
+                    'success': False,
+                    'error': 'Authentication required',
+                    'errorType': 'auth'
+                })
+        except Exception as auth_error:
+            print(f'Auth error: {str(auth_error)}')
+            return create_response(200, {
+                'success': False,
+                'error': str(auth_error),
+                'errorType': 'auth'
+            })
+
+        query = event.get('queryStringParameters') or {}
+        try:
+            date_to = parse_day(query.get('to')) or datetime.now(timezone.utc).date()
+            date_from = parse_day(query.get('from')) or date_to - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+        except ValueError:
+            return create_response(200, {
+                'success': False,
+                'error': 'Dates must be formatted as YYYY-MM-DD',
+                'errorType': 'validation'
+            })
+
+        if date_from > date_to:
+            return create_response(200, {
+                'success': False,
+                'error': '"from" must not be after "to"',
+                'errorType': 'validation'
+            })
+
+        if (date_to - date_from).days + 1 > MAX_RANGE_DAYS:
+            return create_response(200, {
+                'success': False,
+                'error': f'At most {MAX_RANGE_DAYS} days can be queried at once',
+                'errorType': 'validation'
+            })
+
+        days = query_usage(user_id, date_from.isoformat(), date_to.isoformat())
+
+        return create_response(200, {
+            'success': True,
+            'userId': user_id,
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'days': days,
+            'totals': summarize(days)
+        })
+
+    except Exception as e:
+        print(f'Error: {str(e)}')
+        return create_response(200, {
+            'success': False,
+            'error': 'An unexpected error occurred. Please try again.',
+            'errorType': 'internal',
+            'details': str(e)
+        })
+
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD query parameter (None if absent)"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def query_usage(user_id, day_from, day_to):
+    """Daily buckets in the range, oldest first, following pagination"""
+    params = {
+        'KeyConditionExpression': 'userId = :userId AND #day BETWEEN :from AND :to',
+        'ExpressionAttributeNames': {'#day': 'day'},
+        'ExpressionAttributeValues': {':userId': user_id, ':from': day_from, ':to': day_to}
+    }
+    days = []
+    while True:
+        response = usage_table.query(**params)
+        for item in response.get('Items', []):
+            bucket = {'day': item['day'], 'lastActivityAt': item.get('lastActivityAt')}
+            for name, value in item.items():
+                if name not in NON_COUNTER_ATTRIBUTES and isinstance(value, Decimal):
+                    bucket[name] = int(value)
+            days.append(bucket)
+        if 'LastEvaluatedKey' not in response:
+            return days
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def summarize(days):
+    """Sum every counter over the range and derive per-invocation averages"""
+    totals = {}
+    for bucket in days:
+        for name, value in bucket.items():
+            if name not in NON_COUNTER_ATTRIBUTES:
+                totals[name] = totals.get(name, 0) + value
+
+    invocations = totals.get('agentInvocations', 0)
+    if invocations:
+        totals['avgBedrockMs'] = round(totals.get('bedrockMs', 0) / invocations)
+        totals['avgFirstChunkMs'] = round(totals.get('firstChunkMs', 0) / invocations)
+        totals['avgResponseBytes'] = round(totals.get('responseBytes', 0) / invocations)
+    return totals
+
+
+def verify_token(event):
+    """Verify JWT token"""
+    try:
+        auth_header = event.get('headers', {}).get('authorization') or event.get('headers', {}).get('Authorization')
+        if not auth_header:
+            raise Exception('No authorization header')
+
+        token = auth_header.replace('Bearer ', '').replace('bearer ', '')
+        decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        return decoded.get('userId')
+
+    except jwt.ExpiredSignatureError:
+        raise Exception('Token expired')
+    except jwt.InvalidTokenError:
+        raise Exception('Invalid token')
+    except Exception as e:
+        raise Exception(f'Auth failed: {str(e)}')
+
+
+def create_response(status_code, body):
+    """Create HTTP response with CORS headers (always 200 for API Gateway compatibility)"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
+            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+        },
+        'body': json.dumps(body, default=str)
+    }
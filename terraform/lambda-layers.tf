@@ -1,17 +1,25 @@
 # Lambda Layer for common dependencies (boto3, PyJWT)
 # Uses chat's requirements.txt as reference
+# Slimmed to the DynamoDB and Bedrock Agent Runtime service models
 module "common_layer" {
   source = "./modules/lambda-layer"
 
   layer_name        = "${var.project_name}-common-${var.environment}"
   requirements_file = "${path.module}/functions/chat/requirements.txt"
+  keep_services     = ["dynamodb", "bedrock-agent-runtime"]
+  functions_dir     = "${path.module}/functions"
+  report_functions  = ["chat", "chat-status", "chat-batch", "chat-cancel", "chat-sweeper", "usage", "search", "list-agents"]
 }
 
 # Lambda Layer for auth dependencies (boto3, bcrypt, PyJWT)
 # Uses login's requirements.txt
+# Login only talks to DynamoDB
 module "auth_layer" {
   source = "./modules/lambda-layer"
 
   layer_name        = "${var.project_name}-auth-${var.environment}"
   requirements_file = "${path.module}/functions/login/requirements.txt"
+  keep_services     = ["dynamodb"]
+  functions_dir     = "${path.module}/functions"
+  report_functions  = ["login"]
 }
@@ -131,9 +131,66 @@ module "chat_lambda" {
   layer_arns = [module.common_layer.layer_arn]
 
   environment_variables = {
+    SUPERVISOR_AGENT_ID        = module.bedrock_agents.supervisor_agent_id
+    SUPERVISOR_AGENT_ALIAS_ID  = module.bedrock_agents.supervisor_agent_alias_id
+    GENERIC_AGENT_ID           = module.bedrock_agents.generic_agent_id   # Compare mode lanes
+    GENERIC_AGENT_ALIAS_ID     = module.bedrock_agents.generic_agent_alias_id
+    CODING_AGENT_ID            = module.bedrock_agents.coding_agent_id
+    CODING_AGENT_ALIAS_ID      = module.bedrock_agents.coding_agent_alias_id
+    FINANCIAL_AGENT_ID         = module.bedrock_agents.financial_agent_id
+    FINANCIAL_AGENT_ALIAS_ID   = module.bedrock_agents.financial_agent_alias_id
+    CHAT_SESSIONS_TABLE_NAME   = module.dynamodb.chat_sessions_table_name
+    USAGE_TABLE_NAME           = module.dynamodb.usage_table_name
+    SEARCH_INDEX_TABLE_NAME    = module.dynamodb.search_index_table_name # Completed turns are indexed
+    LEASE_SECONDS              = "15" # Worker liveness lease, capped at the invocation deadline
+    HEARTBEAT_INTERVAL_SECONDS = "5"
+    NODE_ENV                   = "production"
+    JWT_SECRET                 = var.jwt_secret
+  }
+
+  bedrock_agent_arns = [
+    module.bedrock_agents.generic_agent_arn,
+    module.bedrock_agents.coding_agent_arn,
+    module.bedrock_agents.financial_agent_arn,
+    module.bedrock_agents.supervisor_agent_arn
+  ]
+  dynamodb_table_arns = [
+    module.dynamodb.chat_sessions_table_arn,
+    module.dynamodb.usage_table_arn,
+    module.dynamodb.search_index_table_arn
+  ]
+
+  tags = local.common_tags
+}
+
+################################################################################
+# Chat Batch Lambda (bounded concurrent fan-out for internal tooling)
+################################################################################
+
+module "chat_batch_lambda" {
+  source = "./modules/lambda"
+
+  function_name = "${var.project_name}-chat-batch-${var.environment}"
+  handler       = "index.handler"
+  runtime       = "python3.12"
+  source_dir    = "${path.module}/functions/chat-batch"
+  timeout       = 30  # API Gateway integration limit; unstarted prompts are reported as skipped
+  memory_size   = 512
+
+  layer_arns = [module.common_layer.layer_arn]
+
+  environment_variables = {
+    GENERIC_AGENT_ID          = module.bedrock_agents.generic_agent_id
+    GENERIC_AGENT_ALIAS_ID    = module.bedrock_agents.generic_agent_alias_id
+    CODING_AGENT_ID           = module.bedrock_agents.coding_agent_id
+    CODING_AGENT_ALIAS_ID     = module.bedrock_agents.coding_agent_alias_id
+    FINANCIAL_AGENT_ID        = module.bedrock_agents.financial_agent_id
+    FINANCIAL_AGENT_ALIAS_ID  = module.bedrock_agents.financial_agent_alias_id
     SUPERVISOR_AGENT_ID       = module.bedrock_agents.supervisor_agent_id
     SUPERVISOR_AGENT_ALIAS_ID = module.bedrock_agents.supervisor_agent_alias_id
-    CHAT_SESSIONS_TABLE_NAME  = module.dynamodb.chat_sessions_table_name
+    MAX_BATCH_SIZE            = "50"
+    BATCH_CONCURRENCY         = "4"
+    USAGE_TABLE_NAME          = module.dynamodb.usage_table_name
     NODE_ENV                  = "production"
     JWT_SECRET                = var.jwt_secret
   }
@@ -144,6 +201,34 @@ module "chat_lambda" {
     module.bedrock_agents.financial_agent_arn,
     module.bedrock_agents.supervisor_agent_arn
   ]
+  dynamodb_table_arns = [module.dynamodb.usage_table_arn] # Results are returned inline; only usage is persisted
+
+  tags = local.common_tags
+}
+
+################################################################################
+# Chat Cancel Lambda (stops in-flight generations)
+################################################################################
+
+module "chat_cancel_lambda" {
+  source = "./modules/lambda"
+
+  function_name = "${var.project_name}-chat-cancel-${var.environment}"
+  handler       = "index.handler"
+  runtime       = "python3.12"
+  source_dir    = "${path.module}/functions/chat-cancel"
+  timeout       = 10
+  memory_size   = 128
+
+  layer_arns = [module.common_layer.layer_arn] # Use common layer
+
+  environment_variables = {
+    CHAT_SESSIONS_TABLE_NAME = module.dynamodb.chat_sessions_table_name
+    NODE_ENV                 = "production"
+    JWT_SECRET               = var.jwt_secret
+  }
+
+  bedrock_agent_arns  = [] # No Bedrock access needed
   dynamodb_table_arns = [module.dynamodb.chat_sessions_table_arn]
 
   tags = local.common_tags
@@ -177,3 +262,108 @@ module "chat_status_lambda" {
   tags = local.common_tags
 }
 
+################################################################################
+# Usage Lambda (per-user usage over a date range)
+################################################################################
+
+module "usage_lambda" {
+  source = "./modules/lambda"
+
+  function_name = "${var.project_name}-usage-${var.environment}"
+  handler       = "index.handler"
+  runtime       = "python3.12"
+  source_dir    = "${path.module}/functions/usage"
+  timeout       = 10
+  memory_size   = 128
+
+  layer_arns = [module.common_layer.layer_arn] # Use common layer
+
+  environment_variables = {
+    USAGE_TABLE_NAME = module.dynamodb.usage_table_name
+    NODE_ENV         = "production"
+    JWT_SECRET       = var.jwt_secret
+  }
+
+  bedrock_agent_arns  = [] # No Bedrock access needed
+  dynamodb_table_arns = [module.dynamodb.usage_table_arn]
+
+  tags = local.common_tags
+}
+
+################################################################################
+# Search Lambda (full-text search over the caller's past turns)
+################################################################################
+
+module "search_lambda" {
+  source = "./modules/lambda"
+
+  function_name = "${var.project_name}-search-${var.environment}"
+  handler       = "index.handler"
+  runtime       = "python3.12"
+  source_dir    = "${path.module}/functions/search"
+  timeout       = 30  # First search after a long idle period also compacts the index
+  memory_size   = 512 # Decoded indexes are cached per warm container
+
+  layer_arns = [module.common_layer.layer_arn] # Use common layer
+
+  environment_variables = {
+    SEARCH_INDEX_TABLE_NAME = module.dynamodb.search_index_table_name
+    NODE_ENV                = "production"
+    JWT_SECRET              = var.jwt_secret
+  }
+
+  bedrock_agent_arns  = [] # No Bedrock access needed
+  dynamodb_table_arns = [module.dynamodb.search_index_table_arn]
+
+  tags = local.common_tags
+}
+
+################################################################################
+# Chat Sweeper Lambda (finalizes turns whose worker died mid-stream)
+################################################################################
+
+module "chat_sweeper_lambda" {
+  source = "./modules/lambda"
+
+  function_name = "${var.project_name}-chat-sweeper-${var.environment}"
+  handler       = "index.handler"
+  runtime       = "python3.12"
+  source_dir    = "${path.module}/functions/chat-sweeper"
+  timeout       = 60
+  memory_size   = 128
+
+  layer_arns = [module.common_layer.layer_arn] # Use common layer
+
+  environment_variables = {
+    CHAT_SESSIONS_TABLE_NAME = module.dynamodb.chat_sessions_table_name
+    IN_FLIGHT_INDEX_NAME     = module.dynamodb.chat_sessions_in_flight_index_name
+    SWEEP_GRACE_SECONDS      = "5"
+    NODE_ENV                 = "production"
+  }
+
+  bedrock_agent_arns  = [] # No Bedrock access needed
+  dynamodb_table_arns = [module.dynamodb.chat_sessions_table_arn]
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_rule" "chat_sweeper" {
+  name                = "${var.project_name}-chat-sweeper-${var.environment}"
+  description         = "Finalize chat turns whose heartbeat lease has lapsed"
+  schedule_expression = "rate(5 minutes)"
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "chat_sweeper" {
+  rule = aws_cloudwatch_event_rule.chat_sweeper.name
+  arn  = module.chat_sweeper_lambda.function_arn
+}
+
+resource "aws_lambda_permission" "chat_sweeper_schedule" {
+  statement_id  = "AllowEventBridgeInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = module.chat_sweeper_lambda.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.chat_sweeper.arn
+}
@@ -77,6 +77,68 @@ resource "aws_dynamodb_table" "sessions" {
   }
 }
 
+# Usage Table (per-user daily counters, written with atomic ADD updates)
+resource "aws_dynamodb_table" "usage" {
+  name           = "${var.project_name}-usage-${var.environment}"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "userId"
+  range_key      = "day"
+
+  attribute {
+    name = "userId"
+    type = "S"
+  }
+
+  attribute {
+    name = "day"
+    type = "S"
+  }
+
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name        = "${var.project_name}-usage-table"
+    Environment = var.environment
+  }
+}
+
+# Search Index Table (per-user inverted index: counter, documents and posting-list segments under one partition)
+resource "aws_dynamodb_table" "search_index" {
+  name           = "${var.project_name}-search-index-${var.environment}"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "userId"
+  range_key      = "sk"
+
+  attribute {
+    name = "userId"
+    type = "S"
+  }
+
+  attribute {
+    name = "sk"
+    type = "S"
+  }
+
+  point_in_time_recovery {
+    enabled = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name        = "${var.project_name}-search-index-table"
+    Environment = var.environment
+  }
+}
+
 # Chat Sessions Table (for async chat processing)
 resource "aws_dynamodb_table" "chat_sessions" {
   name           = "${var.project_name}-chat-sessions-${var.environment}"
@@ -88,6 +150,26 @@ resource "aws_dynamodb_table" "chat_sessions" {
     type = "S"
   }
 
+  attribute {
+    name = "inFlight"
+    type = "S"
+  }
+
+  attribute {
+    name = "leaseExpiresAt"
+    type = "N"
+  }
+
+  # Sparse index of turns still being generated: the chat Lambda sets inFlight
+  # and removes it on every terminal write, so the sweeper queries only live turns
+  global_secondary_index {
+    name               = "in-flight-index"
+    hash_key           = "inFlight"
+    range_key          = "leaseExpiresAt"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["status", "turnId"]
+  }
+
   ttl {
     attribute_name = "expirationTime"
     enabled        = true
@@ -27,3 +27,28 @@ output "chat_sessions_table_arn" {
   description = "ARN of the chat sessions table"
   value       = aws_dynamodb_table.chat_sessions.arn
 }
+
+output "chat_sessions_in_flight_index_name" {
+  description = "Name of the sparse in-flight index on the chat sessions table"
+  value       = "in-flight-index"
+}
+
+output "usage_table_name" {
+  description = "Name of the per-user daily usage table"
+  value       = aws_dynamodb_table.usage.name
+}
+
+output "usage_table_arn" {
+  description = "ARN of the per-user daily usage table"
+  value       = aws_dynamodb_table.usage.arn
+}
+
+output "search_index_table_name" {
+  description = "Name of the per-user full-text search index table"
+  value       = aws_dynamodb_table.search_index.name
+}
+
+output "search_index_table_arn" {
+  description = "ARN of the per-user full-text search index table"
+  value       = aws_dynamodb_table.search_index.arn
+}
@@ -1,24 +1,44 @@
+locals {
+  # Each layer builds into its own directory so layers never mix dependencies
+  build_dir = "${path.module}/build/${var.layer_name}"
+}
+
 resource "null_resource" "build_layer" {
   triggers = {
-    requirements = filemd5(var.requirements_file)
+    requirements  = filemd5(var.requirements_file)
+    slim_script   = filemd5("${path.module}/slim_layer.py")
+    keep_services = join(",", var.keep_services)
+    functions     = join(",", var.report_functions)
   }
 
+  # pip installs without bytecode; slim_layer.py prunes unused botocore service
+  # models, tests and docs, precompiles .pyc and writes a size/import-time report
   provisioner "local-exec" {
     command = <<-EOT
-      mkdir -p ${path.module}/layer/python
+      rm -rf ${local.build_dir}
+      mkdir -p ${local.build_dir}/python
       docker run --platform linux/amd64 --rm \
         -v "${abspath(var.requirements_file)}:/requirements.txt:ro" \
-        -v "${abspath(path.module)}/layer/python:/var/task" \
+        -v "${abspath(path.module)}/slim_layer.py:/build/slim_layer.py:ro" \
+        -v "${abspath(var.functions_dir)}:/functions:ro" \
+        -v "${abspath(local.build_dir)}:/out" \
         public.ecr.aws/sam/build-python3.12 \
-        pip install -r /requirements.txt -t /var/task
+        /bin/sh -c "pip install --no-compile -r /requirements.txt -t /out/python && \
+          python /build/slim_layer.py /out/python \
+            --layer-name ${var.layer_name} \
+            --keep-services ${join(",", var.keep_services)} \
+            --functions-dir /functions \
+            --functions '${join(",", var.report_functions)}' \
+            --report /out/report.txt"
     EOT
   }
 }
 
 data "archive_file" "layer_zip" {
   type        = "zip"
-  source_dir  = "${path.module}/layer"
+  source_dir  = local.build_dir
   output_path = "${path.module}/${var.layer_name}.zip"
+  excludes    = ["report.txt"]
   
   depends_on = [null_resource.build_layer]
 }
@@ -7,3 +7,8 @@ output "layer_version" {
   description = "Version of the Lambda layer"
   value       = aws_lambda_layer_version.this.version
 }
+
+output "report_path" {
+  description = "Size/import-time report written by the layer build"
+  value       = "${path.module}/build/${var.layer_name}/report.txt"
+}
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Slim a pip-installed Lambda layer and precompile it.
+Called by Terraform as a local-exec provisioner, inside the Lambda build image
+so the bytecode matches the runtime's Python version.
+
+Steps:
+1. Measure the fat layer (size and per-handler import time)
+2. Drop botocore/boto3 service models except the ones listed in --keep-services
+3. Drop tests, docs and existing bytecode from all dependencies
+4. Precompile .pyc files (unchecked-hash, so zip timestamps don't invalidate them;
+   /opt is read-only on Lambda so nothing is compiled at runtime otherwise)
+5. Measure the slim layer again and write a size/import-time report
+"""
+
+import argparse
+import ast
+import compileall
+import py_compile
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+# Directory names removed from every installed package
+STRIP_DIRS = {'tests', '__pycache__'}
+
+# Documentation directories, removed only when they are not importable
+# packages (botocore.docs and boto3.docs are code used at import time)
+DOC_DIRS = {'docs', 'doc', 'examples'}
+
+# File suffixes removed from every installed package
+STRIP_SUFFIXES = ('.pyi', '.md', '.rst', '.pyc', '.c', '.h', '.pxd', '.pyx')
+
+# Repeats per import-time measurement (the median is reported)
+IMPORT_RUNS = 5
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def package_sizes(layer_dir):
+    """Size of each top-level entry in the layer, largest first"""
+    sizes = {}
+    for entry in os.listdir(layer_dir):
+        path = os.path.join(layer_dir, entry)
+        sizes[entry] = dir_size(path) if os.path.isdir(path) else os.path.getsize(path)
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def prune_service_models(data_dir, keep_services):
+    """Remove service model directories that no handler uses; keep top-level data files"""
+    removed = 0
+    if not os.path.isdir(data_dir):
+        return removed
+    for entry in os.listdir(data_dir):
+        path = os.path.join(data_dir, entry)
+        if os.path.isdir(path) and entry not in keep_services:
+            shutil.rmtree(path)
+            removed += 1
+    return removed
+
+
+def strip_package_files(layer_dir):
+    """Remove tests, docs, sources of compiled extensions and stale bytecode"""
+    for root, dirs, files in os.walk(layer_dir, topdown=True):
+        # dist-info metadata is kept as-is
+        if root.endswith('.dist-info'):
+            continue
+        for name in [d for d in dirs if d in STRIP_DIRS or
+                     (d in DOC_DIRS and not os.path.exists(os.path.join(root, d, '__init__.py')))]:
+            shutil.rmtree(os.path.join(root, name))
+            dirs.remove(name)
+        for name in files:
+            if name.endswith(STRIP_SUFFIXES):
+                os.remove(os.path.join(root, name))
+
+
+def handler_imports(handler_file, layer_dir):
+    """
+    Third-party modules a handler imports from the layer, and the AWS
+    services it creates clients/resources for at module import time.
+    """
+    with open(handler_file) as f:
+        tree = ast.parse(f.read())
+
+    modules, services = set(), set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names = [node.module]
+        else:
+            names = []
+        for name in names:
+            top = name.split('.')[0]
+            if os.path.exists(os.path.join(layer_dir, top)) or os.path.exists(os.path.join(layer_dir, top + '.py')):
+                modules.add(name)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                and node.func.attr in ('client', 'resource') \
+                and isinstance(node.func.value, ast.Name) and node.func.value.id == 'boto3' \
+                and node.args and isinstance(node.args[0], ast.Constant):
+            services.add((node.func.attr, node.args[0].value))
+
+    return sorted(modules), sorted(services)
+
+
+def measure_import_time(layer_dir, modules, services):
+    """Median wall time (ms) of a fresh interpreter importing the handler's dependencies"""
+    lines = [f'import {name}' for name in modules]
+    if services:
+        lines.append('import boto3')
+        lines += [f"boto3.{kind}('{service}', region_name='us-east-1')" for kind, service in services]
+    code = '\n'.join(lines) or 'pass'
+
+    env = dict(os.environ, PYTHONPATH=layer_dir, PYTHONDONTWRITEBYTECODE='1')
+    timings = []
+    for _ in range(IMPORT_RUNS):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], env=env, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def measure_handlers(layer_dir, functions_dir, functions):
+    results = {}
+    for function in functions:
+        handler_file = os.path.join(functions_dir, function, 'index.py')
+        if not os.path.exists(handler_file):
+            print(f"⚠️  Skipping {function}: {handler_file} not found")
+            continue
+        modules, services = handler_imports(handler_file, layer_dir)
+        results[function] = measure_import_time(layer_dir, modules, services)
+    return results
+
+
+def format_report(layer_name, fat_sizes, slim_sizes, fat_times, slim_times):
+    mb = 1024 * 1024
+    lines = [
+        f"Layer size/import-time report: {layer_name}",
+        "=" * 80,
+        f"Total size: {sum(fat_sizes.values()) / mb:.1f} MB fat -> {sum(slim_sizes.values()) / mb:.1f} MB slim",
+        "",
+        f"{'Package':<40}{'Fat (KB)':>12}{'Slim (KB)':>12}",
+    ]
+    for name, size in fat_sizes.items():
+        lines.append(f"{name:<40}{size // 1024:>12}{slim_sizes.get(name, 0) // 1024:>12}")
+    if fat_times:
+        lines += ["", f"{'Handler import time (median of ' + str(IMPORT_RUNS) + ')':<40}{'Fat (ms)':>12}{'Slim (ms)':>12}"]
+        for function, fat_ms in fat_times.items():
+            lines.append(f"{function:<40}{fat_ms:>12.0f}{slim_times.get(function, 0):>12.0f}")
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('layer_dir', help='Directory pip installed the requirements into')
+    parser.add_argument('--layer-name', default='layer')
+    parser.add_argument('--keep-services', default='dynamodb,bedrock-agent-runtime',
+                        help='Comma-separated botocore/boto3 service models to keep')
+    parser.add_argument('--functions-dir', help='Directory containing the Lambda function sources')
+    parser.add_argument('--functions', default='', help='Comma-separated function directories to measure')
+    parser.add_argument('--report', help='Write the size/import-time report to this file')
+    args = parser.parse_args()
+
+    keep_services = {service for service in args.keep_services.split(',') if service}
+    functions = [function for function in args.functions.split(',') if function]
+    measure = bool(args.functions_dir and functions)
+
+    fat_sizes = package_sizes(args.layer_dir)
+    fat_times = measure_handlers(args.layer_dir, args.functions_dir, functions) if measure else {}
+
+    removed = prune_service_models(os.path.join(args.layer_dir, 'botocore', 'data'), keep_services)
+    removed += prune_service_models(os.path.join(args.layer_dir, 'boto3', 'data'), keep_services)
+    print(f"Removed {removed} unused service models (kept: {', '.join(sorted(keep_services))})")
+
+    strip_package_files(args.layer_dir)
+
+    if not compileall.compile_dir(args.layer_dir, quiet=1, workers=0,
+                                  invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH):
+        print("❌ Error: bytecode compilation failed")
+        sys.exit(1)
+
+    slim_sizes = package_sizes(args.layer_dir)
+    slim_times = measure_handlers(args.layer_dir, args.functions_dir, functions) if measure else {}
+
+    report = format_report(args.layer_name, fat_sizes, slim_sizes, fat_times, slim_times)
+    print(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
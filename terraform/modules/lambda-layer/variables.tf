@@ -7,3 +7,20 @@ variable "requirements_file" {
   description = "Path to requirements.txt file"
   type        = string
 }
+
+variable "keep_services" {
+  description = "botocore/boto3 service models to keep in the layer (all others are stripped)"
+  type        = list(string)
+  default     = ["dynamodb", "bedrock-agent-runtime"]
+}
+
+variable "functions_dir" {
+  description = "Directory containing the Lambda function sources (for the import-time report)"
+  type        = string
+}
+
+variable "report_functions" {
+  description = "Function directories using this layer to include in the import-time report"
+  type        = list(string)
+  default     = []
+}
@@ -0,0 +1,101 @@
+"""
+Benchmark: batch chat throughput against the one-at-a-time path.
+
+Every prompt streams from the fake Bedrock Agent Runtime in fake_aws:
+the first chunk after FIRST_CHUNK_SECONDS, then CHUNKS chunks
+CHUNK_SECONDS apart. Chunks hold whole lines, so the chat Lambda writes
+progress every CANCEL_CHECK_INTERVAL chunks. The one-at-a-time path runs the real chat handler
+and one chat-status poll per prompt against the fake session table,
+counting its DynamoDB writes. The batch runs the real chat-batch
+handler at several BATCH_CONCURRENCY settings. DynamoDB and network
+latency are not modelled, so the one-at-a-time figure is a best case.
+
+Run from the project root:
+    python tests/bench_chat_batch.py [prompts]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import (FakeAgentRuntime, FakeContext, FakeDynamoDB, FakeEventStream, FakeTable,  # noqa: E402
+                      api_event, load_function, text_chunks)
+
+FIRST_CHUNK_SECONDS = 0.3
+CHUNK_SECONDS = 0.005
+CHUNKS = 20
+CONCURRENCY = (1, 4, 8, 16)
+
+USER_ID = 'user-bench'
+ENV = {
+    'CHAT_SESSIONS_TABLE_NAME': 'chat-sessions-bench',
+    'SUPERVISOR_AGENT_ID': 'supervisor-agent',
+    'SUPERVISOR_AGENT_ALIAS_ID': 'supervisor-alias'
+}
+
+
+def agent_runtime():
+    return FakeAgentRuntime(lambda agent_id, text: FakeEventStream(
+        text_chunks(CHUNKS, text='An answer line.\n'), first_delay=FIRST_CHUNK_SECONDS, chunk_delay=CHUNK_SECONDS))
+
+
+def one_at_a_time(prompts):
+    """POST /api/chat then GET chat-status for each prompt; returns (seconds, DynamoDB writes)"""
+    sessions = FakeTable(ENV['CHAT_SESSIONS_TABLE_NAME'], ['sessionId'])
+    dynamodb = FakeDynamoDB(sessions)
+    chat = load_function('chat', 'bench_chat', ENV, dynamodb, agent_runtime())
+    status = load_function('chat-status', 'bench_chat_status', ENV, dynamodb)
+
+    started = time.perf_counter()
+    for prompt in prompts:
+        session_id, turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        body = json.loads(chat.handler(api_event(USER_ID, {'message': prompt, 'sessionId': session_id,
+                                                           'turnId': turn_id}), None)['body'])
+        assert body['success'], body
+        body = json.loads(status.handler(api_event(USER_ID, path_parameters={'sessionId': session_id},
+                                                   query={'turnId': turn_id}), None)['body'])
+        assert body['status'] == 'completed', body
+    elapsed = time.perf_counter() - started
+
+    # The table counts requests made through meta.client as well
+    writes = sessions.calls['put_item'] + sessions.calls['update_item']
+    return elapsed, writes
+
+
+def batch(prompts, concurrency):
+    """One POST /api/chat/batch; returns seconds"""
+    module = load_function('chat-batch', f'bench_chat_batch_{concurrency}', ENV, FakeDynamoDB(), agent_runtime())
+    with mock.patch.object(module, 'BATCH_CONCURRENCY', concurrency):
+        started = time.perf_counter()
+        response = module.handler(api_event(USER_ID, {'prompts': prompts}), FakeContext(900000))
+        elapsed = time.perf_counter() - started
+    results = [json.loads(line) for line in response['body'].splitlines()]
+    assert [result['status'] for result in results] == ['completed'] * len(prompts), results
+    return elapsed
+
+
+def main(count):
+    prompts = [f'Question {index}' for index in range(count)]
+    print(f'{count} prompts, first chunk after {FIRST_CHUNK_SECONDS * 1000:.0f} ms, '
+          f'{CHUNKS} chunks {CHUNK_SECONDS * 1000:.0f} ms apart')
+
+    # The chat handler reads its agent ids per request
+    with mock.patch.dict(os.environ, ENV), contextlib.redirect_stdout(io.StringIO()):
+        elapsed, writes = one_at_a_time(prompts)
+    print(f'    one-at-a-time via /api/chat + 1 poll: {count / elapsed:5.1f} prompts/s '
+          f'({elapsed:.2f}s, {writes} DynamoDB writes)')
+
+    for concurrency in CONCURRENCY:
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed = batch(prompts, concurrency)
+        print(f'    batch, concurrency {concurrency:<2}:                {count / elapsed:5.1f} prompts/s ({elapsed:.2f}s)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
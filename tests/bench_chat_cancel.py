@@ -0,0 +1,109 @@
+"""
+Simulation: chunks and Lambda time saved by user cancellation.
+
+GENERATIONS turns run through the real chat handler against the fake
+session table and a fake STREAM_CHUNKS-chunk agent stream: the first chunk
+after FIRST_CHUNK_SECONDS, then one every CHUNK_SECONDS. Half of them are
+cancelled through the real chat-cancel handler at a uniform random point of
+the stream's duration. Stream time is virtual: the fake stream's sleep
+advances a per-turn clock instead of sleeping, and a turn's duration is the
+stream time it spent before returning. Without cancellation every turn
+drains its whole stream.
+
+Run from the project root:
+    python tests/bench_chat_cancel.py [generations]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import (FakeAgentRuntime, FakeDynamoDB, FakeEventStream, FakeTable,  # noqa: E402
+                      api_event, load_function, text_chunks)
+
+STREAM_CHUNKS = 120
+FIRST_CHUNK_SECONDS = 0.5
+CHUNK_SECONDS = 0.05
+CANCELLED_SHARE = 0.5
+
+USER_ID = 'user-bench'
+ENV = {
+    'CHAT_SESSIONS_TABLE_NAME': 'chat-sessions-bench',
+    'SUPERVISOR_AGENT_ID': 'supervisor-agent',
+    'SUPERVISOR_AGENT_ALIAS_ID': 'supervisor-alias'
+}
+
+FULL_STREAM_SECONDS = FIRST_CHUNK_SECONDS + (STREAM_CHUNKS - 1) * CHUNK_SECONDS
+
+
+class Generation:
+    """One turn's virtual stream, cancelled when its clock passes cancel_at"""
+
+    def __init__(self, cancel_function, cancel_at):
+        self.cancel_function = cancel_function
+        self.cancel_at = cancel_at
+        self.session_id, self.turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        self.clock = 0.0
+        self.cancel_result = None
+        self.read_before_cancel = None
+        self.stream = FakeEventStream(text_chunks(STREAM_CHUNKS, text='An answer line.\n'),
+                                      first_delay=FIRST_CHUNK_SECONDS, chunk_delay=CHUNK_SECONDS, sleep=self.sleep)
+
+    def sleep(self, seconds):
+        self.clock += seconds
+        if self.cancel_at is not None and self.cancel_result is None and self.clock >= self.cancel_at:
+            self.cancel()
+
+    def cancel(self):
+        self.read_before_cancel = self.stream.consumed
+        response = self.cancel_function.handler(api_event(USER_ID, {'turnId': self.turn_id},
+                                                          path_parameters={'sessionId': self.session_id}), None)
+        self.cancel_result = json.loads(response['body'])
+
+    def chunks_after_cancel(self):
+        return self.stream.consumed - self.read_before_cancel
+
+
+def main(count):
+    rng = random.Random(5)
+    sessions = FakeTable(ENV['CHAT_SESSIONS_TABLE_NAME'], ['sessionId'])
+    dynamodb = FakeDynamoDB(sessions)
+    generations = []
+
+    with mock.patch.dict(os.environ, ENV), contextlib.redirect_stdout(io.StringIO()):
+        runtime = FakeAgentRuntime(lambda agent_id, text: generations[-1].stream)
+        chat = load_function('chat', 'bench_chat', ENV, dynamodb, runtime)
+        cancel_function = load_function('chat-cancel', 'bench_chat_cancel', ENV, dynamodb)
+        for index in range(count):
+            cancel_at = rng.uniform(0, FULL_STREAM_SECONDS) if index % round(1 / CANCELLED_SHARE) == 0 else None
+            generation = Generation(cancel_function, cancel_at)
+            generations.append(generation)
+            chat.handler(api_event(USER_ID, {'message': 'hello', 'sessionId': generation.session_id,
+                                             'turnId': generation.turn_id}), None)
+
+    cancelled = [generation for generation in generations if generation.cancel_at is not None]
+    stopped = [generation for generation in cancelled if generation.stream.consumed < STREAM_CHUNKS]
+    chunks = sum(generation.stream.consumed for generation in generations)
+    seconds = sum(generation.clock for generation in generations)
+    full_chunks, full_seconds = count * STREAM_CHUNKS, count * FULL_STREAM_SECONDS
+
+    print(f'{count} generations of {STREAM_CHUNKS} chunks ({FULL_STREAM_SECONDS:.2f}s each), '
+          f'{len(cancelled)} cancelled at a uniform random time:')
+    print(f'    stopped mid-stream:     {len(stopped)} '
+          f'({len(cancelled) - len(stopped)} cancelled too close to the end to save a chunk)')
+    print(f'    chunks read:            {chunks} vs {full_chunks} ({1 - chunks / full_chunks:.0%} saved)')
+    print(f'    stream time:            {seconds:.1f}s vs {full_seconds:.1f}s ({1 - seconds / full_seconds:.0%} saved)')
+    print(f'    chunks read after the cancel: median '
+          f'{statistics.median(generation.chunks_after_cancel() for generation in cancelled):.0f}, '
+          f'max {max(generation.chunks_after_cancel() for generation in cancelled)}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
@@ -0,0 +1,69 @@
+"""
+Benchmark: compare mode wall-clock time, concurrent lanes against sequential.
+
+The chat handler runs a compare turn over the three specialists against the
+fake Bedrock runtime and session table in fake_aws. Each agent takes its
+AGENT_SECONDS in total: a first-chunk delay, then CHUNKS chunks CHUNK_SECONDS
+apart. "Sequential" is the same code with the lane pool cut to one worker,
+i.e. asking the agents one after another. Times are the best of RUNS.
+
+Run from the project root:
+    python tests/bench_chat_compare.py
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import (FakeAgentRuntime, FakeDynamoDB, FakeEventStream, FakeTable,  # noqa: E402
+                      api_event, load_function, text_chunks)
+
+AGENT_SECONDS = {'generic': 0.6, 'coding': 1.2, 'financial': 0.9}
+CHUNKS = 20
+CHUNK_SECONDS = 0.01
+RUNS = 3
+
+ENV = {
+    'CHAT_SESSIONS_TABLE_NAME': 'chat-sessions-bench',
+    **{f'{agent_type.upper()}_AGENT_ID': f'{agent_type}-agent' for agent_type in AGENT_SECONDS},
+    **{f'{agent_type.upper()}_AGENT_ALIAS_ID': f'{agent_type}-alias' for agent_type in AGENT_SECONDS}
+}
+
+
+def lane_stream(agent_id, text):
+    seconds = AGENT_SECONDS[agent_id.split('-')[0]]
+    return FakeEventStream(text_chunks(CHUNKS, text='An answer line.\n'),
+                           first_delay=seconds - (CHUNKS - 1) * CHUNK_SECONDS, chunk_delay=CHUNK_SECONDS)
+
+
+def compare_turn(chat):
+    started = time.perf_counter()
+    response = chat.handler(api_event('user-bench', {'message': 'Which is better?', 'mode': 'compare'}), None)
+    elapsed = time.perf_counter() - started
+    assert json.loads(response['body'])['success'], response
+    return elapsed
+
+
+def main():
+    sessions = FakeTable(ENV['CHAT_SESSIONS_TABLE_NAME'], ['sessionId'])
+    with mock.patch.dict(os.environ, ENV), contextlib.redirect_stdout(io.StringIO()):
+        chat = load_function('chat', 'bench_chat', ENV, FakeDynamoDB(sessions), FakeAgentRuntime(lane_stream))
+        concurrent = min(compare_turn(chat) for _ in range(RUNS))
+        with mock.patch.object(chat, 'ThreadPoolExecutor', lambda max_workers: ThreadPoolExecutor(max_workers=1)):
+            sequential = min(compare_turn(chat) for _ in range(RUNS))
+
+    latencies = ', '.join(f'{agent_type} {seconds:.1f}s' for agent_type, seconds in AGENT_SECONDS.items())
+    print(f'Compare turn over 3 agents ({latencies}):')
+    print(f'    concurrent lanes: {concurrent:.2f}s (slowest agent {max(AGENT_SECONDS.values()):.2f}s)')
+    print(f'    sequential:       {sequential:.2f}s (sum {sum(AGENT_SECONDS.values()):.2f}s)')
+    print(f'    speedup:          {sequential / concurrent:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: replaying history fetches of completed turns through chat-status.
+
+TURNS completed turns are written to the fake session table with response
+sizes drawn from a log-normal distribution, each also stored as chunks as
+the chat Lambda does. FETCHES requests for (sessionId, turnId) are then
+replayed against one warm chat-status container, choosing turns with a
+Zipf-like skew (a few recent conversations are reopened most). Every
+get_item the cache does not absorb is charged DynamoDB's eventually
+consistent read cost: 0.5 RCU per 4 KB of item, rounded up.
+
+Run from the project root:
+    python tests/bench_chat_status_cache.py [turns] [fetches]
+"""
+import bisect
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import FakeDynamoDB, FakeTable, api_event, load_function  # noqa: E402
+
+SESSIONS_TABLE = 'chat-sessions-bench'
+CACHE_SIZES_MB = (8, 1)
+ZIPF_EXPONENT = 1.1
+
+# Response length in characters: median about 10 KB, with a long tail of multi-page answers
+RESPONSE_MEDIAN_CHARS = 10000
+RESPONSE_SIGMA = 0.8
+CHUNK_CHARS = 400
+
+
+def read_units(item):
+    """Eventually consistent GetItem cost of an item, from its JSON size"""
+    return math.ceil(len(json.dumps(item).encode('utf-8')) / 4096) * 0.5
+
+
+def write_turns(rng, sessions, turns):
+    keys = []
+    for _ in range(turns):
+        session_id, turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        response = 'x' * int(rng.lognormvariate(math.log(RESPONSE_MEDIAN_CHARS), RESPONSE_SIGMA))
+        sessions.items[(session_id,)] = {
+            'sessionId': session_id, 'turnId': turn_id, 'status': 'completed', 'mode': 'single',
+            'message': 'question', 'response': response,
+            'chunks': [response[start:start + CHUNK_CHARS] for start in range(0, len(response), CHUNK_CHARS)]
+        }
+        keys.append((session_id, turn_id))
+    return keys
+
+
+def replay(sessions, keys, fetches, cache_mb):
+    status = load_function('chat-status', f'bench_chat_status_{cache_mb}',
+                           {'CHAT_SESSIONS_TABLE_NAME': SESSIONS_TABLE}, FakeDynamoDB(sessions))
+    sessions.calls.clear()
+    read = 0.0
+    get_item = sessions.get_item
+
+    def metered_get_item(**params):
+        nonlocal read
+        response = get_item(**params)
+        read += read_units(response['Item'])
+        return response
+
+    with mock.patch.object(status, 'COMPLETED_CACHE_MAX_BYTES', cache_mb * 1024 * 1024), \
+            mock.patch.object(sessions, 'get_item', metered_get_item):
+        started = time.perf_counter()
+        for session_id, turn_id in fetches:
+            response = status.handler(api_event(path_parameters={'sessionId': session_id},
+                                                query={'turnId': turn_id}), None)
+            assert response['statusCode'] == 200
+        elapsed = time.perf_counter() - started
+    return sessions.calls['get_item'], read, elapsed
+
+
+def main(turns, fetch_count):
+    rng = random.Random(11)
+    sessions = FakeTable(SESSIONS_TABLE, ['sessionId'])
+    keys = write_turns(rng, sessions, turns)
+    weights = list(itertools.accumulate(1 / rank ** ZIPF_EXPONENT for rank in range(1, turns + 1)))
+    fetches = [keys[bisect.bisect(weights, rng.random() * weights[-1])] for _ in range(fetch_count)]
+
+    total_bytes = sum(len(json.dumps(item)) for item in sessions.items.values())
+    uncached_units = sum(read_units(sessions.items[(session_id,)]) for session_id, _ in fetches)
+    print(f'{turns} completed turns ({total_bytes / 1e6:.1f} MB of items), {fetch_count} Zipf-skewed fetches')
+    print(f'    no cache:   {fetch_count} get_item calls, {uncached_units:,.0f} RCU')
+    for cache_mb in CACHE_SIZES_MB:
+        calls, units, elapsed = replay(sessions, keys, fetches, cache_mb)
+        print(f'    {cache_mb} MB cache: {1 - calls / fetch_count:5.1%} hit rate, {calls} get_item calls, '
+              f'{units:,.0f} RCU ({uncached_units - units:,.0f} saved), {elapsed / fetch_count * 1e6:.0f} us per fetch')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500, int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
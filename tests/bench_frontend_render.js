@@ -0,0 +1,404 @@
+/*
+ * Benchmark: rendering long chat histories in frontend/index.html, without a browser.
+ *
+ * The page's inline script runs in a Node vm context against a minimal fake
+ * DOM. Layout is modelled: reading offsetHeight/scrollHeight after a DOM
+ * write walks the whole document once (a forced layout), so "laid out"
+ * counts the nodes a browser would have to lay out. Times are JavaScript time
+ * in Node, median of RUNS fresh page loads; they measure the scripts' own
+ * work, not browser style/paint.
+ *
+ * Compared with the addMessage the virtualized list replaced (copied below
+ * from the original page), which appended every message to the DOM and
+ * forced a layout per message to scroll to the bottom.
+ *
+ * Run from the project root:
+ *     node tests/bench_frontend_render.js [messages]
+ */
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+const { performance } = require('perf_hooks');
+
+const RUNS = 5;
+const VIEWPORT_HEIGHT = 800;
+const LINE_HEIGHT = 20;
+const CHARS_PER_LINE = 80;
+const STREAM_FRAMES = 100;
+const CHUNKS_PER_FRAME = 20;
+
+const PAGE_SCRIPT = (() => {
+  const html = fs.readFileSync(path.join(__dirname, '..', 'frontend', 'index.html'), 'utf8');
+  const scripts = [...html.matchAll(/<script>([\s\S]*?)<\/script>/g)];
+  return scripts[scripts.length - 1][1];
+})();
+
+// The original page's addMessage, before incremental rendering
+const OLD_ADD_MESSAGE = `
+    function addMessage(role, content, agentType = null) {
+      const messagesArea = document.getElementById('messagesArea');
+
+      const messageDiv = document.createElement('div');
+      messageDiv.className = \`message \${role}\`;
+
+      const avatar = document.createElement('div');
+      avatar.className = 'message-avatar';
+      avatar.textContent = role === 'user' ? (currentUser.name?.[0] || 'U') : 'AI';
+
+      const contentDiv = document.createElement('div');
+      contentDiv.className = 'message-content';
+
+      if (agentType && role === 'assistant') {
+        const agentNames = {
+          'coding': 'Coding Agent',
+          'financial': 'Financial Agent',
+          'generic': 'General Agent',
+          'supervisor': 'Supervisor'
+        };
+        contentDiv.innerHTML = content + \`<span class="agent-badge">\${agentNames[agentType] || agentType}</span>\`;
+      } else {
+        contentDiv.textContent = content;
+      }
+
+      messageDiv.appendChild(avatar);
+      messageDiv.appendChild(contentDiv);
+      messagesArea.appendChild(messageDiv);
+
+      messagesArea.scrollTop = messagesArea.scrollHeight;
+      messages.push({ role, content, agentType });
+    }
+`;
+
+class FakeNode {
+  constructor(document) {
+    this.ownerDocument = document;
+    this.parentNode = null;
+    document.stats.nodesCreated++;
+  }
+
+  remove() {
+    if (this.parentNode) this.parentNode.removeChild(this);
+  }
+
+  replaceWith(node) {
+    const parent = this.parentNode;
+    if (!parent) return;
+    node.remove();
+    parent.childNodes[parent.childNodes.indexOf(this)] = node;
+    node.parentNode = parent;
+    this.parentNode = null;
+    this.ownerDocument.invalidate();
+  }
+}
+
+class FakeText extends FakeNode {
+  constructor(document, data) {
+    super(document);
+    this.data = String(data);
+  }
+
+  appendData(data) {
+    this.data += data;
+    this.ownerDocument.invalidate();
+  }
+
+  layout() {
+    this.ownerDocument.stats.nodesLaidOut++;
+    return this.data ? Math.ceil(this.data.length / CHARS_PER_LINE) * LINE_HEIGHT : 0;
+  }
+}
+
+class FakeElement extends FakeNode {
+  constructor(document, tagName) {
+    super(document);
+    this.tagName = tagName.toUpperCase();
+    this.childNodes = [];
+    this.className = '';
+    this.style = {};
+    this.listeners = {};
+    this.value = '';
+    this.height = 0;
+    this.scrollOffset = 0;
+    const element = this;
+    this.classList = {
+      add: name => { if (!element.classList.contains(name)) element.className = `${element.className} ${name}`.trim(); },
+      remove: name => { element.className = element.className.split(' ').filter(c => c !== name).join(' '); },
+      toggle: (name, force) => {
+        const on = force === undefined ? !element.classList.contains(name) : force;
+        on ? element.classList.add(name) : element.classList.remove(name);
+      },
+      contains: name => element.className.split(' ').includes(name)
+    };
+  }
+
+  get children() {
+    return this.childNodes.filter(node => node instanceof FakeElement);
+  }
+
+  appendChild(node) {
+    node.remove();
+    node.parentNode = this;
+    this.childNodes.push(node);
+    this.ownerDocument.invalidate();
+    return node;
+  }
+
+  removeChild(node) {
+    this.childNodes.splice(this.childNodes.indexOf(node), 1);
+    node.parentNode = null;
+    this.ownerDocument.invalidate();
+    return node;
+  }
+
+  replaceChildren(...nodes) {
+    for (const node of this.childNodes) node.parentNode = null;
+    this.childNodes = [];
+    for (const node of nodes) this.appendChild(node);
+    this.ownerDocument.invalidate();
+  }
+
+  set textContent(text) {
+    this.replaceChildren(new FakeText(this.ownerDocument, text));
+  }
+
+  get textContent() {
+    return this.childNodes.map(node => node.data ?? node.textContent).join('');
+  }
+
+  // Enough of an HTML parser for the page's snippets: one element per tag, text between tags
+  set innerHTML(html) {
+    this.replaceChildren();
+    for (const part of String(html).split(/(<[^>]+>)/)) {
+      if (part.startsWith('</') || !part) continue;
+      this.appendChild(part.startsWith('<')
+        ? new FakeElement(this.ownerDocument, part.slice(1).split(/[\s>]/)[0])
+        : new FakeText(this.ownerDocument, part));
+    }
+  }
+
+  addEventListener(type, listener) {
+    (this.listeners[type] = this.listeners[type] || []).push(listener);
+  }
+
+  dispatchEvent(type) {
+    for (const listener of this.listeners[type] || []) listener({ type, target: this });
+  }
+
+  focus() {}
+
+  layout() {
+    this.ownerDocument.stats.nodesLaidOut++;
+    const content = this.childNodes.reduce((sum, node) => sum + node.layout(), 0);
+    const fixed = parseFloat(this.style.height);
+    this.height = this.style.display === 'none' ? 0 : Number.isNaN(fixed) ? content : fixed;
+    if (this.classList.contains('message')) this.height = Math.max(this.height, LINE_HEIGHT) + 24;
+    return this.height;
+  }
+
+  get offsetHeight() {
+    this.ownerDocument.layout();
+    return this.height;
+  }
+
+  get scrollHeight() {
+    this.ownerDocument.layout();
+    return this.childNodes.reduce((sum, node) => sum + (node.height || 0), 0);
+  }
+
+  get clientHeight() {
+    return this.id === 'messagesArea' ? VIEWPORT_HEIGHT : this.height;
+  }
+
+  get scrollTop() {
+    return this.scrollOffset;
+  }
+
+  set scrollTop(value) {
+    this.scrollOffset = Math.max(0, Math.min(value, this.scrollHeight - this.clientHeight));
+  }
+}
+
+class FakeDocument {
+  constructor() {
+    this.stats = { nodesCreated: 0, layouts: 0, nodesLaidOut: 0 };
+    this.dirty = true;
+    this.elements = {};
+    this.body = this.createElement('body');
+    // The parts of the page the script touches
+    const messagesArea = this.define('messagesArea', this.body);
+    this.define('emptyState', messagesArea).textContent = 'What are you working on?';
+    for (const id of ['topSpacer', 'visibleMessages', 'bottomSpacer']) this.define(id, messagesArea);
+  }
+
+  define(id, parent) {
+    const element = this.createElement('div');
+    element.id = id;
+    this.elements[id] = element;
+    if (parent) parent.appendChild(element);
+    return element;
+  }
+
+  getElementById(id) {
+    return this.elements[id] || this.define(id, null);
+  }
+
+  createElement(tagName) {
+    return new FakeElement(this, tagName);
+  }
+
+  createTextNode(data) {
+    return new FakeText(this, data);
+  }
+
+  invalidate() {
+    this.dirty = true;
+  }
+
+  layout() {
+    if (!this.dirty) return;
+    this.dirty = false;
+    this.stats.layouts++;
+    this.body.layout();
+  }
+
+  countNodes(node = this.body) {
+    return 1 + (node.childNodes || []).reduce((sum, child) => sum + this.countNodes(child), 0);
+  }
+}
+
+// A fresh page load: the page script (or the old addMessage) in its own context
+function loadPage(script) {
+  const document = new FakeDocument();
+  const frames = [];
+  const storage = { token: 'bench-token', user: JSON.stringify({ email: 'bench@example.com', name: 'Bench' }) };
+  const context = vm.createContext({
+    document,
+    console,
+    setTimeout,
+    clearTimeout,
+    requestAnimationFrame: callback => frames.push(callback),
+    localStorage: {
+      getItem: key => storage[key] ?? null,
+      setItem: (key, value) => { storage[key] = String(value); },
+      removeItem: key => { delete storage[key]; }
+    },
+    crypto: { randomUUID: () => 'bench-uuid' },
+    fetch: () => new Promise(() => {})
+  });
+  context.window = context;
+  context.window.addEventListener = () => {};
+  context.window.CONFIG = { API_URL: 'http://localhost' };
+  vm.runInContext(script, context);
+  return {
+    document,
+    run: source => vm.runInContext(source, context),
+    // Run one animation frame; callbacks scheduled during it wait for the next
+    frame() {
+      const callbacks = frames.splice(0);
+      for (const callback of callbacks) callback(performance.now());
+      return callbacks.length;
+    }
+  };
+}
+
+// Deterministic history: alternating prompts and answers of varied length
+function history(count) {
+  let seed = 7;
+  const random = () => ((seed = (seed * 1103515245 + 12345) % 2147483648) / 2147483648);
+  const words = ['agent', 'stream', 'chunk', 'lambda', 'deploy', 'index', 'query', 'token', 'cache', 'layer'];
+  const text = length => Array.from({ length }, () => words[Math.floor(random() * words.length)]).join(' ');
+  return Array.from({ length: count }, (_, index) => index % 2 === 0
+    ? ['user', text(5 + Math.floor(random() * 20)), null]
+    : ['assistant', text(20 + Math.floor(random() * 200)), 'supervisor']);
+}
+
+function percentile(values, fraction) {
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.floor(sorted.length * fraction)];
+}
+
+function median(values) {
+  return percentile(values, 0.5);
+}
+
+function messageElements(page) {
+  return page.document.getElementById('visibleMessages').children.length
+    + page.document.getElementById('messagesArea').children.filter(child => child.classList.contains('message')).length;
+}
+
+function renderOld(entries) {
+  const page = loadPage(`let currentUser = { name: 'Bench' };\nconst messages = [];\n${OLD_ADD_MESSAGE}`);
+  const addMessage = page.run('addMessage');
+  const started = performance.now();
+  for (const [role, content, agentType] of entries) addMessage(role, content, agentType);
+  return { page, ms: performance.now() - started };
+}
+
+function renderNew(entries) {
+  const page = loadPage(PAGE_SCRIPT);
+  const addMessage = page.run('addMessage');
+  const started = performance.now();
+  for (const [role, content, agentType] of entries) addMessage(role, content, agentType);
+  while (page.frame()) { /* until no frame is scheduled */ }
+  return { page, ms: performance.now() - started };
+}
+
+function report(label, runs) {
+  const { page } = runs[runs.length - 1];
+  const stats = page.document.stats;
+  console.log(`  ${label}: ${median(runs.map(run => run.ms)).toFixed(1)} ms, `
+    + `${messageElements(page)} message elements and ${page.document.countNodes()} nodes in the document, `
+    + `${stats.nodesCreated} nodes created, ${stats.layouts} forced layouts (${stats.nodesLaidOut} nodes laid out)`);
+}
+
+function scrollThrough(page) {
+  const messagesArea = page.document.getElementById('messagesArea');
+  const frameTimes = [];
+  let maxElements = 0;
+  for (let top = 0; top <= messagesArea.scrollHeight; top += VIEWPORT_HEIGHT / 2) {
+    messagesArea.scrollTop = top;
+    const started = performance.now();
+    messagesArea.dispatchEvent('scroll');
+    page.frame();
+    frameTimes.push(performance.now() - started);
+    maxElements = Math.max(maxElements, messageElements(page));
+  }
+  return { frameTimes, maxElements };
+}
+
+function streamAnswer(page) {
+  page.run('addMessage')('user', 'Write a long answer', null);
+  const placeholder = page.run('addLoading')();
+  page.frame();
+  const appendToMessage = page.run('appendToMessage');
+  const before = page.document.stats.nodesCreated;
+  const started = performance.now();
+  for (let frame = 0; frame < STREAM_FRAMES; frame++) {
+    for (let chunk = 0; chunk < CHUNKS_PER_FRAME; chunk++) appendToMessage(placeholder, 'streamed words ');
+    page.frame();
+  }
+  return { ms: performance.now() - started, nodesCreated: page.document.stats.nodesCreated - before, placeholder };
+}
+
+function main(count) {
+  const entries = history(count);
+  console.log(`${count}-message history:`);
+  report('old addMessage', Array.from({ length: RUNS }, () => renderOld(entries)));
+  const runs = Array.from({ length: RUNS }, () => renderNew(entries));
+  report('virtualized list', runs);
+
+  const scroll = runs.map(run => scrollThrough(run.page));
+  const frameTimes = scroll.flatMap(run => run.frameTimes);
+  console.log(`  scrolling the whole history: ${median(frameTimes).toFixed(2)} ms/frame median, `
+    + `${percentile(frameTimes, 0.95).toFixed(2)} ms p95 over ${scroll[0].frameTimes.length} frames, `
+    + `at most ${Math.max(...scroll.map(run => run.maxElements))} message elements in the DOM`);
+
+  const streams = runs.map(run => streamAnswer(run.page));
+  const last = streams[streams.length - 1];
+  const expected = 'streamed words '.repeat(STREAM_FRAMES * CHUNKS_PER_FRAME);
+  console.log(`  streaming ${STREAM_FRAMES * CHUNKS_PER_FRAME} chunks over ${STREAM_FRAMES} frames: `
+    + `${median(streams.map(stream => stream.ms)).toFixed(1)} ms total, ${last.nodesCreated} nodes created, `
+    + `answer complete: ${last.placeholder.content === expected}`);
+}
+
+main(Number(process.argv[2]) || 1000);
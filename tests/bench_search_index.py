@@ -0,0 +1,200 @@
+"""
+Benchmark: building and querying one user's search index at 10k turns.
+
+Turns are indexed the way the chat Lambda does (a document and a
+one-document segment each) into the in-memory table stand-in from
+test_search_refresh, then searched through the search Lambda's own
+load_index/compact/fetch_results. Text is drawn from a Zipf-like
+vocabulary so posting-list lengths resemble real prose.
+
+Run from the project root:
+    python tests/bench_search_index.py [turns]
+"""
+import bisect
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_search_refresh import USER_ID, Binary, InMemoryTable, load_container  # noqa: E402
+from search_index import SearchIndex, Segment, analyze, doc_key, encode_segment, segment_key, tokenize  # noqa: E402
+
+VOCABULARY_SIZE = 30000
+MESSAGE_WORDS = 12
+RESPONSE_WORDS = 300
+QUERIES = 200
+
+# Items per Query page; DynamoDB pages at 1 MB, about a thousand one-document segments
+QUERY_PAGE_SIZE = 1000
+
+
+def item_size(item):
+    return sum(len(name) + (len(value.value) if isinstance(value, Binary) else len(str(value)))
+               for name, value in item.items())
+
+
+class MeteredTable(InMemoryTable):
+    """Counts bytes read and written"""
+
+    def __init__(self):
+        super().__init__(page_size=QUERY_PAGE_SIZE)
+        self.read_bytes = 0
+        self.written_bytes = 0
+        self.writes = 0
+        self.deletes = 0
+
+    def put_item(self, Item):
+        super().put_item(Item)
+        self.writes += 1
+        self.written_bytes += item_size(self.items[(Item['userId'], Item['sk'])])
+
+    def delete_item(self, Key):
+        super().delete_item(Key)
+        self.deletes += 1
+
+    def query(self, **params):
+        response = super().query(**params)
+        self.read_bytes += sum(item_size(item) for item in response['Items'])
+        return response
+
+    def batch_get_item(self, RequestItems):
+        response = super().batch_get_item(RequestItems)
+        self.read_bytes += sum(item_size(item) for items in response['Responses'].values() for item in items)
+        return response
+
+
+class Corpus:
+    def __init__(self, seed=7):
+        self.rng = random.Random(seed)
+        self.vocabulary = [
+            ''.join(self.rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(self.rng.randint(3, 10)))
+            for _ in range(VOCABULARY_SIZE)
+        ]
+        self.cumulative, total = [], 0.0
+        for rank in range(VOCABULARY_SIZE):
+            total += 1 / (rank + 1) ** 1.05
+            self.cumulative.append(total)
+
+    def words(self, count):
+        total = self.cumulative[-1]
+        return ' '.join(self.vocabulary[bisect.bisect(self.cumulative, self.rng.random() * total)]
+                        for _ in range(count))
+
+    def turn(self):
+        return self.words(MESSAGE_WORDS), self.words(max(int(self.rng.gauss(RESPONSE_WORDS, 80)), 50))
+
+    def queries(self, terms, count=QUERIES):
+        return [' '.join(self.vocabulary[self.rng.randint(10, 3000)] for _ in range(terms)) for _ in range(count)]
+
+
+def index_turn(table, docnum, message, response):
+    """Same writes as the chat Lambda's index_turn (the meta counter update is left out)"""
+    table.put_item({'userId': USER_ID, 'sk': doc_key(docnum), 'message': message, 'response': response})
+    table.put_item({
+        'userId': USER_ID,
+        'sk': segment_key(docnum, docnum),
+        'postings': encode_segment({docnum: analyze(message, response)}),
+        'docCount': 1
+    })
+
+
+def search(container, text):
+    index = container.load_index(USER_ID)
+    container.compact(USER_ID, index)
+    return container.fetch_results(USER_ID, index.search(text, 10), text)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main(turns):
+    table = MeteredTable()
+    container = load_container(table, 'search_benchmark')
+    corpus = Corpus()
+    docs = [corpus.turn() for _ in range(turns)]
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    started = time.perf_counter()
+    for docnum, (message, response) in enumerate(docs, start=1):
+        index_turn(table, docnum, message, response)
+    elapsed = time.perf_counter() - started
+    segments = [item for (_, sk), item in table.items.items() if sk.startswith('seg#')]
+    print(f'index {turns} turns: {elapsed / turns * 1000:.2f} ms/turn, '
+          f'{statistics.mean(len(item["postings"].value) for item in segments):.0f} B per one-document segment')
+
+    table.read_bytes, table.writes = 0, 0
+    started = time.perf_counter()
+    with quiet:
+        search(container, corpus.vocabulary[500])
+    elapsed = time.perf_counter() - started
+    segments = [item for (_, sk), item in table.items.items() if sk.startswith('seg#')]
+    stored = sum(len(item['postings'].value) for item in segments)
+    print(f'first search (load + compact {turns} segments): {elapsed * 1000:.0f} ms, '
+          f'read {table.read_bytes / 1e6:.1f} MB, wrote {table.writes} merged, deleted {table.deletes}')
+    print(f'compacted index: {len(segments)} segments, {stored / 1e6:.2f} MB ({stored / turns:.0f} B/turn)')
+
+    container.index_cache.clear()
+    table.read_bytes = 0
+    started = time.perf_counter()
+    index = container.load_index(USER_ID)
+    elapsed = time.perf_counter() - started
+    print(f'cold load: {elapsed * 1000:.0f} ms, read {table.read_bytes / 1e6:.2f} MB, {index.doc_count} documents')
+
+    container.index_cache.clear()
+    tracemalloc.start()
+    container.load_index(USER_ID)
+    resident, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'resident index: {resident / 1e6:.1f} MB')
+
+    for terms in (1, 2, 3):
+        latencies, table.read_bytes = [], 0
+        for text in corpus.queries(terms):
+            started = time.perf_counter()
+            search(container, text)
+            latencies.append((time.perf_counter() - started) * 1000)
+        p50, p95 = percentiles(latencies)
+        print(f'{terms}-term search (warm, refresh + rank + fetch 10): p50 {p50:.1f} ms, p95 {p95:.1f} ms, '
+              f'read {table.read_bytes / len(latencies) / 1024:.1f} KB/query')
+
+    latencies = []
+    for text in corpus.queries(2):
+        started = time.perf_counter()
+        index.search(text, 10)
+        latencies.append((time.perf_counter() - started) * 1000)
+    p50, p95 = percentiles(latencies)
+    print(f'2-term BM25 on the loaded index only: p50 {p50:.2f} ms, p95 {p95:.2f} ms')
+
+    texts = [f'{message} {response}' for message, response in docs]
+    scans = corpus.queries(2, 10)
+    started = time.perf_counter()
+    for text in scans:
+        terms = set(tokenize(text))
+        [sum(1 for token in tokenize(doc) if token in terms) for doc in texts]
+    print(f'full scan baseline: {(time.perf_counter() - started) / len(scans) * 1000:.0f} ms CPU, '
+          f'{sum(map(len, texts)) / 1e6:.1f} MB read per query')
+
+    text = f'{corpus.vocabulary[700]} {corpus.vocabulary[1500]}'
+    single = SearchIndex()
+    single.add_segment('all', Segment(encode_segment(
+        {docnum: analyze(message, response) for docnum, (message, response) in enumerate(docs, start=1)})))
+    print('top 10 matches a single-segment build:', single.search(text) == index.search(text))
+
+    index_turn(table, turns + 1, 'zzqq special question', 'zzqq answer ' + corpus.words(200))
+    table.read_bytes = 0
+    with quiet:
+        results = search(container, 'zzqq')
+    print(f'new turn found on the next search: {results[0]["message"].startswith("zzqq")}, '
+          f'refresh read {table.read_bytes / 1024:.1f} KB')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,188 @@
+"""
+Simulation: polls wasted on dead workers, with and without the heartbeat lease.
+
+Each turn runs on a virtual clock against the real chat-status handler and
+LeaseHeartbeat from the chat Lambda, over the fake session table. The worker
+renews its lease every HEARTBEAT_INTERVAL_SECONDS while it is alive. The client
+polls once a second, for up to MAX_POLLS attempts, until it sees a terminal
+status. Injected failures:
+
+- crash: the worker dies at a uniform point of its stream
+- timeout: the stream runs past the 30 s Lambda deadline
+
+"Before" writes the turn without leaseExpiresAt, as the chat Lambda did, so
+a dead worker's turn reads 'processing' until the client gives up. A wasted
+poll is one made after the worker died that still saw 'processing'. At the
+end, the real chat-sweeper runs once on each table.
+
+Run from the project root:
+    python tests/bench_stale_turns.py [turns]
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import FakeDynamoDB, FakeTable, api_event, load_function  # noqa: E402
+
+SESSIONS_TABLE = 'chat-sessions-bench'
+ENV = {'CHAT_SESSIONS_TABLE_NAME': SESSIONS_TABLE}
+
+LAMBDA_TIMEOUT_SECONDS = 30
+LEASE_SECONDS = 15
+HEARTBEAT_INTERVAL_SECONDS = 5
+POLL_INTERVAL_SECONDS = 1
+MAX_POLLS = 60
+
+# Healthy streams last this long (seconds); timed-out ones would have run up to TIMEOUT_RUN_MAX
+STREAM_SECONDS = (2, 28)
+TIMEOUT_RUN_MAX = 90
+
+TERMINAL_STATUSES = ('completed', 'error', 'cancelled', 'stale')
+
+FAILURE_RATES = ((0.05, 0.05), (0.10, 0.10))
+
+
+class VirtualClock:
+    """time.time() stand-in that only moves when the simulation says so"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Simulation:
+
+    def __init__(self, with_lease, clock):
+        self.with_lease = with_lease
+        self.clock = clock
+        self.sessions = FakeTable(SESSIONS_TABLE, ['sessionId'])
+        self.dynamodb = FakeDynamoDB(self.sessions)
+        self.chat = load_function('chat', f'bench_chat_{with_lease}', ENV, self.dynamodb)
+        self.status = load_function('chat-status', f'bench_chat_status_{with_lease}', ENV, self.dynamodb)
+        self.sweeper = load_function('chat-sweeper', f'bench_chat_sweeper_{with_lease}', ENV, self.dynamodb)
+        self.renewals = 0
+
+    def run_turn(self, started, run_seconds, dies_at):
+        """Play one turn; returns (death time or None, polls wasted, seconds from death to a terminal status)"""
+        session_id, turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        deadline = started + LAMBDA_TIMEOUT_SECONDS
+        end = started + run_seconds
+        if dies_at is None and run_seconds > LAMBDA_TIMEOUT_SECONDS:
+            dies_at = deadline
+        death = None if dies_at is None else min(dies_at, end)
+
+        self.clock.now = started
+        heartbeat = self.chat.LeaseHeartbeat(self.dynamodb.meta.client, SESSIONS_TABLE, session_id, turn_id,
+                                             lease_seconds=LEASE_SECONDS, deadline=deadline)
+        item = {'sessionId': session_id, 'turnId': turn_id, 'status': 'processing', 'response': '',
+                'chunks': [], 'inFlight': 'true'}
+        if self.with_lease:
+            item['leaseExpiresAt'] = heartbeat.lease_expiry()
+        self.sessions.put_item(Item=item)
+
+        # (time, order, action): the worker's writes land before a poll at the same instant
+        events = [(started + poll * POLL_INTERVAL_SECONDS, 1, 'poll') for poll in range(1, MAX_POLLS + 1)]
+        if death is None:
+            events.append((end, 0, 'complete'))
+        if self.with_lease:
+            renewal = started + HEARTBEAT_INTERVAL_SECONDS
+            while renewal < (end if death is None else death):
+                events.append((renewal, 0, 'renew'))
+                renewal += HEARTBEAT_INTERVAL_SECONDS
+
+        wasted = 0
+        for at, _, action in sorted(events):
+            self.clock.now = at
+            if action == 'renew':
+                heartbeat.renew()
+                self.renewals += 1
+            elif action == 'complete':
+                self.sessions.update_item(
+                    Key={'sessionId': session_id},
+                    UpdateExpression='SET #status = :completed REMOVE inFlight',
+                    ExpressionAttributeNames={'#status': 'status'},
+                    ExpressionAttributeValues={':completed': 'completed'})
+            else:
+                status = self.poll(session_id, turn_id)
+                if status in TERMINAL_STATUSES:
+                    return death, wasted, None if death is None else at - death
+                if death is not None and at >= death:
+                    wasted += 1
+        # The client gave up; the turn is still 'processing'
+        return death, wasted, None if death is None else self.clock.now - death
+
+    def poll(self, session_id, turn_id):
+        response = self.status.handler(api_event(path_parameters={'sessionId': session_id},
+                                                 query={'turnId': turn_id}), None)
+        return json.loads(response['body'])['status']
+
+    def stuck(self):
+        return sum(1 for item in self.sessions.items.values() if item['status'] == 'processing')
+
+
+def plan_turns(rng, turns, crash_rate, timeout_rate):
+    """(kind, run seconds, crash time offset or None) per turn"""
+    plan = []
+    for _ in range(turns):
+        roll = rng.random()
+        if roll < crash_rate:
+            run_seconds = rng.uniform(*STREAM_SECONDS)
+            plan.append(('crash', run_seconds, rng.uniform(0, run_seconds)))
+        elif roll < crash_rate + timeout_rate:
+            plan.append(('timeout', rng.uniform(LAMBDA_TIMEOUT_SECONDS, TIMEOUT_RUN_MAX), None))
+        else:
+            plan.append(('ok', rng.uniform(*STREAM_SECONDS), None))
+    return plan
+
+
+def simulate(plan, with_lease):
+    clock = VirtualClock(1_700_000_000)
+    with mock.patch('time.time', clock), contextlib.redirect_stdout(io.StringIO()):
+        simulation = Simulation(with_lease, clock)
+        wasted, latency = 0, {'crash': [], 'timeout': []}
+        for index, (kind, run_seconds, crash_offset) in enumerate(plan):
+            started = 1_700_000_000 + index * 1000
+            dies_at = None if crash_offset is None else started + crash_offset
+            _, turn_wasted, to_terminal = simulation.run_turn(started, run_seconds, dies_at)
+            wasted += turn_wasted
+            if kind != 'ok':
+                latency[kind].append(to_terminal)
+        stuck = simulation.stuck()
+        clock.now += 3600
+        simulation.sweeper.handler({}, None)
+    return {'wasted': wasted, 'latency': latency, 'stuck': stuck, 'swept_stuck': simulation.stuck(),
+            'renewals': simulation.renewals}
+
+
+def main(turns):
+    for crash_rate, timeout_rate in FAILURE_RATES:
+        plan = plan_turns(random.Random(17), turns, crash_rate, timeout_rate)
+        before, after = simulate(plan, with_lease=False), simulate(plan, with_lease=True)
+        print(f'{turns} turns, {crash_rate:.0%} crash + {timeout_rate:.0%} timeout '
+              f'({sum(kind == "crash" for kind, _, _ in plan)} crashed, '
+              f'{sum(kind == "timeout" for kind, _, _ in plan)} timed out):')
+        print(f'    wasted polls:              {before["wasted"]:>6} -> {after["wasted"]:>5} '
+              f'({after["wasted"] / before["wasted"] - 1:+.0%})')
+        for kind in ('crash', 'timeout'):
+            print(f'    death -> terminal, {kind:<7} {statistics.mean(before["latency"][kind]):5.1f}s -> '
+                  f'{statistics.mean(after["latency"][kind]):4.1f}s (mean; "before" is when the client gives up)')
+        dead = before['latency']['crash'] + before['latency']['timeout']
+        print(f'    death -> terminal, all     {statistics.mean(dead):5.1f}s -> '
+              f'{statistics.mean(after["latency"]["crash"] + after["latency"]["timeout"]):4.1f}s')
+        print(f'    lease renewals per turn:   {after["renewals"] / turns:.1f} (one write each)')
+        print(f'    left processing:           {before["stuck"]:>6} -> {after["stuck"]:>5}, '
+              f'after one sweep {before["swept_stuck"]} -> {after["swept_stuck"]}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,109 @@
+"""
+Benchmark: assembling multi-MB emoji/CJK-heavy agent streams.
+
+Compares the StreamAssembler with the loop it replaced in the chat Lambda
+(strict per-chunk decode, full_response += and a parallel chunks list),
+without the DynamoDB writes. The old loop raises on a character split
+across chunks, so it is timed on chunks cut at character boundaries; both
+are then run on chunks cut at random bytes, as Bedrock may deliver them.
+Times are the best of three runs; memory is the peak while assembling.
+
+Run from the project root:
+    python tests/bench_stream_assembler.py [size_mb ...]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from test_stream_assembler import StreamAssembler, generate_text, split_bytes  # noqa: E402
+
+MODES = ('word', 'line', 'markdown')
+RUNS = 3
+
+# Longest chunk in characters: token-sized chunks, and the multi-KB ones agents also send
+CHUNK_CHARACTERS = (32, 4096)
+
+
+def old_loop(chunks):
+    """The chat Lambda's loop before StreamAssembler, minus the DynamoDB writes"""
+    full_response = ''
+    chunk_texts = []
+    for chunk in chunks:
+        chunk_text = chunk.decode('utf-8')
+        full_response += chunk_text
+        chunk_texts.append(chunk_text)
+    return chunk_texts, full_response
+
+
+def assemble(mode, chunks):
+    assembler = StreamAssembler(mode)
+    for chunk in chunks:
+        assembler.feed(chunk)
+    assembler.finish()
+    return assembler
+
+
+def split_text(rng, text, max_chars):
+    """Chunks cut at character boundaries"""
+    chunks, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, max_chars)
+        chunks.append(text[pos:pos + size].encode('utf-8'))
+        pos += size
+    return chunks
+
+
+def best_time(function, *args):
+    best = None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(function, *args):
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(sizes_mb):
+    rng = random.Random(7)
+    for size_mb in sizes_mb:
+        text = generate_text(rng, int(size_mb * 1024 * 1024))
+        size = len(text.encode('utf-8')) / 1e6
+
+        for max_chars in CHUNK_CHARACTERS:
+            chunks = split_text(rng, text, max_chars)
+            assert old_loop(chunks)[1] == text
+            old = best_time(old_loop, chunks)
+            print(f'{size:.1f} MB in {len(chunks)} chunks of 1-{max_chars} characters:')
+            print(f'    old loop            {old:.3f}s, peak {peak_memory(old_loop, chunks) / 1e6:.1f} MB')
+            for mode in MODES:
+                assert assemble(mode, chunks).text() == text
+                elapsed = best_time(assemble, mode, chunks)
+                print(f'    assembler[{mode:<8}] {elapsed:.3f}s ({elapsed / old:.1f}x), '
+                      f'peak {peak_memory(assemble, mode, chunks) / 1e6:.1f} MB')
+
+        chunks = split_bytes(rng, text.encode('utf-8'))
+        try:
+            old_loop(chunks)
+            failure = 'ok'
+        except UnicodeDecodeError:
+            failure = 'raises UnicodeDecodeError'
+        print(f'{size:.1f} MB in {len(chunks)} chunks of 1-64 random bytes: old loop {failure}')
+        for mode in MODES:
+            assert assemble(mode, chunks).text() == text
+            print(f'    assembler[{mode:<8}] {best_time(assemble, mode, chunks):.3f}s')
+
+
+if __name__ == '__main__':
+    main([float(arg) for arg in sys.argv[1:]] or [1, 8])
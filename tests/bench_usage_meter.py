@@ -0,0 +1,107 @@
+"""
+Benchmark: usage-table write amplification and metering overhead.
+
+A single turn, a compare turn over three lanes and a 50-prompt batch run
+through the real chat and chat-batch handlers against the fake Bedrock
+runtime (CHUNKS chunks per invocation) and a fake usage table. The usage
+writes they make are counted and compared with metering by one ADD per
+chunk plus one per request. The size of each update is estimated from its
+attribute names and values, since a write costs 1 WCU per 1 KB.
+
+Run from the project root:
+    python tests/bench_usage_meter.py
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import (FakeAgentRuntime, FakeContext, FakeDynamoDB, FakeEventStream, FakeTable,  # noqa: E402
+                      api_event, load_function, text_chunks)
+from test_usage_meter import UsageMeter  # noqa: E402
+
+CHUNKS = 200
+BATCH_PROMPTS = 50
+RUNS = 20
+METERING_CALLS = 100000
+
+USER_ID = 'user-bench'
+AGENT_TYPES = ('supervisor', 'generic', 'coding', 'financial')
+ENV = {
+    'CHAT_SESSIONS_TABLE_NAME': 'chat-sessions-bench',
+    'USAGE_TABLE_NAME': 'usage-bench',
+    **{f'{agent_type.upper()}_AGENT_ID': f'{agent_type}-agent' for agent_type in AGENT_TYPES},
+    **{f'{agent_type.upper()}_AGENT_ALIAS_ID': f'{agent_type}-alias' for agent_type in AGENT_TYPES}
+}
+
+
+class RecordingUsageTable(FakeTable):
+    """Usage table that keeps the largest update it was sent, in bytes"""
+
+    largest_update = 0
+
+    def update_item(self, **params):
+        size = sum(len(name) for name in params['ExpressionAttributeNames'].values()) + \
+            sum(len(str(value)) for value in params['ExpressionAttributeValues'].values())
+        self.largest_update = max(self.largest_update, size)
+        return super().update_item(**params)
+
+
+def run(request, usage):
+    """Run request RUNS times; returns (usage writes, chunks streamed) per request"""
+    before_writes, before_chunks = usage.calls['update_item'], chunks_streamed(usage)
+    for _ in range(RUNS):
+        request()
+    return ((usage.calls['update_item'] - before_writes) / RUNS,
+            (chunks_streamed(usage) - before_chunks) / RUNS)
+
+
+def chunks_streamed(usage):
+    return sum(bucket.get('chunks', 0) for bucket in usage.items.values())
+
+
+def main():
+    sessions = FakeTable(ENV['CHAT_SESSIONS_TABLE_NAME'], ['sessionId'])
+    usage = RecordingUsageTable(ENV['USAGE_TABLE_NAME'], ['userId', 'day'])
+    dynamodb = FakeDynamoDB(sessions, usage)
+    runtime = FakeAgentRuntime(lambda agent_id, text: FakeEventStream(text_chunks(CHUNKS, text='An answer line.\n')))
+
+    with mock.patch.dict(os.environ, ENV), contextlib.redirect_stdout(io.StringIO()):
+        chat = load_function('chat', 'bench_chat', ENV, dynamodb, runtime)
+        batch = load_function('chat-batch', 'bench_chat_batch', ENV, dynamodb, runtime)
+
+        def chat_request(**body):
+            response = chat.handler(api_event(USER_ID, {'message': 'hello', **body}), None)
+            assert json.loads(response['body'])['success'], response
+
+        def batch_request():
+            response = batch.handler(api_event(USER_ID, {'prompts': ['hello'] * BATCH_PROMPTS}), FakeContext())
+            assert response['headers']['Content-Type'] == 'application/x-ndjson', response
+
+        cases = (
+            ('single turn', lambda: chat_request()),
+            ('compare turn (3 lanes)', lambda: chat_request(mode='compare')),
+            (f'{BATCH_PROMPTS}-prompt batch', batch_request)
+        )
+        results = [(name, *run(request, usage)) for name, request in cases]
+
+    print(f'Usage writes per request, {CHUNKS} chunks per invocation (mean of {RUNS} runs):')
+    for name, writes, chunks in results:
+        per_chunk_writes = chunks + 1
+        print(f'    {name:<24} {per_chunk_writes:>6.0f} -> {writes:.0f} write ({per_chunk_writes / writes:,.0f}x fewer)')
+    print(f'    largest update: {usage.largest_update} bytes of names and values (1 WCU up to 1 KB)')
+
+    meter = UsageMeter(None, USER_ID)
+    started = time.perf_counter()
+    for _ in range(METERING_CALLS):
+        meter.record_invocation(CHUNKS, 8000, 2500, 300)
+    print(f'    metering cost: {(time.perf_counter() - started) / METERING_CALLS * 1e6:.1f} us per Bedrock call')
+
+
+if __name__ == '__main__':
+    main()
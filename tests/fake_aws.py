@@ -0,0 +1,338 @@
+"""
+In-memory stand-ins for the AWS services the chat Lambdas call.
+
+FakeTable implements the subset of DynamoDB the functions use, including the
+condition and update expressions they send (=, <>, <, <=, >, >=,
+attribute_exists/attribute_not_exists joined by AND/OR; SET, REMOVE and ADD
+on nested map paths), so a conditional write fails exactly where DynamoDB's
+would. FakeAgentRuntime plays Bedrock Agent Runtime with scripted chunk
+streams. load_function() imports a function's index.py against them, one
+fresh module per call, i.e. one warm container.
+"""
+import copy
+import importlib.util
+import json
+import operator
+import os
+import re
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from unittest import mock
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'terraform', 'functions')
+
+COMPARISONS = {'=': operator.eq, '<>': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+CONDITION_TERM = re.compile(r'^(attribute_exists|attribute_not_exists)\(\s*(\S+?)\s*\)$|^(\S+)\s*(<>|<=|>=|=|<|>)\s*(:\w+)$')
+UPDATE_CLAUSE = re.compile(r'\b(SET|REMOVE|ADD)\s+(.*?)(?=\s+(?:SET|REMOVE|ADD)\s|$)')
+
+MISSING = object()
+
+
+class ClientError(Exception):
+    """Same shape as botocore.exceptions.ClientError"""
+
+    def __init__(self, error_response, operation_name):
+        error = error_response.get('Error', {})
+        super().__init__(f'An error occurred ({error.get("Code")}) when calling the {operation_name} '
+                         f'operation: {error.get("Message", "")}')
+        self.response = error_response
+        self.operation_name = operation_name
+
+
+def client_error(code, operation_name, message=''):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation_name)
+
+
+def throttling_error():
+    return client_error('throttlingException', 'InvokeAgent', 'Rate exceeded')
+
+
+def resolve_path(path, names):
+    return [(names or {}).get(part, part) for part in path.split('.')]
+
+
+def get_path(item, path):
+    for part in path:
+        if not isinstance(item, dict) or part not in item:
+            return MISSING
+        item = item[part]
+    return item
+
+
+def parent_of(item, path, operation_name):
+    parent = get_path(item, path[:-1])
+    if not isinstance(parent, dict):
+        raise client_error('ValidationException', operation_name,
+                           'The document path provided in the update expression is invalid for update')
+    return parent
+
+
+def evaluate(expression, item, names, values):
+    """Evaluate a condition (or key condition) expression against item"""
+    for clause in re.split(r'\s+OR\s+', expression.strip()):
+        if all(evaluate_term(term, item, names, values) for term in re.split(r'\s+AND\s+', clause)):
+            return True
+    return False
+
+
+def evaluate_term(term, item, names, values):
+    match = CONDITION_TERM.match(term.strip())
+    if match is None:
+        raise ValueError(f'Unsupported condition: {term}')
+    function, function_path, path, comparison, placeholder = match.groups()
+    if function:
+        exists = get_path(item, resolve_path(function_path, names)) is not MISSING
+        return exists if function == 'attribute_exists' else not exists
+    value = get_path(item, resolve_path(path, names))
+    if value is MISSING:
+        return comparison == '<>'
+    return COMPARISONS[comparison](value, values[placeholder])
+
+
+def apply_update(item, expression, names, values, operation_name='UpdateItem'):
+    """Apply SET/REMOVE/ADD clauses in place; returns the top-level attributes touched"""
+    touched = set()
+    for action, body in UPDATE_CLAUSE.findall(expression.strip()):
+        for action_part in body.split(','):
+            action_part = action_part.strip()
+            if action == 'SET':
+                path, placeholder = (part.strip() for part in action_part.split('='))
+                path = resolve_path(path, names)
+                parent_of(item, path, operation_name)[path[-1]] = copy.deepcopy(values[placeholder])
+            elif action == 'REMOVE':
+                path = resolve_path(action_part, names)
+                parent_of(item, path, operation_name).pop(path[-1], None)
+            else:
+                path, placeholder = action_part.split()
+                path = resolve_path(path, names)
+                parent = parent_of(item, path, operation_name)
+                parent[path[-1]] = parent.get(path[-1], 0) + values[placeholder]
+            touched.add(path[0])
+    return touched
+
+
+class FakeTable:
+    """One DynamoDB table (boto3 Table API); calls counts requests by operation"""
+
+    def __init__(self, name, key_names):
+        self.name = name
+        self.key_names = tuple(key_names)
+        self.items = {}
+        self.calls = Counter()
+        self.failed_conditions = Counter()
+        self._lock = threading.Lock()
+
+    def _key(self, key):
+        return tuple(key[name] for name in self.key_names)
+
+    def _check(self, operation_name, item, condition, names, values):
+        if condition and not evaluate(condition, item, names, values or {}):
+            self.failed_conditions[operation_name] += 1
+            raise client_error('ConditionalCheckFailedException', operation_name, 'The conditional request failed')
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None):
+        with self._lock:
+            self.calls['put_item'] += 1
+            key = self._key(Item)
+            self._check('PutItem', self.items.get(key, {}), ConditionExpression,
+                        ExpressionAttributeNames, ExpressionAttributeValues)
+            self.items[key] = copy.deepcopy(Item)
+        return {}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, ConsistentRead=False):
+        with self._lock:
+            self.calls['get_item'] += 1
+            item = self.items.get(self._key(Key))
+            if item is None:
+                return {}
+            if ProjectionExpression:
+                paths = [resolve_path(path.strip(), ExpressionAttributeNames)[0]
+                         for path in ProjectionExpression.split(',')]
+                item = {name: item[name] for name in paths if name in item}
+            return {'Item': copy.deepcopy(item)}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE'):
+        with self._lock:
+            self.calls['update_item'] += 1
+            key = self._key(Key)
+            item = copy.deepcopy(self.items.get(key, dict(Key)))
+            self._check('UpdateItem', item if key in self.items else {}, ConditionExpression,
+                        ExpressionAttributeNames, ExpressionAttributeValues)
+            touched = apply_update(item, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues or {})
+            self.items[key] = item
+            if ReturnValues == 'UPDATED_NEW':
+                return {'Attributes': copy.deepcopy({name: item[name] for name in touched if name in item})}
+            if ReturnValues == 'ALL_NEW':
+                return {'Attributes': copy.deepcopy(item)}
+            return {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues, ExpressionAttributeNames=None,
+              IndexName=None, ExclusiveStartKey=None, **params):
+        """Key conditions are evaluated over every item, which also models a sparse index"""
+        with self._lock:
+            self.calls['query'] += 1
+            items = [copy.deepcopy(item) for item in self.items.values()
+                     if evaluate(KeyConditionExpression, item, ExpressionAttributeNames, ExpressionAttributeValues)]
+        return {'Items': items}
+
+
+class FakeDynamoDBClient:
+    """The resource's meta.client: the same tables, addressed by TableName"""
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.calls = Counter()
+
+    def _table(self, operation, TableName):
+        self.calls[operation] += 1
+        return self.resource.tables[TableName]
+
+    def get_item(self, TableName, **params):
+        return self._table('get_item', TableName).get_item(**params)
+
+    def put_item(self, TableName, **params):
+        return self._table('put_item', TableName).put_item(**params)
+
+    def update_item(self, TableName, **params):
+        return self._table('update_item', TableName).update_item(**params)
+
+
+class FakeDynamoDB:
+    """boto3.resource('dynamodb') serving the given tables by name"""
+
+    def __init__(self, *tables):
+        self.tables = {table.name: table for table in tables}
+        self.meta = types.SimpleNamespace(client=FakeDynamoDBClient(self))
+
+    def Table(self, name):
+        return self.tables[name]
+
+
+class FakeEventStream:
+    """
+    An invoke_agent completion stream: yields chunk events after first_delay
+    and then every chunk_delay seconds. Raises error after fail_after chunks
+    if given. consumed and closed tell how far the caller read.
+    """
+
+    def __init__(self, chunks, first_delay=0.0, chunk_delay=0.0, fail_after=None, error=None, sleep=time.sleep):
+        self.chunks = list(chunks)
+        self.first_delay = first_delay
+        self.chunk_delay = chunk_delay
+        self.fail_after = fail_after
+        self.error = error
+        self.sleep = sleep
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for index, data in enumerate(self.chunks):
+            if self.closed:
+                return
+            delay = self.first_delay if index == 0 else self.chunk_delay
+            if delay:
+                self.sleep(delay)
+            if index == self.fail_after:
+                raise self.error
+            self.consumed += 1
+            yield {'chunk': {'bytes': data}}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAgentRuntime:
+    """
+    bedrock-agent-runtime client. script(agent_id, input_text) returns the
+    FakeEventStream to serve, or an exception for invoke_agent to raise.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.invocations = []
+        self.streams = []
+        self._lock = threading.Lock()
+
+    def invoke_agent(self, agentId, agentAliasId, sessionId, inputText, enableTrace=False):
+        outcome = self.script(agentId, inputText)
+        with self._lock:
+            self.invocations.append((agentId, sessionId, inputText))
+            if not isinstance(outcome, Exception):
+                self.streams.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {'completion': outcome}
+
+
+def text_chunks(count, size=40, text='token '):
+    """count chunk payloads of about size bytes each"""
+    payload = (text * (size // len(text) + 1))[:size].encode('utf-8')
+    return [payload] * count
+
+
+class FakeContext:
+    """Lambda context whose deadline is remaining_ms from now on clock"""
+
+    def __init__(self, remaining_ms=30000, clock=time.time):
+        self.clock = clock
+        self.deadline = clock() + remaining_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return int((self.deadline - self.clock()) * 1000)
+
+
+class ExpiredSignatureError(Exception):
+    pass
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+def decode_token(token, secret, algorithms):
+    """Fake jwt.decode: a token is the user id itself"""
+    if not token.startswith('user-'):
+        raise InvalidTokenError('Not enough segments')
+    return {'userId': token}
+
+
+FAKE_MODULES = {
+    'jwt': types.SimpleNamespace(decode=decode_token, ExpiredSignatureError=ExpiredSignatureError,
+                                 InvalidTokenError=InvalidTokenError),
+    'botocore': types.SimpleNamespace(),
+    'botocore.exceptions': types.SimpleNamespace(ClientError=ClientError),
+    'botocore.config': types.SimpleNamespace(Config=lambda **options: options)
+}
+
+
+def api_event(user_id=None, body=None, path_parameters=None, query=None, headers=None):
+    """API Gateway proxy event; user_id becomes the bearer token"""
+    headers = dict(headers or {})
+    if user_id:
+        headers['authorization'] = f'Bearer {user_id}'
+    return {
+        'headers': headers,
+        'body': body if body is None or isinstance(body, str) else json.dumps(body),
+        'pathParameters': path_parameters,
+        'queryStringParameters': query
+    }
+
+
+def load_function(function, module_name, env=None, dynamodb=None, agent_runtime=None):
+    """A fresh instance of functions/<function>/index.py, i.e. one warm container"""
+    function_dir = os.path.join(FUNCTIONS_DIR, function)
+    boto3 = types.SimpleNamespace(resource=lambda service: dynamodb,
+                                  client=lambda service, **options: agent_runtime)
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(sys.modules, {'boto3': boto3, **FAKE_MODULES}), \
+            mock.patch.dict(os.environ, env or {}), \
+            mock.patch.object(sys, 'path', [function_dir] + sys.path):
+        for sibling in [name[:-3] for name in os.listdir(function_dir) if name.endswith('.py')]:
+            sys.modules.pop(sibling, None)
+        spec.loader.exec_module(module)
+    return module
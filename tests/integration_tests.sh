@@ -30,7 +30,12 @@ TESTS_PASSED=0
 TESTS_FAILED=0
 TESTS_SKIPPED=0
 
+# assert_http_status runs in a command substitution, so it records results here
+RESULTS_FILE=$(mktemp)
+trap 'rm -f "$RESULTS_FILE"' EXIT
+
 # Helper function to assert HTTP status
+# Messages go to stderr so that only the response body is captured.
 assert_http_status() {
   local test_name=$1
   local method=$2
@@ -39,10 +44,11 @@ assert_http_status() {
   local data=$5
   local expected_status=$6
   
+  # eval, so quoted header arguments ("-H 'Authorization: Bearer ...'") stay one word
   if [ "$method" = "GET" ]; then
-    response=$(curl -s -w "\n%{http_code}" -X GET "$API_ENDPOINT$endpoint" $headers)
+    response=$(eval "curl -s -w '\n%{http_code}' -X GET \"\$API_ENDPOINT\$endpoint\" $headers")
   else
-    response=$(curl -s -w "\n%{http_code}" -X POST "$API_ENDPOINT$endpoint" $headers -d "$data")
+    response=$(eval "curl -s -w '\n%{http_code}' -X POST \"\$API_ENDPOINT\$endpoint\" $headers -d \"\$data\"")
   fi
   
   # Extract status code from last line
@@ -51,26 +57,12 @@ assert_http_status() {
   body=$(echo "$response" | head -n-1)
   
   if [ "$http_code" = "$expected_status" ]; then
-    echo -e "${GREEN}✅ PASS${NC}: $test_name (HTTP $http_code)"
-    ((TESTS_PASSED++))
-  else
-    echo -e "${RED}❌ FAIL${NC}: $test_name (Expected HTTP $expected_status, got $http_code)"
-    echo "Response body: $(echo $body | cut -c1-200)"
-    ((TESTS_FAILED++))
-  fi
-  
-  # Return body for further processing
-  echo "$body"
-}
-  
-  if [ "$http_code" -eq "$expected_status" ]; then
-    echo -e "${GREEN}✅ PASS${NC}: $test_name (HTTP $http_code)"
-    ((TESTS_PASSED++))
+    echo -e "${GREEN}✅ PASS${NC}: $test_name (HTTP $http_code)" >&2
+    echo "pass" >> "$RESULTS_FILE"
   else
-    echo -e "${RED}❌ FAIL${NC}: $test_name (Expected HTTP $expected_status, got $http_code)"
-    echo "Response body: $body" | head -c 200
-    echo ""
-    ((TESTS_FAILED++))
+    echo -e "${RED}❌ FAIL${NC}: $test_name (Expected HTTP $expected_status, got $http_code)" >&2
+    echo "Response body: $(echo $body | cut -c1-200)" >&2
+    echo "fail" >> "$RESULTS_FILE"
   fi
   
   # Return body for further processing
@@ -116,6 +108,15 @@ assert_json_exists() {
   fi
 }
 
+# Lowercase random UUID (chat turnIds must be UUIDs)
+new_uuid() {
+  if command -v uuidgen >/dev/null 2>&1; then
+    uuidgen | tr '[:upper:]' '[:lower:]'
+  else
+    cat /proc/sys/kernel/random/uuid
+  fi
+}
+
 # Print header
 print_header() {
   echo -e "\n${BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}"
@@ -264,10 +265,175 @@ main() {
     "" \
     "200")
 
-  # ===== PHASE 5: CORS Headers =====
-  print_header "🌐 PHASE 5: CORS Headers Validation"
+  # ===== PHASE 5: Batch Chat =====
+  print_header "📦 PHASE 5: Batch Chat"
+
+  echo "Test 15: Batch Without Authentication"
+  batch_no_auth=$(assert_http_status "Batch No Auth" "POST" "/api/chat/batch" \
+    "-H 'Content-Type: application/json'" \
+    "{\"prompts\":[\"What is 2+2?\"]}" \
+    "200")
+  assert_json_field "Batch requires authentication" "$batch_no_auth" ".errorType" "auth"
+
+  echo "Test 16: Batch With Non-array Prompts"
+  batch_string=$(assert_http_status "Batch Non-array Prompts" "POST" "/api/chat/batch" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "{\"prompts\":\"hello\"}" \
+    "200")
+  assert_json_field "Non-array prompts rejected" "$batch_string" ".errorType" "validation"
+
+  echo "Test 17: Batch With A Prompt Missing Its Message"
+  batch_missing=$(assert_http_status "Batch Missing Message" "POST" "/api/chat/batch" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "{\"prompts\":[\"What is 2+2?\",{\"id\":\"q2\"}]}" \
+    "200")
+  assert_json_field "Prompt without message rejected" "$batch_missing" ".error" "Prompt 1 has no message"
+
+  echo "Test 18: Batch Over The Size Limit"
+  oversized=$(jq -cn '{prompts: [range(51) | "What is \(.)+1?"]}')
+  batch_oversized=$(assert_http_status "Batch Over Limit" "POST" "/api/chat/batch" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "$oversized" \
+    "200")
+  assert_json_field "51 prompts rejected" "$batch_oversized" ".errorType" "validation"
+
+  echo "Test 19: Run A Batch"
+  batch=$(assert_http_status "Run Batch" "POST" "/api/chat/batch" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "{\"agentType\":\"generic\",\"prompts\":[\"What is 2+2?\",{\"id\":\"q2\",\"message\":\"What is 3+3?\"}]}" \
+    "200")
+  # NDJSON: one line per prompt, in completion order
+  batch_summary=$(echo "$batch" | jq -cs '{
+    count: length,
+    ids: (map(.id) | sort | join(",")),
+    valid: all(.[]; .status | IN("completed", "error", "skipped", "timeout"))
+  }')
+  assert_json_field "One NDJSON line per prompt" "$batch_summary" ".count" "2"
+  assert_json_field "Lines carry the prompt ids" "$batch_summary" ".ids" "0,q2"
+  assert_json_field "Every line has a known status" "$batch_summary" ".valid" "true"
+
+  # ===== PHASE 6: Cancellation =====
+  print_header "⏹️  PHASE 6: Cancellation"
+
+  echo "Test 20: Cancel Without Authentication"
+  cancel_no_auth=$(assert_http_status "Cancel No Auth" "POST" "/api/chat/$SESSION_ID/cancel" \
+    "-H 'Content-Type: application/json'" \
+    "{}" \
+    "200")
+  assert_json_field "Cancel requires authentication" "$cancel_no_auth" ".errorType" "auth"
+
+  echo "Test 21: Cancel A Finished Turn"
+  cancel_finished=$(assert_http_status "Cancel Finished Turn" "POST" "/api/chat/$SESSION_ID/cancel" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "{}" \
+    "200")
+  assert_json_field "Finished turn is not cancellable" "$cancel_finished" ".errorType" "not_cancellable"
+
+  echo "Test 22: Cancel An In-flight Turn"
+  # The client mints sessionId/turnId, so it can cancel before POST /api/chat returns
+  CANCEL_SESSION_ID="itest-cancel-$(date +%s)-$RANDOM"
+  CANCEL_TURN_ID=$(new_uuid)
+  curl -s -o /dev/null -X POST "$API_ENDPOINT/api/chat" \
+    -H 'Content-Type: application/json' -H "Authorization: Bearer $TOKEN" \
+    -d "{\"message\":\"Write a detailed 2000-word essay on the history of computing.\",\"agentType\":\"supervisor\",\"sessionId\":\"$CANCEL_SESSION_ID\",\"turnId\":\"$CANCEL_TURN_ID\"}" &
+  chat_pid=$!
+  sleep 3
+  cancel=$(assert_http_status "Cancel In-flight Turn" "POST" "/api/chat/$CANCEL_SESSION_ID/cancel" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "{\"turnId\":\"$CANCEL_TURN_ID\"}" \
+    "200")
+  wait $chat_pid
+
+  if [ "$(echo "$cancel" | jq -r '.success')" = "true" ]; then
+    assert_json_field "Cancel acknowledged" "$cancel" ".status" "cancelling"
+    cancelled=$(assert_http_status "Cancelled Turn Status" "GET" "/api/chat/status/$CANCEL_SESSION_ID?turnId=$CANCEL_TURN_ID" \
+      "-H 'Authorization: Bearer $TOKEN'" \
+      "" \
+      "200")
+    assert_json_field "Turn ends cancelled" "$cancelled" ".status" "cancelled"
+  else
+    echo -e "${YELLOW}ℹ️  Turn finished or failed before the cancel arrived: $(echo "$cancel" | jq -r '.error')${NC}"
+    ((TESTS_SKIPPED++))
+  fi
+
+  # A turnId runs once; re-sending it must not reopen the turn
+  replay=$(assert_http_status "Replay A Finished Turn" "POST" "/api/chat" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "{\"message\":\"Hello again\",\"agentType\":\"supervisor\",\"sessionId\":\"$CANCEL_SESSION_ID\",\"turnId\":\"$CANCEL_TURN_ID\"}" \
+    "200")
+  assert_json_field "Reused turnId is rejected" "$replay" ".errorType" "validation"
+
+  # ===== PHASE 7: Usage =====
+  print_header "📈 PHASE 7: Usage"
+
+  echo "Test 23: Usage Without Authentication"
+  usage_no_auth=$(assert_http_status "Usage No Auth" "GET" "/api/usage" "" "" "200")
+  assert_json_field "Usage requires authentication" "$usage_no_auth" ".errorType" "auth"
+
+  echo "Test 24: Usage With A Malformed Date"
+  usage_bad_date=$(assert_http_status "Usage Malformed Date" "GET" "/api/usage?from=2026-13-01" \
+    "-H 'Authorization: Bearer $TOKEN'" \
+    "" \
+    "200")
+  assert_json_field "Malformed date rejected" "$usage_bad_date" ".errorType" "validation"
+
+  echo "Test 25: Usage With From After To"
+  usage_reversed=$(assert_http_status "Usage Reversed Range" "GET" "/api/usage?from=2026-10-07&to=2026-10-01" \
+    "-H 'Authorization: Bearer $TOKEN'" \
+    "" \
+    "200")
+  assert_json_field "Reversed range rejected" "$usage_reversed" ".errorType" "validation"
+
+  echo "Test 26: Usage For The Last 30 Days"
+  usage=$(assert_http_status "Usage Default Range" "GET" "/api/usage" \
+    "-H 'Authorization: Bearer $TOKEN'" \
+    "" \
+    "200")
+  assert_json_field "Usage success flag" "$usage" ".success" "true"
+  assert_json_field "Daily buckets returned" "$usage" ".days | type" "array"
+  assert_json_field "Turns from this run are counted" "$usage" "(.totals.turns // 0) > 0" "true"
+
+  # ===== PHASE 8: Search =====
+  print_header "🔎 PHASE 8: Search"
+
+  echo "Test 27: Search Without Authentication"
+  search_no_auth=$(assert_http_status "Search No Auth" "GET" "/api/search?q=computing" "" "" "200")
+  assert_json_field "Search requires authentication" "$search_no_auth" ".errorType" "auth"
+
+  echo "Test 28: Search With Only Stopwords"
+  search_stopwords=$(assert_http_status "Search Stopwords" "GET" "/api/search?q=the+and" \
+    "-H 'Authorization: Bearer $TOKEN'" \
+    "" \
+    "200")
+  assert_json_field "Unsearchable query rejected" "$search_stopwords" ".errorType" "validation"
+
+  echo "Test 29: Find A Completed Turn"
+  # A word no other turn contains, so this turn must rank first
+  SEARCH_TERM="itest$(date +%s)$RANDOM"
+  SEARCH_SESSION_ID="itest-search-$(date +%s)-$RANDOM"
+  search_chat=$(assert_http_status "Chat To Index" "POST" "/api/chat" \
+    "-H 'Content-Type: application/json' -H 'Authorization: Bearer $TOKEN'" \
+    "{\"message\":\"In one sentence, what could the made-up word $SEARCH_TERM mean?\",\"agentType\":\"supervisor\",\"sessionId\":\"$SEARCH_SESSION_ID\"}" \
+    "200")
+  search_turn_status=$(curl -s "$API_ENDPOINT/api/chat/status/$SEARCH_SESSION_ID" -H "Authorization: Bearer $TOKEN" | jq -r '.status')
+
+  if [ "$search_turn_status" = "completed" ]; then
+    search=$(assert_http_status "Search" "GET" "/api/search?q=$SEARCH_TERM" \
+      "-H 'Authorization: Bearer $TOKEN'" \
+      "" \
+      "200")
+    assert_json_field "Search success flag" "$search" ".success" "true"
+    assert_json_field "Indexed turn ranks first" "$search" ".results[0].sessionId" "$SEARCH_SESSION_ID"
+    assert_json_field "Snippet present" "$search" ".results[0].snippet | type" "string"
+  else
+    echo -e "${YELLOW}ℹ️  Turn did not complete (status: $search_turn_status), only completed turns are indexed${NC}"
+    ((TESTS_SKIPPED++))
+  fi
+
+  # ===== PHASE 9: CORS Headers =====
+  print_header "🌐 PHASE 9: CORS Headers Validation"
 
-  echo "Test 15: Check CORS Headers"
+  echo "Test 30: Check CORS Headers"
   cors_check=$(curl -s -I "$API_ENDPOINT/health" | grep -i "Access-Control-Allow-Origin")
   if echo "$cors_check" | grep -q "\*"; then
     echo -e "${GREEN}✅ CORS headers present and allow all origins${NC}"
@@ -281,6 +447,8 @@ main() {
   # ===== RESULTS SUMMARY =====
   print_header "📊 Test Results Summary"
   
+  TESTS_PASSED=$((TESTS_PASSED + $(grep -c '^pass$' "$RESULTS_FILE")))
+  TESTS_FAILED=$((TESTS_FAILED + $(grep -c '^fail$' "$RESULTS_FILE")))
   total=$((TESTS_PASSED + TESTS_FAILED + TESTS_SKIPPED))
   pass_rate=$((TESTS_PASSED * 100 / (TESTS_PASSED + TESTS_FAILED + 1)))
   
@@ -0,0 +1,145 @@
+"""
+Tests for the chat-batch Lambda's deadline handling, retries and validation.
+
+Prompts run against the fake Bedrock Agent Runtime in fake_aws. A prompt's
+text picks its behaviour: "slow" streams for longer than the test deadline,
+"throttled <n>" is throttled n times before it streams, anything else
+streams at once. Deadline margins are scaled down so a "Lambda" has 0.6 s.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import (FakeAgentRuntime, FakeContext, FakeDynamoDB, FakeEventStream, FakeTable,  # noqa: E402
+                      api_event, load_function, text_chunks, throttling_error)
+
+USAGE_TABLE = 'usage-test'
+USER_ID = 'user-1'
+
+BATCH_ENV = {
+    'USAGE_TABLE_NAME': USAGE_TABLE,
+    'SUPERVISOR_AGENT_ID': 'supervisor-agent',
+    'SUPERVISOR_AGENT_ALIAS_ID': 'supervisor-alias',
+    'CODING_AGENT_ID': 'coding-agent',
+    'CODING_AGENT_ALIAS_ID': 'coding-alias'
+}
+
+# Lambda time left when the batch starts, and the margins it keeps (ms)
+REMAINING_MS = 600
+DEADLINE_MARGIN_MS = 400
+RESPONSE_MARGIN_MS = 100
+
+
+class ScriptedRuntime(FakeAgentRuntime):
+    """Plays each prompt as its text says; slow streams wait until the test releases them"""
+
+    def __init__(self, fast_delay=0.0):
+        super().__init__(self.play)
+        self.fast_delay = fast_delay
+        self.released = threading.Event()
+        self.throttles = {}
+        self._throttle_lock = threading.Lock()
+
+    def play(self, agent_id, text):
+        if text.startswith('throttled'):
+            with self._throttle_lock:
+                remaining = self.throttles.setdefault(text, int(text.split()[1]))
+                self.throttles[text] = remaining - 1
+            if remaining > 0:
+                return throttling_error()
+        if text == 'slow':
+            return FakeEventStream(text_chunks(3), first_delay=5, sleep=self.released.wait)
+        return FakeEventStream(text_chunks(3), first_delay=self.fast_delay, sleep=self.released.wait)
+
+
+class ChatBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.usage = FakeTable(USAGE_TABLE, ['userId', 'day'])
+        self.runtime = ScriptedRuntime()
+        self.addCleanup(self.runtime.released.set)
+        self.batch = load_function('chat-batch', f'chat_batch_{self.id()}', BATCH_ENV,
+                                   FakeDynamoDB(self.usage), self.runtime)
+        for name, value in (('DEADLINE_MARGIN_MS', DEADLINE_MARGIN_MS), ('RESPONSE_MARGIN_MS', RESPONSE_MARGIN_MS),
+                            ('RETRY_BASE_DELAY', 0.01), ('BATCH_CONCURRENCY', 2)):
+            patcher = mock.patch.object(self.batch, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_batch(self, prompts, remaining_ms=REMAINING_MS):
+        started = time.time()
+        response = self.batch.handler(api_event(USER_ID, {'prompts': prompts}), FakeContext(remaining_ms))
+        self.elapsed = time.time() - started
+        if response['headers']['Content-Type'] != 'application/x-ndjson':
+            return json.loads(response['body'])
+        return sorted((json.loads(line) for line in response['body'].splitlines()), key=lambda line: line['index'])
+
+    def usage_counters(self):
+        [bucket] = self.usage.items.values()
+        return bucket
+
+    def test_all_prompts_complete(self):
+        results = self.run_batch(['one', {'id': 'q2', 'message': 'two', 'agentType': 'coding'}, 'three'])
+        self.assertEqual([result['status'] for result in results], ['completed'] * 3)
+        self.assertEqual([result['id'] for result in results], ['0', 'q2', '2'])
+        self.assertEqual(results[0]['response'], text_chunks(3)[0].decode('utf-8') * 3)
+        self.assertIn(('coding-agent', 'two'), [(agent, text) for agent, _, text in self.runtime.invocations])
+        self.assertEqual(self.usage_counters()['agentInvocations'], 3)
+
+    def test_running_prompts_time_out_and_queued_ones_are_skipped(self):
+        results = self.run_batch(['slow', 'slow', 'fast', 'fast', 'fast'])
+        self.assertEqual([result['status'] for result in results], ['timeout', 'timeout', 'skipped', 'skipped', 'skipped'])
+        # Returned at the response margin, not when the slow prompts finish
+        self.assertLess(self.elapsed, (REMAINING_MS - RESPONSE_MARGIN_MS) / 1000 + 0.2)
+        self.assertEqual(len(self.runtime.invocations), 2)
+        counters = self.usage_counters()
+        self.assertEqual((counters['timeoutPrompts'], counters['skippedPrompts']), (2, 3))
+
+    def test_prompts_not_started_before_the_start_deadline_are_skipped(self):
+        self.runtime.fast_delay = 0.3
+        with mock.patch.object(self.batch, 'BATCH_CONCURRENCY', 1):
+            results = self.run_batch(['first', 'second', 'third'])
+        # The first prompt ends after the start deadline (0.2 s) but before the wait deadline (0.5 s)
+        self.assertEqual([result['status'] for result in results], ['completed', 'skipped', 'skipped'])
+        self.assertEqual(len(self.runtime.invocations), 1)
+
+    def test_completed_results_are_kept_when_others_time_out(self):
+        results = self.run_batch(['fast', 'slow'])
+        self.assertEqual([result['status'] for result in results], ['completed', 'timeout'])
+
+    def test_throttled_prompt_is_retried(self):
+        [result] = self.run_batch(['throttled 2'])
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(len(self.runtime.invocations), 3)
+        self.assertEqual(self.usage_counters()['agentInvocations'], 1)
+
+    def test_retries_give_up_after_max_retries(self):
+        [result] = self.run_batch(['throttled 9'])
+        self.assertEqual((result['status'], result['errorType']), ('error', 'throttling'))
+        self.assertEqual(len(self.runtime.invocations), self.batch.MAX_RETRIES + 1)
+
+    def test_retry_backoff_past_the_deadline_is_not_attempted(self):
+        with mock.patch.object(self.batch, 'RETRY_BASE_DELAY', 1.0):
+            [result] = self.run_batch(['throttled 1'])
+        self.assertEqual((result['status'], result['errorType']), ('error', 'throttling'))
+        self.assertEqual(len(self.runtime.invocations), 1)
+        self.assertLess(self.elapsed, 0.3)
+
+    def test_invalid_prompts(self):
+        for prompts in ('just a string', {'message': 'hi'}, ['ok', {'id': 'x'}], ['ok', '  '], [], ['ok'] * 51):
+            result = self.run_batch(prompts)
+            self.assertEqual((result['success'], result['errorType']), (False, 'validation'), prompts)
+        self.assertEqual(self.runtime.invocations, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
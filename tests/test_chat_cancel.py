@@ -0,0 +1,147 @@
+"""
+Tests for turn ownership and cancellation in the chat Lambda.
+
+The chat, chat-cancel and chat-status functions run against the fake
+DynamoDB and Bedrock Agent Runtime in fake_aws, sharing one session table.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import unittest
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import FakeAgentRuntime, FakeDynamoDB, FakeEventStream, FakeTable, api_event, load_function, text_chunks  # noqa: E402
+
+SESSIONS_TABLE = 'chat-sessions-test'
+USER_ID = 'user-1'
+
+CHAT_ENV = {
+    'CHAT_SESSIONS_TABLE_NAME': SESSIONS_TABLE,
+    'SUPERVISOR_AGENT_ID': 'supervisor-agent',
+    'SUPERVISOR_AGENT_ALIAS_ID': 'supervisor-alias'
+}
+
+
+class ChatTestCase(unittest.TestCase):
+    """A session table shared by fresh chat, chat-cancel and chat-status containers"""
+
+    def setUp(self):
+        # Agent ids are read per request
+        environment = mock.patch.dict(os.environ, CHAT_ENV)
+        environment.start()
+        self.addCleanup(environment.stop)
+        self.sessions = FakeTable(SESSIONS_TABLE, ['sessionId'])
+        self.dynamodb = FakeDynamoDB(self.sessions)
+        self.runtime = FakeAgentRuntime(lambda agent_id, text: FakeEventStream(text_chunks(12)))
+        self.chat = load_function('chat', f'chat_{self.id()}', CHAT_ENV, self.dynamodb, self.runtime)
+        self.status = load_function('chat-status', f'chat_status_{self.id()}', CHAT_ENV, self.dynamodb)
+
+    def send(self, message='hello', **body):
+        response = self.chat.handler(api_event(USER_ID, {'message': message, **body}), None)
+        return json.loads(response['body'])
+
+    def poll(self, session_id, turn_id):
+        response = self.status.handler(api_event(USER_ID, path_parameters={'sessionId': session_id},
+                                                 query={'turnId': turn_id}), None)
+        return json.loads(response['body'])
+
+
+class TurnIdTest(ChatTestCase):
+
+    def test_retried_turn_does_not_reopen_a_completed_turn(self):
+        session_id, turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        self.assertTrue(self.send(sessionId=session_id, turnId=turn_id)['success'])
+        completed = self.poll(session_id, turn_id)
+        self.assertEqual(completed['status'], 'completed')
+
+        retried = self.send('hello again', sessionId=session_id, turnId=turn_id)
+        self.assertFalse(retried['success'])
+        self.assertEqual(retried['errorType'], 'validation')
+        self.assertEqual(len(self.runtime.invocations), 1)
+
+        item = self.sessions.items[(session_id,)]
+        self.assertEqual((item['status'], item['message']), ('completed', 'hello'))
+        self.assertEqual(self.poll(session_id, turn_id), completed)
+
+    def test_new_turn_on_the_same_session(self):
+        session_id, first_turn, second_turn = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+        self.send(sessionId=session_id, turnId=first_turn)
+        self.assertTrue(self.send('next', sessionId=session_id, turnId=second_turn)['success'])
+        self.assertEqual(self.sessions.items[(session_id,)]['turnId'], second_turn)
+        self.assertEqual(self.poll(session_id, second_turn)['status'], 'completed')
+
+    def test_turn_id_must_be_a_uuid(self):
+        for turn_id in ('itest-turn-1', 123, str(uuid.uuid4()).replace('-', '')):
+            result = self.send(turnId=turn_id)
+            self.assertEqual(result['errorType'], 'validation', turn_id)
+        self.assertEqual(self.sessions.items, {})
+
+        self.assertTrue(self.send(turnId=str(uuid.uuid4()).upper())['success'])
+        self.assertTrue(uuid.UUID(self.send()['turnId']))
+
+
+
+class CancellationTest(ChatTestCase):
+    """A cancel through chat-cancel while the chat Lambda is streaming"""
+
+    STREAM_CHUNKS = 30
+
+    def setUp(self):
+        super().setUp()
+        self.cancel_function = load_function('chat-cancel', f'chat_cancel_{self.id()}', CHAT_ENV, self.dynamodb)
+        self.session_id, self.turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        self.cancel_results = []
+
+    def stream(self, text, cancel_after):
+        """A stream that requests cancellation once cancel_after chunks have been read"""
+        def sleep(seconds):
+            if stream.consumed == cancel_after and not self.cancel_results:
+                response = self.cancel_function.handler(api_event(USER_ID, {'turnId': self.turn_id},
+                                                                  path_parameters={'sessionId': self.session_id}), None)
+                self.cancel_results.append(json.loads(response['body']))
+
+        stream = FakeEventStream(text_chunks(self.STREAM_CHUNKS, text=text), chunk_delay=0.001, sleep=sleep)
+        self.runtime.script = lambda agent_id, message: stream
+        return stream
+
+    def test_failed_progress_condition_stops_the_stream(self):
+        stream = self.stream('a line\n', cancel_after=4)
+        result = self.send(sessionId=self.session_id, turnId=self.turn_id)
+        self.assertEqual(self.cancel_results[0]['status'], 'cancelling')
+        self.assertEqual(result['status'], 'cancelled')
+
+        # Progress is written every CANCEL_CHECK_INTERVAL (3) chunks; the write at chunk 6 fails its condition
+        self.assertEqual(stream.consumed, 6)
+        self.assertTrue(stream.closed)
+        self.assertEqual(self.sessions.failed_conditions['UpdateItem'], 1)
+        self.assertEqual(self.sessions.calls['get_item'], 0)
+
+        item = self.sessions.items[(self.session_id,)]
+        self.assertEqual(item['status'], 'cancelled')
+        self.assertTrue(item['response'].startswith('a line\n'))
+        self.assertNotIn('inFlight', item)
+
+    def test_cancel_is_read_when_there_is_nothing_to_write(self):
+        # No newline, so the markdown assembler has no segment to save and the flag is read instead
+        stream = self.stream('token ', cancel_after=4)
+        self.assertEqual(self.send(sessionId=self.session_id, turnId=self.turn_id)['status'], 'cancelled')
+        self.assertEqual(stream.consumed, 6)
+        self.assertTrue(stream.closed)
+        self.assertEqual(self.sessions.calls['get_item'], 2)
+        self.assertEqual(self.sessions.items[(self.session_id,)]['status'], 'cancelled')
+
+    def test_uncancelled_stream_is_read_to_the_end(self):
+        stream = self.stream('a line\n', cancel_after=None)
+        self.assertEqual(self.send(sessionId=self.session_id, turnId=self.turn_id)['status'], 'processing')
+        self.assertEqual((stream.consumed, stream.closed), (self.STREAM_CHUNKS, False))
+        self.assertEqual(self.sessions.items[(self.session_id,)]['status'], 'completed')
+
+
+if __name__ == '__main__':
+    unittest.main()
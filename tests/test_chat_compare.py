@@ -0,0 +1,159 @@
+"""
+Tests for compare mode in the chat Lambda: one lane per specialist agent,
+streamed concurrently into the session item.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import threading
+import unittest
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import FakeEventStream, FakeTable, api_event, load_function, text_chunks, throttling_error  # noqa: E402
+from test_chat_cancel import CHAT_ENV, USER_ID, ChatTestCase  # noqa: E402
+
+SPECIALIST_ENV = {
+    'GENERIC_AGENT_ID': 'generic-agent',
+    'GENERIC_AGENT_ALIAS_ID': 'generic-alias',
+    'CODING_AGENT_ID': 'coding-agent',
+    'CODING_AGENT_ALIAS_ID': 'coding-alias',
+    'FINANCIAL_AGENT_ID': 'financial-agent',
+    'FINANCIAL_AGENT_ALIAS_ID': 'financial-alias'
+}
+
+LANES = ('generic', 'coding', 'financial')
+
+# Whole lines, so every CANCEL_CHECK_INTERVAL chunks a lane writes its progress
+LANE_CHUNKS = 30
+
+
+class CompareTestCase(ChatTestCase):
+
+    def setUp(self):
+        # Specialist ids are read when the function is loaded
+        environment = mock.patch.dict(os.environ, SPECIALIST_ENV)
+        environment.start()
+        self.addCleanup(environment.stop)
+        super().setUp()
+        self.client = self.dynamodb.meta.client
+        self.cancel_function = load_function('chat-cancel', f'chat_cancel_{self.id()}', CHAT_ENV, self.dynamodb)
+        self.session_id, self.turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+
+    def lane_stream(self, agent_type, **options):
+        return FakeEventStream(text_chunks(LANE_CHUNKS, text=f'{agent_type} says\n'), **options)
+
+    def financial_lane_fails(self, agent_id, text):
+        if agent_id == 'financial-agent':
+            return self.lane_stream('financial', fail_after=10, error=RuntimeError('stream broke'))
+        return self.lane_stream(agent_id.split('-')[0])
+
+    def compare(self):
+        return self.send('which is better?', mode='compare', sessionId=self.session_id, turnId=self.turn_id)
+
+    def cancel(self):
+        response = self.cancel_function.handler(api_event(USER_ID, {'turnId': self.turn_id},
+                                                          path_parameters={'sessionId': self.session_id}), None)
+        return json.loads(response['body'])
+
+    def item(self):
+        return self.sessions.items[(self.session_id,)]
+
+    def lane_statuses(self):
+        return {agent_type: lane['status'] for agent_type, lane in self.item()['lanes'].items()}
+
+
+class CompareLanesTest(CompareTestCase):
+
+    def test_every_lane_completes(self):
+        self.runtime.script = lambda agent_id, text: self.lane_stream(agent_id.split('-')[0])
+        result = self.compare()
+        self.assertEqual((result['success'], result['status']), (True, 'processing'))
+        self.assertEqual({agent_id for agent_id, _, _ in self.runtime.invocations},
+                         {f'{agent_type}-agent' for agent_type in LANES})
+
+        polled = self.poll(self.session_id, self.turn_id)
+        self.assertEqual((polled['status'], polled['mode']), ('completed', 'compare'))
+        for agent_type in LANES:
+            lane = polled['lanes'][agent_type]
+            self.assertEqual(lane['status'], 'completed')
+            self.assertTrue(lane['response'].startswith(f'{agent_type} says\n'))
+        self.assertNotIn('inFlight', self.item())
+
+    def test_lane_writes_go_through_the_client(self):
+        self.runtime.script = lambda agent_id, text: self.lane_stream(agent_id.split('-')[0])
+        self.compare()
+        # The table also counts client requests; only the turn's final status comes from the resource
+        self.assertGreaterEqual(self.client.calls['update_item'], len(LANES) * (LANE_CHUNKS // 3))
+        self.assertEqual(self.sessions.calls['update_item'] - self.client.calls['update_item'], 1)
+
+    def test_partial_failure_completes_the_turn(self):
+        self.runtime.script = self.financial_lane_fails
+
+        self.assertTrue(self.compare()['success'])
+        self.assertEqual(self.item()['status'], 'completed')
+        self.assertEqual(self.lane_statuses(), {'generic': 'completed', 'coding': 'completed', 'financial': 'error'})
+        financial = self.item()['lanes']['financial']
+        self.assertEqual(financial['errorMessage'], 'stream broke')
+        # Progress written before the failure is kept
+        self.assertTrue(financial['response'].startswith('financial says\n'))
+
+    def test_every_lane_failing_fails_the_turn(self):
+        self.runtime.script = lambda agent_id, text: throttling_error()
+        result = self.compare()
+        self.assertEqual((result['success'], result['errorType']), (False, 'throttling'))
+        self.assertEqual(self.item()['status'], 'error')
+        self.assertEqual(self.lane_statuses(), dict.fromkeys(LANES, 'error'))
+        self.assertNotIn('inFlight', self.item())
+
+    def test_completed_lanes_are_indexed_as_one_document(self):
+        search = FakeTable('search-index-test', ['userId', 'sk'])
+        self.dynamodb.tables[search.name] = search
+        self.chat = load_function('chat', f'chat_search_{self.id()}',
+                                  {**CHAT_ENV, 'SEARCH_INDEX_TABLE_NAME': search.name}, self.dynamodb, self.runtime)
+
+        self.runtime.script = self.financial_lane_fails
+        self.compare()
+
+        documents = [item for (_, sk), item in search.items.items() if sk.startswith('doc#')]
+        self.assertEqual(len(documents), 1)
+        document = documents[0]
+        self.assertEqual((document['sessionId'], document['turnId'], document['message']),
+                         (self.session_id, self.turn_id, 'which is better?'))
+        lanes = self.item()['lanes']
+        self.assertEqual(document['response'], lanes['generic']['response'] + '\n\n' + lanes['coding']['response'])
+        self.assertNotIn('financial', document['response'])
+        self.assertEqual(search.items[(USER_ID, 'meta')]['docCount'], 1)
+        self.assertEqual(len([sk for _, sk in search.items if sk.startswith('seg#')]), 1)
+
+    def test_cancel_stops_every_lane(self):
+        lock, cancelled = threading.Lock(), []
+
+        def sleep(seconds):
+            threading.Event().wait(seconds)
+            # Cancel once every lane is part way through its stream
+            with lock:
+                if not cancelled and len(self.runtime.streams) == len(LANES) and \
+                        all(stream.consumed >= 3 for stream in self.runtime.streams):
+                    cancelled.append(self.cancel())
+
+        self.runtime.script = lambda agent_id, text: self.lane_stream(
+            agent_id.split('-')[0], chunk_delay=0.005, sleep=sleep)
+        result = self.compare()
+
+        self.assertEqual(cancelled[0]['status'], 'cancelling')
+        self.assertEqual(result['status'], 'cancelled')
+        self.assertEqual(self.item()['status'], 'cancelled')
+        self.assertEqual(self.lane_statuses(), dict.fromkeys(LANES, 'cancelled'))
+        for stream in self.runtime.streams:
+            self.assertTrue(stream.closed)
+            self.assertLess(stream.consumed, LANE_CHUNKS)
+
+
+if __name__ == '__main__':
+    unittest.main()
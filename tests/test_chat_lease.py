@@ -0,0 +1,221 @@
+"""
+Tests for worker leases: LeaseHeartbeat renewal, the stale report in
+chat-status and the chat-sweeper's conditional finalize/release.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import time
+import unittest
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import ClientError, FakeContext, FakeEventStream, api_event, load_function, text_chunks  # noqa: E402
+from test_chat_cancel import SESSIONS_TABLE, USER_ID, ChatTestCase  # noqa: E402
+
+NOW = 1_700_000_000.0
+
+
+class LeaseTestCase(ChatTestCase):
+    """Session items written straight into the shared table"""
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.dynamodb.meta.client
+        self.LeaseHeartbeat = self.chat.LeaseHeartbeat
+
+    def put_turn(self, status='processing', lease_expires_at=None, **attributes):
+        session_id, turn_id = str(uuid.uuid4()), str(uuid.uuid4())
+        item = {'sessionId': session_id, 'turnId': turn_id, 'status': status, 'mode': 'single',
+                'response': 'partial answer', 'chunks': ['partial ', 'answer'], **attributes}
+        if lease_expires_at is not None:
+            item['leaseExpiresAt'] = int(lease_expires_at)
+        if status == 'processing':
+            item['inFlight'] = 'true'
+        self.sessions.items[(session_id,)] = item
+        return session_id, turn_id
+
+    def item(self, session_id):
+        return self.sessions.items[(session_id,)]
+
+
+class LeaseHeartbeatTest(LeaseTestCase):
+
+    def heartbeat(self, session_id, turn_id, **options):
+        return self.LeaseHeartbeat(self.client, SESSIONS_TABLE, session_id, turn_id, **options)
+
+    def test_lease_expiry_is_rounded_up(self):
+        with mock.patch('time.time', return_value=NOW + 0.2):
+            self.assertEqual(self.heartbeat('s', 't', lease_seconds=15).lease_expiry(), NOW + 16)
+
+    def test_lease_is_capped_at_the_deadline_plus_grace(self):
+        heartbeat = self.heartbeat('s', 't', lease_seconds=15, deadline=NOW + 4, grace_seconds=2)
+        with mock.patch('time.time', return_value=NOW):
+            self.assertEqual(heartbeat.lease_expiry(), NOW + 6)
+        with mock.patch('time.time', return_value=NOW + 3):
+            self.assertEqual(heartbeat.lease_expiry(), NOW + 6)
+
+    def test_renew_pushes_the_lease_forward(self):
+        session_id, turn_id = self.put_turn(lease_expires_at=NOW + 15)
+        heartbeat = self.heartbeat(session_id, turn_id, lease_seconds=15)
+        with mock.patch('time.time', return_value=NOW + 5):
+            heartbeat.renew()
+        self.assertEqual(self.item(session_id)['leaseExpiresAt'], NOW + 20)
+        self.assertEqual((heartbeat.renewals, self.client.calls['update_item']), (1, 1))
+
+    def test_renewal_fails_once_the_turn_is_finished_or_replaced(self):
+        finished = self.put_turn('completed', lease_expires_at=NOW + 15)
+        session_id, _ = self.put_turn(lease_expires_at=NOW + 15)
+        for heartbeat in (self.heartbeat(*finished), self.heartbeat(session_id, str(uuid.uuid4()))):
+            with self.assertRaises(ClientError) as raised:
+                heartbeat.renew()
+            self.assertEqual(raised.exception.response['Error']['Code'], 'ConditionalCheckFailedException')
+        self.assertEqual(self.item(finished[0])['leaseExpiresAt'], NOW + 15)
+        self.assertEqual(self.item(session_id)['leaseExpiresAt'], NOW + 15)
+
+    def test_thread_renews_until_the_turn_finishes(self):
+        session_id, turn_id = self.put_turn(lease_expires_at=NOW)
+        heartbeat = self.heartbeat(session_id, turn_id, interval_seconds=0.01).start()
+        self.addCleanup(heartbeat.stop)
+        for _ in range(200):
+            if heartbeat.renewals >= 2:
+                break
+            time.sleep(0.01)
+        self.assertGreaterEqual(heartbeat.renewals, 2)
+        self.assertGreater(self.item(session_id)['leaseExpiresAt'], time.time())
+
+        self.sessions.update_item(Key={'sessionId': session_id}, UpdateExpression='SET #status = :completed',
+                                  ExpressionAttributeNames={'#status': 'status'},
+                                  ExpressionAttributeValues={':completed': 'completed'})
+        heartbeat._thread.join(timeout=1)
+        # The failed condition ends the thread without stop()
+        self.assertFalse(heartbeat._thread.is_alive())
+
+    def test_chat_worker_holds_the_lease_while_streaming(self):
+        self.runtime.script = lambda agent_id, text: FakeEventStream(text_chunks(12), chunk_delay=0.02)
+        with mock.patch.object(self.chat, 'HEARTBEAT_INTERVAL_SECONDS', 0.05):
+            started = time.time()
+            response = self.chat.handler(api_event(USER_ID, {'message': 'hello'}), FakeContext(3000))
+        body = json.loads(response['body'])
+        item = self.item(body['sessionId'])
+        self.assertEqual(item['status'], 'completed')
+        self.assertNotIn('inFlight', item)
+        # Renewed from the heartbeat thread through the client, never past the deadline + grace
+        self.assertGreaterEqual(self.client.calls['update_item'], 2)
+        self.assertLessEqual(item['leaseExpiresAt'], int(started) + 3 + 2 + 1)
+
+
+class StaleReportTest(LeaseTestCase):
+
+    def test_is_lease_expired(self):
+        with mock.patch('time.time', return_value=NOW):
+            self.assertTrue(self.status.is_lease_expired({'leaseExpiresAt': NOW - 1}))
+            self.assertFalse(self.status.is_lease_expired({'leaseExpiresAt': NOW}))
+            self.assertFalse(self.status.is_lease_expired({'leaseExpiresAt': NOW + 10}))
+            self.assertFalse(self.status.is_lease_expired({}))
+
+    def test_processing_turn_with_a_lapsed_lease_is_reported_stale(self):
+        session_id, turn_id = self.put_turn(lease_expires_at=time.time() - 1)
+        result = self.poll(session_id, turn_id)
+        self.assertEqual((result['status'], result['errorMessage']), ('stale', self.status.STALE_ERROR_MESSAGE))
+        self.assertEqual((result['response'], result['chunks']), ('partial answer', ['partial ', 'answer']))
+        # The report is derived, not written, and never cached as final
+        self.assertEqual(self.item(session_id)['status'], 'processing')
+        self.assertEqual(self.status.completed_cache, {})
+
+    def test_live_lease_and_items_without_a_lease_are_processing(self):
+        for lease_expires_at in (time.time() + 15, None):
+            session_id, turn_id = self.put_turn(lease_expires_at=lease_expires_at)
+            self.assertEqual(self.poll(session_id, turn_id)['status'], 'processing')
+
+    def test_finished_turn_is_not_stale(self):
+        session_id, turn_id = self.put_turn('completed', lease_expires_at=time.time() - 60)
+        self.assertEqual(self.poll(session_id, turn_id)['status'], 'completed')
+
+    def test_processing_lanes_of_a_stale_turn_are_stale(self):
+        lanes = {
+            'coding': {'status': 'completed', 'response': 'done', 'chunks': ['done']},
+            'financial': {'status': 'processing', 'response': 'half', 'chunks': ['half']}
+        }
+        session_id, turn_id = self.put_turn(lease_expires_at=time.time() - 1, mode='compare', lanes=lanes)
+        result = self.poll(session_id, turn_id)
+        self.assertEqual(result['status'], 'stale')
+        self.assertEqual({agent: lane['status'] for agent, lane in result['lanes'].items()},
+                         {'coding': 'completed', 'financial': 'stale'})
+        self.assertEqual(result['lanes']['financial']['response'], 'half')
+
+
+class SweeperTest(LeaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.sweeper = load_function('chat-sweeper', f'chat_sweeper_{self.id()}',
+                                     {'CHAT_SESSIONS_TABLE_NAME': SESSIONS_TABLE}, self.dynamodb)
+        self.cutoff = int(time.time()) - self.sweeper.SWEEP_GRACE_SECONDS
+
+    def test_sweep(self):
+        dead = self.put_turn(lease_expires_at=self.cutoff - 1)
+        within_grace = self.put_turn(lease_expires_at=self.cutoff + 1)
+        alive = self.put_turn(lease_expires_at=time.time() + 15)
+        left_in_index = self.put_turn('completed', lease_expires_at=self.cutoff - 60, inFlight='true')
+        finished = self.put_turn('completed', lease_expires_at=self.cutoff - 60)
+
+        summary = self.sweeper.handler({}, None)
+        self.assertEqual((summary['finalized'], summary['released'], summary['skipped']), (1, 1, 0))
+        self.assertEqual(self.sessions.calls['query'], 1)
+
+        item = self.item(dead[0])
+        self.assertEqual((item['status'], item['errorMessage']), ('stale', self.sweeper.STALE_ERROR_MESSAGE))
+        self.assertEqual((item['response'], item['chunks']), ('partial answer', ['partial ', 'answer']))
+        self.assertNotIn('inFlight', item)
+        self.assertEqual(self.poll(*dead)['status'], 'stale')
+
+        self.assertEqual(self.item(left_in_index[0])['status'], 'completed')
+        self.assertNotIn('inFlight', self.item(left_in_index[0]))
+        for session_id, _ in (within_grace, alive):
+            self.assertEqual(self.item(session_id)['status'], 'processing')
+            self.assertIn('inFlight', self.item(session_id))
+        self.assertEqual(self.sessions.calls['update_item'], 2)
+        self.assertNotIn('staleAt', self.item(finished[0]))
+
+    def sweep_snapshot(self, items):
+        """Sweep items as the query saw them, after the table has moved on"""
+        with mock.patch.object(self.sweeper, 'find_expired_leases', return_value=items):
+            return self.sweeper.handler({}, None)
+
+    def test_lease_renewed_after_the_query_is_not_finalized(self):
+        session_id, turn_id = self.put_turn(lease_expires_at=self.cutoff - 1)
+        snapshot = dict(self.item(session_id))
+        self.item(session_id)['leaseExpiresAt'] = int(time.time()) + 15
+        self.assertEqual(self.sweep_snapshot([snapshot])['skipped'], 1)
+        self.assertEqual(self.item(session_id)['status'], 'processing')
+
+    def test_turn_replaced_after_the_query_is_left_alone(self):
+        dead = self.put_turn(lease_expires_at=self.cutoff - 1)
+        finished = self.put_turn('completed', lease_expires_at=self.cutoff - 1, inFlight='true')
+        snapshots = [dict(self.item(dead[0])), dict(self.item(finished[0]))]
+        for session_id, _ in (dead, finished):
+            self.item(session_id).update(turnId=str(uuid.uuid4()), status='processing',
+                                         leaseExpiresAt=self.cutoff - 1)
+
+        summary = self.sweep_snapshot(snapshots)
+        self.assertEqual((summary['finalized'], summary['released'], summary['skipped']), (0, 0, 2))
+        for session_id, _ in (dead, finished):
+            self.assertEqual(self.item(session_id)['status'], 'processing')
+            self.assertIn('inFlight', self.item(session_id))
+
+    def test_turn_finished_after_the_query_is_not_marked_stale(self):
+        session_id, _ = self.put_turn(lease_expires_at=self.cutoff - 1)
+        snapshot = dict(self.item(session_id))
+        self.item(session_id)['status'] = 'completed'
+        self.assertEqual(self.sweep_snapshot([snapshot])['skipped'], 1)
+        self.assertEqual(self.item(session_id)['status'], 'completed')
+
+
+if __name__ == '__main__':
+    unittest.main()
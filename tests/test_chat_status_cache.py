@@ -0,0 +1,161 @@
+"""
+Tests for the chat-status completed-turn cache and its HTTP validators.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import json
+import os
+import sys
+import unittest
+import uuid
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import FakeDynamoDB, FakeTable, api_event, load_function  # noqa: E402
+
+SESSIONS_TABLE = 'chat-sessions-test'
+
+
+class ChatStatusCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.sessions = FakeTable(SESSIONS_TABLE, ['sessionId'])
+        self.status = load_function('chat-status', f'chat_status_{self.id()}',
+                                    {'CHAT_SESSIONS_TABLE_NAME': SESSIONS_TABLE}, FakeDynamoDB(self.sessions))
+
+    def put_turn(self, status='completed', response='an answer', turn_id=None):
+        session_id, turn_id = str(uuid.uuid4()), turn_id or str(uuid.uuid4())
+        self.sessions.items[(session_id,)] = {
+            'sessionId': session_id, 'turnId': turn_id, 'status': status, 'mode': 'single',
+            'response': response, 'chunks': [response]
+        }
+        return session_id, turn_id
+
+    def fetch(self, session_id, turn_id=None, if_none_match=None, last_chunk_index=None):
+        query = {}
+        if turn_id:
+            query['turnId'] = turn_id
+        if last_chunk_index is not None:
+            query['lastChunkIndex'] = str(last_chunk_index)
+        headers = {'If-None-Match': if_none_match} if if_none_match else None
+        return self.status.handler(api_event(path_parameters={'sessionId': session_id}, query=query,
+                                             headers=headers), None)
+
+
+class CachePutTest(ChatStatusCacheTestCase):
+    """cache_put/cache_get with a 100-byte budget"""
+
+    def setUp(self):
+        super().setUp()
+        budget = mock.patch.object(self.status, 'COMPLETED_CACHE_MAX_BYTES', 100)
+        budget.start()
+        self.addCleanup(budget.stop)
+
+    def test_least_recently_used_entries_are_evicted_over_the_byte_budget(self):
+        for key in 'abc':
+            self.status.cache_put(key, key * 40, f'"{key}"')
+        self.assertEqual(list(self.status.completed_cache), ['b', 'c'])
+        self.assertEqual(self.status.completed_cache_bytes, 80)
+
+        # A hit makes b the most recently used, so c goes next
+        self.assertEqual(self.status.cache_get('b'), ('b' * 40, '"b"'))
+        self.status.cache_put('d', 'd' * 30, '"d"')
+        self.assertEqual(list(self.status.completed_cache), ['b', 'd'])
+        self.assertEqual(self.status.completed_cache_bytes, 70)
+        self.assertIsNone(self.status.cache_get('c'))
+
+    def test_replacing_an_entry_does_not_double_count_it(self):
+        self.status.cache_put('a', 'a' * 60, '"a"')
+        self.status.cache_put('a', 'a' * 50, '"a2"')
+        self.assertEqual(self.status.completed_cache_bytes, 50)
+        self.assertEqual(self.status.cache_get('a'), ('a' * 50, '"a2"'))
+
+    def test_a_body_larger_than_the_budget_bypasses_the_cache(self):
+        self.status.cache_put('a', 'a' * 60, '"a"')
+        self.status.cache_put('big', 'x' * 101, '"big"')
+        self.assertEqual(list(self.status.completed_cache), ['a'])
+        self.assertEqual(self.status.completed_cache_bytes, 60)
+        self.status.cache_put('full', 'x' * 100, '"full"')
+        self.assertEqual(list(self.status.completed_cache), ['full'])
+
+
+class CompletedTurnTest(ChatStatusCacheTestCase):
+
+    def test_completed_turn_is_served_from_the_cache(self):
+        session_id, turn_id = self.put_turn()
+        first = self.fetch(session_id, turn_id)
+        second = self.fetch(session_id, turn_id)
+        self.assertEqual(self.sessions.calls['get_item'], 1)
+        self.assertEqual((second['statusCode'], second['body']), (200, first['body']))
+        self.assertEqual(second['headers']['ETag'], first['headers']['ETag'])
+        self.assertEqual(second['headers']['Cache-Control'], self.status.COMPLETED_CACHE_CONTROL)
+        self.assertEqual(json.loads(second['body'])['response'], 'an answer')
+
+    def test_oversized_turn_is_read_from_dynamodb_every_time(self):
+        session_id, turn_id = self.put_turn(response='x' * 200)
+        with mock.patch.object(self.status, 'COMPLETED_CACHE_MAX_BYTES', 100):
+            for _ in range(3):
+                response = self.fetch(session_id, turn_id)
+                self.assertEqual(response['headers']['Cache-Control'], self.status.COMPLETED_CACHE_CONTROL)
+        self.assertEqual(self.sessions.calls['get_item'], 3)
+        self.assertEqual(self.status.completed_cache, {})
+
+    def test_if_none_match_gets_304(self):
+        session_id, turn_id = self.put_turn()
+        etag = self.fetch(session_id, turn_id)['headers']['ETag']
+        for if_none_match in (etag, f'"stale", {etag}'):
+            response = self.fetch(session_id, turn_id, if_none_match)
+            self.assertEqual((response['statusCode'], response['body']), (304, ''))
+            self.assertEqual(response['headers']['ETag'], etag)
+        self.assertEqual(self.sessions.calls['get_item'], 1)
+        self.assertEqual(self.fetch(session_id, turn_id, '"other"')['statusCode'], 200)
+
+    def test_if_none_match_on_an_uncached_fetch_gets_304(self):
+        session_id, turn_id = self.put_turn()
+        etag = self.status.make_etag(self.fetch(session_id, turn_id)['body'])
+        self.status.completed_cache.clear()
+        self.assertEqual(self.fetch(session_id, turn_id, etag)['statusCode'], 304)
+        self.assertEqual(self.sessions.calls['get_item'], 2)
+
+    def test_each_chunk_offset_is_cached_separately(self):
+        session_id, turn_id = self.put_turn()
+        full = json.loads(self.fetch(session_id, turn_id)['body'])
+        tail = json.loads(self.fetch(session_id, turn_id, last_chunk_index=0)['body'])
+        self.assertEqual((full['chunks'], tail['chunks']), (['an answer'], []))
+        self.assertEqual(len(self.status.completed_cache), 2)
+
+
+class RevalidatedResponseTest(ChatStatusCacheTestCase):
+    """Anything that can still change is no-cache and never kept"""
+
+    def assert_not_cached(self, session_id, turn_id=None):
+        for _ in range(2):
+            response = self.fetch(session_id, turn_id)
+            self.assertEqual(response['headers']['Cache-Control'], self.status.REVALIDATE_CACHE_CONTROL)
+        self.assertEqual(self.status.completed_cache, {})
+        return response
+
+    def test_turn_in_progress(self):
+        session_id, turn_id = self.put_turn('processing')
+        etag = self.assert_not_cached(session_id, turn_id)['headers']['ETag']
+        self.assertEqual(self.sessions.calls['get_item'], 2)
+        # Revalidation still saves the body while nothing changed
+        self.assertEqual(self.fetch(session_id, turn_id, etag)['statusCode'], 304)
+
+    def test_completed_session_without_a_turn_id(self):
+        session_id, _ = self.put_turn()
+        self.assert_not_cached(session_id)
+
+    def test_completed_item_of_a_different_turn(self):
+        session_id, _ = self.put_turn()
+        self.assert_not_cached(session_id, str(uuid.uuid4()))
+
+    def test_missing_session_is_no_store(self):
+        response = self.fetch(str(uuid.uuid4()), str(uuid.uuid4()))
+        self.assertEqual((response['statusCode'], response['headers']['Cache-Control']), (404, 'no-store'))
+
+
+if __name__ == '__main__':
+    unittest.main()
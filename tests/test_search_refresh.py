@@ -0,0 +1,213 @@
+"""
+Tests for the search Lambda's index refresh across containers.
+
+Two module instances of functions/search/index.py play two warm Lambda
+containers sharing one in-memory stand-in for the search index table.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import filecmp
+import importlib.util
+import os
+import sys
+import types
+import unittest
+from bisect import bisect_left, bisect_right
+from unittest import mock
+
+SEARCH_DIR = os.path.join(os.path.dirname(__file__), '..', 'terraform', 'functions', 'search')
+sys.path.insert(0, SEARCH_DIR)
+
+from search_index import analyze, doc_key, encode_segment, segment_key  # noqa: E402
+
+TABLE_NAME = 'search-index-test'
+USER_ID = 'user-1'
+
+# Items per Query page, small enough to exercise pagination
+PAGE_SIZE = 25
+
+
+class Binary:
+    """What boto3 returns for a binary attribute"""
+
+    def __init__(self, value):
+        self.value = bytes(value)
+
+
+class InMemoryTable:
+    """The subset of the DynamoDB Table/resource API the search Lambda uses"""
+
+    def __init__(self, page_size=PAGE_SIZE):
+        self.items = {}
+        self.page_size = page_size
+        self.batch_get_keys = 0
+        self._sorted_keys = None
+
+    def put_item(self, Item):
+        item = dict(Item)
+        if isinstance(item.get('postings'), (bytes, bytearray)):
+            item['postings'] = Binary(item['postings'])
+        self.items[(item['userId'], item['sk'])] = item
+        self._sorted_keys = None
+
+    def delete_item(self, Key):
+        self.items.pop((Key['userId'], Key['sk']), None)
+        self._sorted_keys = None
+
+    def batch_writer(self):
+        table = self
+
+        class Writer:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def delete_item(self, Key):
+                table.delete_item(Key)
+
+        return Writer()
+
+    def query(self, **params):
+        values = params['ExpressionAttributeValues']
+        user_id, prefix = values[':userId'], values[':prefix']
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self.items)
+        start = bisect_left(self._sorted_keys, (user_id, prefix))
+        if 'ExclusiveStartKey' in params:
+            start = bisect_right(self._sorted_keys, (user_id, params['ExclusiveStartKey']['sk']))
+        end = bisect_left(self._sorted_keys, (user_id, prefix + '\uffff'))
+        page = self._sorted_keys[start:min(end, start + self.page_size)]
+        items = [self.items[key] for key in page]
+        if params.get('ProjectionExpression') == 'sk':
+            items = [{'sk': item['sk']} for item in items]
+        response = {'Items': items}
+        if start + self.page_size < end:
+            response['LastEvaluatedKey'] = {'userId': user_id, 'sk': page[-1][1]}
+        return response
+
+    def batch_get_item(self, RequestItems):
+        request = RequestItems[TABLE_NAME]
+        self.batch_get_keys += len(request['Keys'])
+        found = [self.items[(key['userId'], key['sk'])] for key in request['Keys']
+                 if (key['userId'], key['sk']) in self.items]
+        return {'Responses': {TABLE_NAME: found}}
+
+
+def load_container(table, name):
+    """A fresh instance of the search Lambda module, i.e. one warm container"""
+    resource = types.SimpleNamespace(Table=lambda table_name: table, batch_get_item=table.batch_get_item)
+    boto3 = types.SimpleNamespace(resource=lambda service: resource)
+    jwt = types.SimpleNamespace(ExpiredSignatureError=Exception, InvalidTokenError=Exception)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SEARCH_DIR, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(sys.modules, {'boto3': boto3, 'jwt': jwt}), \
+            mock.patch.dict(os.environ, {'SEARCH_INDEX_TABLE_NAME': TABLE_NAME}):
+        spec.loader.exec_module(module)
+    return module
+
+
+def index_turns(table, docnums):
+    """Write turns the way the chat Lambda does: a document and a one-document segment each"""
+    for docnum in docnums:
+        message = f'question number{docnum}'
+        response = f'answer about topic{docnum % 7} for number{docnum}'
+        table.put_item({'userId': USER_ID, 'sk': doc_key(docnum), 'message': message, 'response': response})
+        table.put_item({
+            'userId': USER_ID,
+            'sk': segment_key(docnum, docnum),
+            'postings': encode_segment({docnum: analyze(message, response)}),
+            'docCount': 1
+        })
+
+
+def segment_keys(table):
+    return sorted(sk for _, sk in table.items if sk.startswith('seg#'))
+
+
+class SearchRefreshTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = InMemoryTable()
+        self.container_a = load_container(self.table, 'search_container_a')
+        self.container_b = load_container(self.table, 'search_container_b')
+
+    def search(self, container, text):
+        return [docnum for docnum, _ in container.load_index(USER_ID).search(text)]
+
+    def test_refresh_picks_up_new_turns(self):
+        index_turns(self.table, range(1, 11))
+        self.assertEqual(self.container_a.load_index(USER_ID).doc_count, 10)
+
+        index_turns(self.table, range(11, 13))
+        fetched_before = self.table.batch_get_keys
+        self.assertEqual(self.search(self.container_a, 'number12'), [12])
+        self.assertEqual(self.table.batch_get_keys - fetched_before, 2)
+
+        # Nothing new: the refresh only lists keys
+        fetched_before = self.table.batch_get_keys
+        self.container_a.load_index(USER_ID)
+        self.assertEqual(self.table.batch_get_keys, fetched_before)
+
+    def test_compaction_by_another_container(self):
+        index_turns(self.table, range(1, 41))
+        self.assertEqual(self.container_a.load_index(USER_ID).doc_count, 40)
+
+        # B merges everything, including turns A never saw, into a segment keyed below A's newest document
+        index_turns(self.table, range(41, 81))
+        self.container_b.compact(USER_ID, self.container_b.load_index(USER_ID))
+        self.assertEqual(segment_keys(self.table), [segment_key(1, 80)])
+
+        index = self.container_a.load_index(USER_ID)
+        self.assertEqual(index.doc_count, 80)
+        self.assertEqual(list(index.segments), [segment_key(1, 80)])
+        self.assertEqual(self.search(self.container_a, 'number75'), [75])
+        self.assertEqual(self.search(self.container_a, 'number3'), [3])
+
+    def test_compacted_segment_merged_again_elsewhere(self):
+        index_turns(self.table, range(1, 41))
+        index_a = self.container_a.load_index(USER_ID)
+        self.container_a.compact(USER_ID, index_a)
+        self.assertEqual(segment_keys(self.table), [segment_key(1, 40)])
+
+        # B merges A's compacted segment with new turns, deleting the segment A holds
+        index_turns(self.table, range(41, 81))
+        index_b = self.container_b.load_index(USER_ID)
+        with mock.patch.object(self.container_b, 'SMALL_SEGMENT_BYTES', 1024 * 1024):
+            self.container_b.compact(USER_ID, index_b)
+        self.assertEqual(segment_keys(self.table), [segment_key(1, 80)])
+
+        index_a = self.container_a.load_index(USER_ID)
+        self.assertEqual(index_a.doc_count, 80)
+        self.assertEqual(list(index_a.segments), [segment_key(1, 80)])
+        self.assertEqual(self.search(self.container_a, 'number20'), [20])
+        self.assertEqual(self.search(self.container_a, 'number60'), [60])
+
+    def test_search_between_merge_write_and_delete(self):
+        index_turns(self.table, range(1, 41))
+        self.container_a.load_index(USER_ID)
+
+        # B has written its merged segment but not yet deleted the inputs
+        index_b = self.container_b.load_index(USER_ID)
+        data, first, last = index_b.merge(sorted(index_b.segments))
+        self.table.put_item({'userId': USER_ID, 'sk': segment_key(first, last), 'postings': data})
+
+        index = self.container_a.load_index(USER_ID)
+        self.assertEqual(index.doc_count, 40)
+        self.assertEqual(list(index.segments), [segment_key(1, 40)])
+        self.assertEqual(self.search(self.container_a, 'number33'), [33])
+
+
+
+class SearchIndexCopiesTest(unittest.TestCase):
+
+    def test_chat_and_search_ship_the_same_search_index(self):
+        # Each function directory is packaged on its own; the chat Lambda writes what search decodes
+        chat_copy = os.path.join(SEARCH_DIR, '..', 'chat', 'search_index.py')
+        self.assertTrue(filecmp.cmp(os.path.join(SEARCH_DIR, 'search_index.py'), chat_copy, shallow=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Fuzz tests for the chat Lambda's StreamAssembler.
+
+Streams are emoji-, CJK- and fence-heavy text cut into random byte chunks,
+so multibyte characters and fence markers are regularly split across chunks.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'terraform', 'functions', 'chat'))
+
+from stream_assembler import FENCE_MARKERS, StreamAssembler  # noqa: E402
+
+MODES = ('word', 'line', 'markdown')
+
+# Pieces the generated streams are made of
+VOCABULARY = [
+    'agent ', 'stream ', 'chunk', ' ', '.', ',',
+    '😀', '👩‍💻', '🚀', '🇯🇵', '日本語', '中文', '한국어', 'é', 'ß',
+    '\n', '\n\n', '```python\n', '```\n', '~~~\n', '  ```\n', '    print("日本")\n'
+]
+
+
+def generate_text(rng, length):
+    pieces, total = [], 0
+    while total < length:
+        piece = rng.choice(VOCABULARY)
+        pieces.append(piece)
+        total += len(piece)
+    return ''.join(pieces)
+
+
+def split_bytes(rng, data, max_chunk=64):
+    chunks, pos = [], 0
+    while pos < len(data):
+        size = rng.randint(1, max_chunk)
+        chunks.append(data[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def assemble(mode, chunks):
+    assembler = StreamAssembler(mode)
+    segments = []
+    for chunk in chunks:
+        segments += assembler.feed(chunk)
+    segments += assembler.finish()
+    return assembler, segments
+
+
+def fence_lines(text):
+    return sum(1 for line in text.split('\n') if line.lstrip().startswith(FENCE_MARKERS))
+
+
+class StreamAssemblerFuzzTest(unittest.TestCase):
+
+    TRIALS = 200
+
+    def setUp(self):
+        self.rng = random.Random(20261019)
+
+    def test_round_trip(self):
+        for trial in range(self.TRIALS):
+            text = generate_text(self.rng, self.rng.randint(0, 4000))
+            chunks = split_bytes(self.rng, text.encode('utf-8'))
+            for mode in MODES:
+                assembler, segments = assemble(mode, chunks)
+                self.assertEqual(''.join(segments), text, f'trial {trial}, {mode}')
+                self.assertEqual(assembler.text(), text, f'trial {trial}, {mode}')
+                self.assertEqual(assembler.segments, segments)
+
+    def test_one_byte_chunks(self):
+        text = generate_text(self.rng, 2000)
+        chunks = [bytes([byte]) for byte in text.encode('utf-8')]
+        for mode in MODES:
+            self.assertEqual(assemble(mode, chunks)[0].text(), text, mode)
+
+    def test_segments_end_on_boundary(self):
+        for trial in range(self.TRIALS):
+            text = generate_text(self.rng, self.rng.randint(0, 4000))
+            chunks = split_bytes(self.rng, text.encode('utf-8'))
+
+            _, segments = assemble('word', chunks)
+            for segment in segments[:-1]:
+                self.assertTrue(segment[-1].isspace(), f'trial {trial}: {segment[-20:]!r}')
+
+            _, segments = assemble('line', chunks)
+            for segment in segments[:-1]:
+                self.assertTrue(segment.endswith('\n'), f'trial {trial}: {segment[-20:]!r}')
+
+    def test_markdown_never_splits_a_fence(self):
+        for trial in range(self.TRIALS):
+            text = generate_text(self.rng, self.rng.randint(0, 4000))
+            _, segments = assemble('markdown', split_bytes(self.rng, text.encode('utf-8')))
+            emitted = ''
+            for segment in segments[:-1]:
+                emitted += segment
+                self.assertTrue(segment.endswith('\n'))
+                self.assertEqual(fence_lines(emitted) % 2, 0, f'trial {trial}: segment ends inside a fence')
+
+    def test_multi_megabyte_stream(self):
+        text = generate_text(self.rng, 3 * 1024 * 1024)
+        chunks = split_bytes(self.rng, text.encode('utf-8'), max_chunk=4096)
+        for mode in MODES:
+            self.assertEqual(assemble(mode, chunks)[0].text(), text, mode)
+
+    def test_indented_fence_markers(self):
+        # A marker counts within a line's first 16 characters, i.e. after at most 13 spaces
+        opened = StreamAssembler('markdown')
+        self.assertEqual(opened.feed((' ' * 13 + '```\ncode\n').encode('utf-8')), [])
+        not_a_fence = StreamAssembler('markdown')
+        self.assertEqual(not_a_fence.feed((' ' * 14 + '```\ntext\n').encode('utf-8')), [' ' * 14 + '```\ntext\n'])
+
+    def test_invalid_bytes_are_replaced(self):
+        assembler, _ = assemble('markdown', [b'\xff\xfeok\n', '日'.encode('utf-8')[:2]])
+        self.assertEqual(assembler.text(), '��ok\n�')
+
+    def test_unknown_boundary(self):
+        with self.assertRaises(ValueError):
+            StreamAssembler('sentence')
+
+
+if __name__ == '__main__':
+    unittest.main()
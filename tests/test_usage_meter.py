@@ -0,0 +1,144 @@
+"""
+Tests for UsageMeter: the single ADD update flush() builds and
+accumulation from concurrent compare lanes / batch workers.
+
+Run from the project root:
+    python -m unittest discover tests
+"""
+import filecmp
+import importlib.util
+import os
+import sys
+import threading
+import time
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aws import FUNCTIONS_DIR, FakeTable  # noqa: E402
+
+USAGE_METER_PATH = os.path.join(FUNCTIONS_DIR, 'chat', 'usage_meter.py')
+
+spec = importlib.util.spec_from_file_location('usage_meter', USAGE_METER_PATH)
+usage_meter = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(usage_meter)
+UsageMeter = usage_meter.UsageMeter
+
+
+def today():
+    return time.strftime('%Y-%m-%d', time.gmtime())
+
+
+class FlushTest(unittest.TestCase):
+
+    def test_counters_are_written_as_one_add_update(self):
+        table = mock.Mock()
+        meter = UsageMeter(table, 'user-1')
+        meter.add(turns=1, messageBytes=Decimal(5), chunks=3)
+        meter.add(chunks=4.0)
+        self.assertTrue(meter.flush())
+
+        table.update_item.assert_called_once()
+        update = table.update_item.call_args.kwargs
+        self.assertEqual(update['Key'], {'userId': 'user-1', 'day': today()})
+        # Names are sorted, so the expression is the same for the same counters
+        self.assertEqual(update['UpdateExpression'], 'ADD #c0 :c0, #c1 :c1, #c2 :c2 SET lastActivityAt = :now')
+        self.assertEqual(update['ExpressionAttributeNames'], {'#c0': 'chunks', '#c1': 'messageBytes', '#c2': 'turns'})
+        values = dict(update['ExpressionAttributeValues'])
+        self.assertIsInstance(values.pop(':now'), str)
+        self.assertEqual(values, {':c0': 7, ':c1': 5, ':c2': 1})
+        self.assertTrue(all(type(value) is int for value in values.values()))
+        self.assertNotIn('ConditionExpression', update)
+
+    def test_nothing_to_write(self):
+        table = mock.Mock()
+        meter = UsageMeter(table, 'user-1')
+        self.assertFalse(meter.flush())
+        # Zero increments are not counters
+        meter.add(turns=0, cancelledTurns=0)
+        self.assertFalse(meter.flush())
+        table.update_item.assert_not_called()
+
+    def test_unconfigured_table_or_user_drops_the_counters(self):
+        for table, user_id in ((None, 'user-1'), (mock.Mock(), None)):
+            meter = UsageMeter(table, user_id)
+            meter.add(turns=1)
+            self.assertFalse(meter.flush())
+            self.assertEqual(meter.counters, {})
+            if table is not None:
+                table.update_item.assert_not_called()
+
+    def test_flush_resets_and_invocations_add_up_in_the_bucket(self):
+        table = FakeTable('usage-test', ['userId', 'day'])
+        for chunks in (3, 4):
+            meter = UsageMeter(table, 'user-1')
+            meter.add(turns=1, chunks=chunks)
+            self.assertTrue(meter.flush())
+            self.assertFalse(meter.flush())
+        bucket = table.items[('user-1', today())]
+        self.assertEqual((bucket['turns'], bucket['chunks']), (2, 7))
+        self.assertIn('lastActivityAt', bucket)
+        self.assertEqual(table.calls['update_item'], 2)
+
+
+class RecordInvocationTest(unittest.TestCase):
+
+    def test_latency_buckets(self):
+        for duration_ms, bucket in ((1, 'latencyLe1s'), (1000, 'latencyLe1s'), (1001, 'latencyLe5s'),
+                                    (15000, 'latencyLe15s'), (30000, 'latencyLe30s'), (30001, 'latencyOver30s')):
+            meter = UsageMeter(None, 'user-1')
+            meter.record_invocation(2, 80, duration_ms, 300)
+            self.assertEqual(meter.counters, {'agentInvocations': 1, 'chunks': 2, 'responseBytes': 80,
+                                              'bedrockMs': duration_ms, 'firstChunkMs': 300, bucket: 1})
+
+    def test_invocation_without_a_first_chunk(self):
+        meter = UsageMeter(None, 'user-1')
+        meter.record_invocation(0, 0, 20, None)
+        self.assertEqual(meter.counters, {'agentInvocations': 1, 'bedrockMs': 20, 'latencyLe1s': 1})
+
+    def test_concurrent_invocations_are_all_counted(self):
+        threads, calls = 8, 5000
+        table = FakeTable('usage-test', ['userId', 'day'])
+        meter = UsageMeter(table, 'user-1')
+        start = threading.Barrier(threads + 1)
+        # Switch threads as often as possible so unlocked read-modify-writes would lose counts
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+
+        def worker(index):
+            start.wait()
+            for call in range(calls):
+                meter.record_invocation(chunks=index + 1, response_bytes=10, duration_ms=2000, first_chunk_ms=1)
+
+        workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in workers:
+            thread.start()
+        start.wait()
+        # Flushes racing the workers move counters to the table without losing any
+        flushes = 0
+        while any(thread.is_alive() for thread in workers):
+            flushes += meter.flush()
+        for thread in workers:
+            thread.join()
+        flushes += meter.flush()
+
+        bucket = table.items[('user-1', today())]
+        self.assertEqual(bucket['agentInvocations'], threads * calls)
+        self.assertEqual(bucket['latencyLe5s'], threads * calls)
+        self.assertEqual(bucket['chunks'], calls * sum(range(1, threads + 1)))
+        self.assertEqual(bucket['responseBytes'], threads * calls * 10)
+        self.assertEqual(table.calls['update_item'], flushes)
+
+
+class CopiesTest(unittest.TestCase):
+
+    def test_chat_batch_ships_the_same_usage_meter(self):
+        # Each function directory is packaged on its own, so chat-batch carries a copy
+        self.assertTrue(filecmp.cmp(USAGE_METER_PATH, os.path.join(FUNCTIONS_DIR, 'chat-batch', 'usage_meter.py'),
+                                    shallow=False))
+
+
+if __name__ == '__main__':
+    unittest.main()